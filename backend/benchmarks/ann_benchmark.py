@@ -0,0 +1,139 @@
+"""
+Recall@k and latency of pgvector HNSW / IVFFlat indexes against exact search.
+
+Builds a throwaway table of clustered unit vectors for each row count, then
+times the same queries with no index (exact), with HNSW at several
+ef_search values, and with IVFFlat at several probe counts. Ground truth is
+computed with NumPy, so recall is measured against true nearest neighbours.
+
+    python benchmarks/ann_benchmark.py --rows 1000 10000 100000 --output ann.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+import asyncpg
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DATABASE_URL
+
+TABLE = "ann_benchmark_embeddings"
+
+
+def clustered_vectors(rng: np.random.Generator, count: int, dim: int, clusters: int) -> np.ndarray:
+    # Menu embeddings bunch up by cuisine/category; uniform noise would flatter IVFFlat
+    centers = rng.normal(size=(clusters, dim))
+    vectors = centers[rng.integers(0, clusters, count)] + rng.normal(scale=0.35, size=(count, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def to_text(vector: np.ndarray) -> str:
+    return "[" + ",".join(f"{x:.6f}" for x in vector) + "]"
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+async def run_queries(conn, queries, truth, k, setting=None):
+    latencies, recalls = [], []
+    for query, expected in zip(queries, truth):
+        async with conn.transaction():
+            if setting:
+                await conn.execute(setting)
+            started = time.perf_counter()
+            rows = await conn.fetch(
+                f"SELECT id FROM {TABLE} ORDER BY embedding <=> $1::vector LIMIT {k}", to_text(query)
+            )
+            latencies.append((time.perf_counter() - started) * 1000)
+        recalls.append(len({row["id"] for row in rows} & expected) / k)
+    return {
+        "recall_at_k": round(statistics.mean(recalls), 4),
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "mean_ms": round(statistics.mean(latencies), 3),
+    }
+
+
+async def benchmark_rows(conn, rows, args, rng):
+    data = clustered_vectors(rng, rows, args.dim, args.clusters)
+    queries = clustered_vectors(rng, args.queries, args.dim, args.clusters)
+    scores = queries @ data.T
+    truth = [set(np.argpartition(-row, args.k)[:args.k].tolist()) for row in scores]
+
+    await conn.execute(f"DROP TABLE IF EXISTS {TABLE}")
+    await conn.execute(f"CREATE TABLE {TABLE} (id integer PRIMARY KEY, embedding vector({args.dim}))")
+    await conn.executemany(
+        f"INSERT INTO {TABLE} (id, embedding) VALUES ($1, $2::vector)",
+        [(i, to_text(vector)) for i, vector in enumerate(data)],
+    )
+    await conn.execute(f"ANALYZE {TABLE}")
+
+    result = {"rows": rows, "exact": await run_queries(conn, queries, truth, args.k, "SET LOCAL enable_indexscan = off")}
+
+    started = time.perf_counter()
+    await conn.execute(f"CREATE INDEX {TABLE}_hnsw ON {TABLE} USING hnsw (embedding vector_cosine_ops) "
+                       f"WITH (m = {args.hnsw_m}, ef_construction = {args.hnsw_ef_construction})")
+    result["hnsw"] = {"build_s": round(time.perf_counter() - started, 2), "m": args.hnsw_m,
+                      "ef_construction": args.hnsw_ef_construction, "search": {}}
+    for ef_search in args.ef_search:
+        result["hnsw"]["search"][ef_search] = await run_queries(
+            conn, queries, truth, args.k, f"SET LOCAL hnsw.ef_search = {ef_search}")
+    await conn.execute(f"DROP INDEX {TABLE}_hnsw")
+
+    lists = max(rows // 1000, 1) if rows <= 1_000_000 else int(rows ** 0.5)
+    started = time.perf_counter()
+    await conn.execute(f"CREATE INDEX {TABLE}_ivfflat ON {TABLE} USING ivfflat (embedding vector_cosine_ops) "
+                       f"WITH (lists = {lists})")
+    result["ivfflat"] = {"build_s": round(time.perf_counter() - started, 2), "lists": lists, "search": {}}
+    for probes in args.probes:
+        result["ivfflat"]["search"][probes] = await run_queries(
+            conn, queries, truth, args.k, f"SET LOCAL ivfflat.probes = {min(probes, lists)}")
+
+    await conn.execute(f"DROP TABLE {TABLE}")
+    return result
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=3, help="matches RAGService.find_similar_context's default limit")
+    parser.add_argument("--hnsw-m", type=int, default=16)
+    parser.add_argument("--hnsw-ef-construction", type=int, default=64)
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[10, 20, 40, 100])
+    parser.add_argument("--probes", type=int, nargs="+", default=[1, 5, 10, 20])
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    conn = await asyncpg.connect(DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://"))
+    try:
+        await conn.execute("CREATE EXTENSION IF NOT EXISTS vector")
+        results = []
+        for rows in args.rows:
+            print(f"Benchmarking {rows} rows...", file=sys.stderr)
+            results.append(await benchmark_rows(conn, rows, args, rng))
+    finally:
+        await conn.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        await conn.close()
+
+    report = json.dumps({"k": args.k, "dim": args.dim, "queries": args.queries, "results": results}, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,140 @@
+"""
+Concurrent WebSocket load on /ws/chat: time to first token, tokens/s per stream and tail latency.
+
+Each simulated diner opens its own socket and asks --questions questions one
+after another. Point the API at benchmarks/fake_lm_studio.py to take the
+LLM host out of the measurement. Tokens are counted as words, which is exact
+with the fake server's one-word tokens.
+
+    python benchmarks/chat_load.py --clients 100 --questions 5 --output chat.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+import websockets
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import progress, summarize, write_report
+from benchmarks.embedding_benchmark import QUESTIONS
+from routers.chat import BUSY_MESSAGE
+
+
+class Turn:
+    def __init__(self):
+        self.outcome = "timeout"
+        self.ttft_ms = None
+        self.total_ms = None
+        self.frames = 0
+        self.tokens = 0
+        self.queued = False
+
+
+async def ask(socket, question: str, protocol: str, timeout: float) -> Turn:
+    turn = Turn()
+    answer = []
+    started = time.perf_counter()
+    await socket.send(json.dumps({"question": question}))
+    try:
+        async with asyncio.timeout(timeout):
+            while True:
+                frame = await socket.recv()
+                if protocol == "json":
+                    message = json.loads(frame)
+                    if "queue" in message:
+                        turn.queued = True
+                        continue
+                    text, done, error = message.get("chunk", ""), message.get("done"), message.get("error")
+                else:
+                    if frame.startswith("[QUEUE:"):
+                        turn.queued = True
+                        continue
+                    done = frame == "[DONE]"
+                    text = "" if done else frame
+                    error = "busy" if frame == BUSY_MESSAGE else None
+
+                if text:
+                    if turn.ttft_ms is None:
+                        turn.ttft_ms = (time.perf_counter() - started) * 1000
+                    turn.frames += 1
+                    answer.append(text)
+                if error:
+                    turn.outcome = error
+                if done:
+                    break
+    except TimeoutError:
+        return turn
+
+    turn.total_ms = (time.perf_counter() - started) * 1000
+    turn.tokens = len("".join(answer).split())
+    if turn.outcome == "timeout":
+        turn.outcome = "completed"
+    return turn
+
+
+async def diner(index: int, args, turns: list):
+    url = f"{args.url}?protocol=json" if args.protocol == "json" else args.url
+    rng = random.Random(args.seed + index)
+    await asyncio.sleep(rng.uniform(0, args.ramp_s))
+    async with websockets.connect(url, max_size=None) as socket:
+        for number in range(args.questions):
+            question = rng.choice(QUESTIONS)
+            if args.unique:
+                # Defeats the question and answer caches so every turn reaches the LLM
+                question = f"{question} (table {index}, order {number})"
+            turns.append(await ask(socket, question, args.protocol, args.timeout))
+            if args.think_ms:
+                await asyncio.sleep(args.think_ms / 1000.0)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="ws://localhost:8000/ws/chat")
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--questions", type=int, default=3, help="asked one after another on each socket")
+    parser.add_argument("--protocol", choices=["json", "legacy"], default="json")
+    parser.add_argument("--ramp-s", type=float, default=1.0, help="spread socket opens over this many seconds")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="pause between a diner's questions")
+    parser.add_argument("--timeout", type=float, default=120.0, help="per question")
+    parser.add_argument("--unique", action="store_true", help="make every question distinct")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    args = parser.parse_args()
+
+    turns: list = []
+    started = time.perf_counter()
+    results = await asyncio.gather(*(diner(i, args, turns) for i in range(args.clients)), return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    failures = [result for result in results if isinstance(result, Exception)]
+    for failure in failures[:5]:
+        progress(f"xx {type(failure).__name__}: {failure}")
+
+    completed = [turn for turn in turns if turn.outcome == "completed"]
+    outcomes = {}
+    for turn in turns:
+        outcomes[turn.outcome] = outcomes.get(turn.outcome, 0) + 1
+    rates = [turn.tokens / ((turn.total_ms - turn.ttft_ms) / 1000) for turn in completed
+             if turn.ttft_ms is not None and turn.total_ms > turn.ttft_ms]
+
+    write_report("chat_load", vars(args), {
+        "elapsed_s": round(elapsed, 2),
+        "socket_failures": len(failures),
+        "outcomes": outcomes,
+        "queued_turns": sum(turn.queued for turn in turns),
+        "answers_per_s": round(len(completed) / elapsed, 2) if elapsed else 0.0,
+        "ttft_ms": summarize([turn.ttft_ms for turn in completed if turn.ttft_ms is not None]),
+        "total_ms": summarize([turn.total_ms for turn in completed]),
+        "stream_tokens_per_s": summarize(rates, digits=1),
+        "frames_per_answer": summarize([turn.frames for turn in completed], digits=1),
+        "tokens_per_frame": round(sum(turn.tokens for turn in completed) /
+                                  max(1, sum(turn.frames for turn in completed)), 2),
+    }, args.output)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
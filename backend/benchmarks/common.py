@@ -0,0 +1,54 @@
+"""Helpers shared by the load-test scripts: percentiles and a common JSON report layout."""
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def summarize(samples: List[float], digits: int = 3) -> Dict[str, Any]:
+    # The same shape for every latency-like metric, so compare.py can diff any two reports
+    if not samples:
+        return {"count": 0}
+    return {
+        "count": len(samples),
+        "mean": round(statistics.mean(samples), digits),
+        "p50": round(percentile(samples, 0.50), digits),
+        "p95": round(percentile(samples, 0.95), digits),
+        "p99": round(percentile(samples, 0.99), digits),
+        "max": round(max(samples), digits),
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_report(benchmark: str, config: Dict[str, Any], results: Dict[str, Any], output: Optional[str]):
+    report = json.dumps({
+        "benchmark": benchmark,
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "config": config,
+        "results": results,
+    }, indent=2)
+    print(report)
+    if output:
+        with open(output, "w") as f:
+            f.write(report)
+
+
+def progress(message: str):
+    print(message, file=sys.stderr)
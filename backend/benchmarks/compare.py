@@ -0,0 +1,77 @@
+"""
+Compares two benchmark reports of the same kind and flags regressions.
+
+Latencies (anything under a *_ms key) should not grow and rates (*_per_s)
+should not shrink by more than --threshold percent. Exits with status 1 when
+something regressed, so it can gate CI.
+
+    python benchmarks/compare.py baseline.json candidate.json --threshold 10
+"""
+import argparse
+import json
+import sys
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+
+def leaves(node: Any, path: Tuple[str, ...] = ()) -> Iterator[Tuple[Tuple[str, ...], float]]:
+    if isinstance(node, dict):
+        for key, value in node.items():
+            yield from leaves(value, path + (str(key),))
+    elif isinstance(node, list):
+        for index, value in enumerate(node):
+            yield from leaves(value, path + (str(index),))
+    elif isinstance(node, (int, float)) and not isinstance(node, bool):
+        yield path, float(node)
+
+
+def direction(path: Tuple[str, ...]) -> Optional[int]:
+    # +1: higher is better, -1: lower is better, None: informational
+    if path[-1] == "count":
+        return None
+    for part in reversed(path):
+        if part.endswith("_per_s"):
+            return 1
+        if part.endswith("_ms"):
+            return -1
+    return None
+
+
+def compare(baseline: Dict[str, Any], candidate: Dict[str, Any], threshold: float):
+    before = dict(leaves(baseline.get("results", {})))
+    rows, regressions = [], 0
+    for path, new in leaves(candidate.get("results", {})):
+        better = direction(path)
+        old = before.get(path)
+        if better is None or old is None or old == 0:
+            continue
+        change = (new - old) / abs(old) * 100
+        regressed = change * better < -threshold
+        regressions += regressed
+        rows.append((".".join(path), old, new, change, regressed))
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    if baseline.get("benchmark") != candidate.get("benchmark"):
+        sys.exit(f"Cannot compare {baseline.get('benchmark')} with {candidate.get('benchmark')}")
+
+    rows, regressions = compare(baseline, candidate, args.threshold)
+    print(f"{baseline.get('benchmark')}: {baseline.get('revision')} -> {candidate.get('revision')}")
+    for name, old, new, change, regressed in rows:
+        print(f"{'REGRESSED ' if regressed else '          '}{name}: {old:g} -> {new:g} ({change:+.1f}%)")
+    print(f"{regressions} regression(s) beyond {args.threshold:g}%")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Encode throughput, latency, memory and retrieval agreement of the embedding backends.
+
+Each backend runs in its own spawned process so its RSS is not mixed up with
+the others'. The corpus is the seed menu's content chunks; a fixed set of
+diner questions is embedded one at a time (the chat path) for latency, and
+the corpus in batches (the bulk import path) for throughput. Retrieval
+agreement is the overlap of each backend's top-k menu items with the first
+backend's, per question.
+
+    python benchmarks/embedding_benchmark.py --backends sentence-transformers onnx openai --output embed.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+QUESTIONS = [
+    "What soups do you have?",
+    "Anything spicy with prawns?",
+    "Do you have vegetarian dishes?",
+    "What is good for dessert?",
+    "Which noodles are not spicy?",
+    "Something with coconut milk under $15",
+    "Do any dishes contain peanuts?",
+    "What do you recommend for someone who likes beef?",
+    "Is there a sweet drink?",
+    "What comes with sticky rice?",
+    "Do you have a green curry?",
+    "Which dishes contain shellfish?",
+]
+
+
+def rss_mb() -> float:
+    # Current resident set size; Linux only, 0 elsewhere
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def run_backend(kind, model_name, corpus, questions, batch_size, rounds, results):
+    from services.embedding_backends import create_backend
+
+    report = {"backend": kind, "rss_before_mb": round(rss_mb(), 1)}
+    try:
+        started = time.perf_counter()
+        backend = create_backend(model_name, kind=kind)
+        backend.encode(["warm up"])
+        report["load_s"] = round(time.perf_counter() - started, 2)
+        report["rss_loaded_mb"] = round(rss_mb(), 1)
+
+        latencies = []
+        for _ in range(rounds):
+            for question in questions:
+                started = time.perf_counter()
+                backend.encode([question])
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        encoded = 0
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for start in range(0, len(corpus), batch_size):
+                encoded += len(backend.encode(corpus[start:start + batch_size]))
+        elapsed = time.perf_counter() - started
+
+        report.update({
+            "dimension": int(backend.encode(["dimension probe"]).shape[1]),
+            "single_p50_ms": round(percentile(latencies, 0.50), 3),
+            "single_p99_ms": round(percentile(latencies, 0.99), 3),
+            "single_mean_ms": round(statistics.mean(latencies), 3),
+            "batch_size": batch_size,
+            "texts_per_s": round(encoded / elapsed, 1),
+            "rss_peak_mb": round(rss_mb(), 1),
+        })
+        results.put((report, backend.encode(corpus), backend.encode(questions)))
+        backend.close()
+    except Exception as e:
+        report["error"] = f"{type(e).__name__}: {e}"
+        results.put((report, None, None))
+
+
+def top_k(corpus_vectors, question_vectors, k):
+    corpus_vectors = corpus_vectors / np.linalg.norm(corpus_vectors, axis=1, keepdims=True)
+    question_vectors = question_vectors / np.linalg.norm(question_vectors, axis=1, keepdims=True)
+    scores = question_vectors @ corpus_vectors.T
+    return [set(np.argsort(-row)[:k].tolist()) for row in scores]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["sentence-transformers", "onnx"],
+                        help="the first one is the reference for retrieval agreement")
+    parser.add_argument("--model", default=os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"))
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("-k", type=int, default=3, help="matches RAGService.find_similar_context's default limit")
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    args = parser.parse_args()
+
+    from seed import MENU_ITEMS
+    from services.rag_service import RAGService
+
+    corpus = [RAGService.build_content_chunk(item["name"], item["description"], item.get("category"))
+              for item in MENU_ITEMS]
+
+    context = multiprocessing.get_context("spawn")
+    reports, reference = [], None
+    for kind in args.backends:
+        print(f"Benchmarking {kind}...", file=sys.stderr)
+        results = context.Queue()
+        process = context.Process(target=run_backend,
+                                  args=(kind, args.model, corpus, QUESTIONS, args.batch_size, args.rounds, results))
+        process.start()
+        report, corpus_vectors, question_vectors = results.get()
+        process.join()
+
+        if corpus_vectors is not None:
+            ranked = top_k(corpus_vectors, question_vectors, args.k)
+            if reference is None:
+                reference = (ranked, corpus_vectors)
+                report["retrieval_agreement"] = 1.0
+            else:
+                report["retrieval_agreement"] = round(statistics.mean(
+                    len(mine & theirs) / args.k for mine, theirs in zip(ranked, reference[0])), 4)
+                if corpus_vectors.shape == reference[1].shape:
+                    a = corpus_vectors / np.linalg.norm(corpus_vectors, axis=1, keepdims=True)
+                    b = reference[1] / np.linalg.norm(reference[1], axis=1, keepdims=True)
+                    report["mean_cosine_to_reference"] = round(float((a * b).sum(axis=1).mean()), 4)
+        reports.append(report)
+
+    report = json.dumps({"model": args.model, "corpus": len(corpus), "questions": len(QUESTIONS), "k": args.k,
+                         "results": reports}, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+An OpenAI-compatible stand-in for LM Studio with a configurable token rate.
+
+/v1/chat/completions streams "token" words at --tokens-per-s after a
+--first-token-ms delay (the prefill), so the backend's chat path can be
+load-tested without an LLM host. /v1/embeddings returns deterministic
+vectors for EMBEDDING_BACKEND=openai.
+
+    python benchmarks/fake_lm_studio.py --port 1234 --tokens-per-s 40 --first-token-ms 300
+    LM_STUDIO_URL=http://localhost:1234/v1 uvicorn main:app
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+import uuid
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+app = FastAPI(title="Fake LM Studio")
+settings = argparse.Namespace(tokens_per_s=40.0, first_token_ms=300.0, jitter_ms=0.0, answer_tokens=120,
+                              embedding_dim=384)
+stats = {"requests": 0, "active": 0, "completed": 0, "disconnected": 0, "tokens": 0}
+
+WORDS = ["the", "green", "curry", "is", "spicy", "and", "comes", "with", "jasmine", "rice", "we", "also",
+         "recommend", "pad", "thai", "for", "something", "milder", "enjoy", "your", "meal"]
+
+
+def prompt_tokens(messages) -> int:
+    return sum(len(message.get("content") or "") for message in messages) // 4
+
+
+def chunk(completion_id: str, model: str, delta=None, finish_reason=None, usage=None) -> str:
+    body = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [] if usage else [{"index": 0, "delta": delta or {}, "finish_reason": finish_reason}],
+    }
+    if usage:
+        body["usage"] = usage
+    return f"data: {json.dumps(body)}\n\n"
+
+
+async def sleep_jittered(seconds: float):
+    if settings.jitter_ms:
+        seconds += random.uniform(0, settings.jitter_ms / 1000.0)
+    await asyncio.sleep(seconds)
+
+
+@app.get("/v1/models")
+async def models():
+    return {"object": "list", "data": [{"id": "fake-model", "object": "model"}]}
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "fake-model")
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    prompt = prompt_tokens(body.get("messages", []))
+    answer_tokens = min(int(body.get("max_tokens") or settings.answer_tokens), settings.answer_tokens)
+    stats["requests"] += 1
+
+    async def stream():
+        stats["active"] += 1
+        sent = 0
+        try:
+            await sleep_jittered(settings.first_token_ms / 1000.0)
+            yield chunk(completion_id, model, {"role": "assistant", "content": ""})
+            interval = 1.0 / settings.tokens_per_s if settings.tokens_per_s > 0 else 0.0
+            for i in range(answer_tokens):
+                yield chunk(completion_id, model, {"content": WORDS[i % len(WORDS)] + " "})
+                sent += 1
+                if interval:
+                    await asyncio.sleep(interval)
+            yield chunk(completion_id, model, finish_reason="stop")
+            if (body.get("stream_options") or {}).get("include_usage"):
+                yield chunk(completion_id, model, usage={
+                    "prompt_tokens": prompt, "completion_tokens": sent, "total_tokens": prompt + sent})
+            yield "data: [DONE]\n\n"
+            stats["completed"] += 1
+        except asyncio.CancelledError:
+            # The client closed the stream, which is what the backend does on cancel
+            stats["disconnected"] += 1
+            raise
+        finally:
+            stats["active"] -= 1
+            stats["tokens"] += sent
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    inputs = body.get("input", [])
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    data = []
+    for index, content in enumerate(inputs):
+        # Same text, same vector; not semantically meaningful, only for load and plumbing tests
+        seed = int.from_bytes(hashlib.sha256(content.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).normal(size=settings.embedding_dim)
+        vector /= np.linalg.norm(vector)
+        data.append({"object": "embedding", "index": index, "embedding": vector.round(6).tolist()})
+    return {"object": "list", "data": data, "model": body.get("model", "fake-embedding"),
+            "usage": {"prompt_tokens": 0, "total_tokens": 0}}
+
+
+@app.get("/stats")
+async def get_stats():
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=1234)
+    parser.add_argument("--tokens-per-s", type=float, default=40.0, help="per stream; 0 streams as fast as possible")
+    parser.add_argument("--first-token-ms", type=float, default=300.0, help="delay before the first token")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="random extra delay added to the first token")
+    parser.add_argument("--answer-tokens", type=int, default=120)
+    parser.add_argument("--embedding-dim", type=int, default=384)
+    args = parser.parse_args()
+    for key in ("tokens_per_s", "first_token_ms", "jitter_ms", "answer_tokens", "embedding_dim"):
+        setattr(settings, key, getattr(args, key))
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Concurrent HTTP load on GET /menu/: latency percentiles, throughput and bytes per response.
+
+Runs the same request count for each scenario: a full uncompressed listing, a
+gzip listing, a category filter, a thin field projection, and conditional
+revalidation with If-None-Match (which should be all 304s).
+
+    python benchmarks/menu_load.py --requests 2000 --concurrency 50 --output menu.json
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import progress, summarize, write_report
+
+
+async def run_scenario(client: httpx.AsyncClient, url: str, params: dict, headers: dict, args):
+    latencies, statuses, sizes = [], {}, []
+    remaining = args.requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            # Stream so the body is counted as sent on the wire, before httpx decompresses it
+            async with client.stream("GET", url, params=params, headers=headers) as response:
+                size = 0
+                async for raw in response.aiter_raw():
+                    size += len(raw)
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            sizes.append(size)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "params": params,
+        "headers": headers,
+        "requests_per_s": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": summarize(latencies),
+        "statuses": {str(status): count for status, count in statuses.items()},
+        "bytes_per_response": round(sum(sizes) / len(sizes)) if sizes else 0,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000/menu/")
+    parser.add_argument("--requests", type=int, default=1000, help="per scenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    args = parser.parse_args()
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30.0) as client:
+        first = await client.get(args.url, headers={"Accept-Encoding": "identity"})
+        first.raise_for_status()
+        items = first.json()
+        etag = first.headers.get("etag")
+        category = next((item["category"] for item in items if item.get("category")), None)
+
+        scenarios = {
+            "full": ({}, {"Accept-Encoding": "identity"}),
+            "full_gzip": ({}, {"Accept-Encoding": "gzip"}),
+            "fields": ({"fields": "id,name,price,thumbnail_url"}, {"Accept-Encoding": "gzip"}),
+        }
+        if category:
+            scenarios["category"] = ({"category": category}, {"Accept-Encoding": "gzip"})
+        if etag:
+            scenarios["revalidate"] = ({}, {"Accept-Encoding": "identity", "If-None-Match": etag})
+
+        results = {"items": len(items)}
+        for name, (params, headers) in scenarios.items():
+            progress(f"Running {name}...")
+            results[name] = await run_scenario(client, args.url, params, headers, args)
+
+    write_report("menu_load", vars(args), results, args.output)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
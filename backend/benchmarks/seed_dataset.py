@@ -0,0 +1,105 @@
+"""
+Seeds Postgres with seed.py's MENU_ITEMS scaled to N items for load tests.
+
+Copies beyond the first get a numbered name, a varied description and a
+shifted price, so retrieval has distinct rows to rank rather than exact
+duplicates. Items go through import_menu_items (the same path as
+POST /menu/bulk) in batches, then the ANN index is brought up to date.
+Running API workers are told about each batch over LISTEN/NOTIFY; after
+--reset, restart them so they also forget the deleted items.
+
+--restaurants N gives each of N restaurants (bench_000, bench_001, ...) its
+own --items, to check that one restaurant's latency does not grow with the
+fleet; point chat_load.py at one of them with ?restaurant=bench_000.
+
+    python benchmarks/seed_dataset.py --items 10000 --reset
+    python benchmarks/seed_dataset.py --items 200 --restaurants 200
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from decimal import Decimal
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from database import AsyncSessionLocal, engine
+from models import DEFAULT_RESTAURANT
+from seed import MENU_ITEMS
+from services.ann_index import ensure_vector_index
+from services.menu_import import import_menu_items
+from services.schema import ensure_schema
+from benchmarks.common import progress
+
+VARIATIONS = [
+    "Chef's special version.",
+    "Made with extra chili.",
+    "A milder take for sensitive palates.",
+    "Served family style.",
+    "Cooked with organic vegetables.",
+    "Finished with crispy shallots.",
+    "Available as a vegetarian option.",
+    "Topped with toasted peanuts.",
+]
+
+
+def scaled_items(count: int, seed: int):
+    rng = random.Random(seed)
+    for i in range(count):
+        base = MENU_ITEMS[i % len(MENU_ITEMS)]
+        copy = i // len(MENU_ITEMS)
+        if copy == 0:
+            yield dict(base)
+            continue
+        price = Decimal(base["price"]) * Decimal(str(round(rng.uniform(0.8, 1.3), 2)))
+        yield {
+            **base,
+            "name": f"{base['name']} #{copy}",
+            "description": f"{base['description']} {rng.choice(VARIATIONS)}",
+            "price": str(price.quantize(Decimal("0.01"))),
+        }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=1000, help="per restaurant")
+    parser.add_argument("--restaurants", type=int, default=1, help="1 seeds the default restaurant")
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--reset", action="store_true", help="delete every existing menu item first")
+    args = parser.parse_args()
+
+    async with engine.begin() as conn:
+        await ensure_schema(conn)
+        if args.reset:
+            await conn.execute(text("TRUNCATE menu_items CASCADE"))
+
+    started = time.perf_counter()
+    restaurants = [DEFAULT_RESTAURANT] if args.restaurants <= 1 else [f"bench_{i:03d}" for i in range(args.restaurants)]
+    imported, total = 0, args.items * len(restaurants)
+    for restaurant_id in restaurants:
+        items = scaled_items(args.items, args.seed)
+        while True:
+            batch = [item for _, item in zip(range(args.batch), items)]
+            if not batch:
+                break
+            async with AsyncSessionLocal() as db:
+                result = await import_menu_items(db, batch, restaurant_id)
+            imported += len(result.item_ids)
+            for error in result.errors:
+                progress(f"xx {error['error']}")
+            progress(f"Imported {imported}/{total} items ({restaurant_id})")
+
+    async with engine.begin() as conn:
+        await conn.execute(text("ANALYZE menu_items"))
+        await conn.execute(text("ANALYZE menu_embeddings"))
+        await ensure_vector_index(conn)
+    progress(f"Seeded {imported} items in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
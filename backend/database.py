@@ -1,10 +1,34 @@
 import os
+import time
+from contextlib import asynccontextmanager
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql+asyncpg://user:password@db/menudb")
 
-engine = create_async_engine(DATABASE_URL, echo=True)
+# Connection pool sizing; chat sockets only borrow a connection per retrieval, so a few go a long way
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# asyncpg's per-connection prepared statement cache (0 disables it, e.g. behind pgbouncer in transaction mode)
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+DB_ECHO = os.getenv("DB_ECHO", "true").lower() == "true"
+
+engine = create_async_engine(
+    DATABASE_URL,
+    echo=DB_ECHO,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING,
+    connect_args={
+        "statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+        "prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+    },
+)
 AsyncSessionLocal = async_sessionmaker(
     bind=engine,
     class_=AsyncSession,
@@ -13,6 +37,44 @@ AsyncSessionLocal = async_sessionmaker(
 
 Base = declarative_base()
 
-async def get_db():
+
+class PoolStats:
+    """Time spent waiting for a pooled connection, across every borrow_session() call."""
+
+    borrows = 0
+    total_wait = 0.0
+    max_wait = 0.0
+
+    @classmethod
+    def record(cls, wait: float):
+        cls.borrows += 1
+        cls.total_wait += wait
+        cls.max_wait = max(cls.max_wait, wait)
+
+
+@asynccontextmanager
+async def borrow_session():
+    # Checks a connection out up front so the wait is measured, and returns it on exit
     async with AsyncSessionLocal() as session:
+        started = time.perf_counter()
+        await session.connection()
+        PoolStats.record(time.perf_counter() - started)
+        yield session
+
+
+def pool_status():
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "checked_in": pool.checkedin(),
+        "max_overflow": DB_MAX_OVERFLOW,
+        "borrows": PoolStats.borrows,
+        "wait_avg_ms": round(PoolStats.total_wait / PoolStats.borrows * 1000, 3) if PoolStats.borrows else 0.0,
+        "wait_max_ms": round(PoolStats.max_wait * 1000, 3),
+    }
+
+async def get_db():
+    async with borrow_session() as session:
         yield session
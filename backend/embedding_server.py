@@ -0,0 +1,25 @@
+import argparse
+import os
+import sys
+
+# Ensure we can import from the current directory
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the embedding model to every API worker on this host over a Unix socket.")
+    parser.add_argument("--socket", default=os.getenv("EMBEDDING_API_SOCKET", "/tmp/smart-menu-embeddings.sock"))
+    parser.add_argument("--model", default=os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"))
+    parser.add_argument("--backend", default=os.getenv("EMBEDDING_SIDECAR_BACKEND", "sentence-transformers"),
+                        choices=["sentence-transformers", "onnx"])
+    args = parser.parse_args()
+
+    import uvicorn
+    from services.embedding_sidecar import create_sidecar_app
+
+    if os.path.exists(args.socket):
+        os.unlink(args.socket)
+    # API workers then run with EMBEDDING_BACKEND=openai EMBEDDING_API_SOCKET=<socket>
+    uvicorn.run(create_sidecar_app(args.model, args.backend), uds=args.socket, log_level="warning")
+
+if __name__ == "__main__":
+    main()
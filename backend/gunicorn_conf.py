@@ -0,0 +1,27 @@
+import gc
+import os
+
+# Production entry point: gunicorn -c gunicorn_conf.py main:app
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+# Chat sockets stay open for minutes; don't let gunicorn kill a worker that is streaming
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+graceful_timeout = 30
+
+# Import the app, and with it the embedding model, once in the master before forking.
+# Workers share the weights copy-on-write instead of each loading torch + the model.
+# The master loads it with one intra-op thread (rag_service.py): a torch or ONNX Runtime thread
+# pool started before the fork is missing in the workers and deadlocks them, which is also why
+# reindex.py spawns its processes. Each worker then encodes on that single thread.
+# With EMBEDDING_BACKEND=openai and embedding_server.py as the sidecar there is nothing heavy to share,
+# and its HTTP client should not cross the fork, so the workers load it themselves.
+sidecar = os.getenv("EMBEDDING_BACKEND", "sentence-transformers") == "openai"
+preload_app = os.getenv("EMBEDDING_PRELOAD", "false" if sidecar else "true").lower() == "true"
+if preload_app:
+    os.environ.setdefault("EMBEDDING_PRELOAD", "true")
+
+
+def pre_fork(server, worker):
+    # Keep the garbage collector from touching (and so copying) every preloaded object in each worker
+    gc.freeze()
@@ -1,10 +1,32 @@
-from fastapi import FastAPI
+import time
+# Measured from here so the startup report includes import time (torch is no longer part of it)
+_import_started = time.perf_counter()
+
+from fastapi import FastAPI, Response
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import text
-from database import engine, Base
-from routers import menu, chat
+from database import engine, pool_status
+from services.schema import ensure_schema
+from services.ann_index import ensure_vector_index
+from routers import menu, menu_feed, chat, media
+from services.rag_service import GenerationStats, embedding_executor, RETRIEVAL_BACKEND
+from services.cache import question_cache, retrieval_cache
+from services.answer_cache import answer_cache
+from services.menu_snapshot import menu_snapshots
+from services.memory_index import memory_index
+from services.generation_scheduler import generation_scheduler
+from services.prompt_builder import PromptStats
+from services.menu_state import MenuState
+from services.warmup import StartupReport, warm_up
+from services import metrics
+from services.menu_events import menu_event_listener
+from services.menu_feed import menu_feed as menu_feed_service
+from services.faq_answers import faq_answers
 import asyncio
 
+StartupReport.record("import", _import_started)
+warm_up_task = None
+
 app = FastAPI(title="Smart Menu API")
 
 # CORS Setup
@@ -14,21 +36,108 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets the frontend read the version to resume /ws/menu from
+    expose_headers=["X-Menu-Version", "ETag"],
 )
 
+# Request timing for the menu routes, exported on /metrics
+app.add_middleware(metrics.RouteTimingMiddleware, prefixes=("/menu",))
+
 # Include Routers
 app.include_router(menu.router)
+app.include_router(menu_feed.router)
 app.include_router(chat.router)
+app.include_router(media.router)
 
 @app.on_event("startup")
 async def startup():
-    # Create tables if they don't exist
+    global warm_up_task
+    # Create tables if they don't exist; skipped when the database already has this schema
+    started = time.perf_counter()
     async with engine.begin() as conn:
-        # Enable pgvector extension
-        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
-        await conn.run_sync(Base.metadata.create_all)
+        migrated = await ensure_schema(conn)
+        await ensure_vector_index(conn)
+    StartupReport.record("schema_migrated" if migrated else "schema_check", started)
+
+    # Menu edits and model switches made by other workers invalidate this worker's caches
+    menu_event_listener.start()
+    # Precomputed FAQ answers, regenerated in the background after menu writes
+    faq_answers.start()
+
+    # Menu routes serve from here on; the model loads and warms up behind them
+    StartupReport.serving = True
+    warm_up_task = asyncio.create_task(warm_up())
+
+@app.on_event("shutdown")
+async def shutdown():
+    if warm_up_task and not warm_up_task.done():
+        warm_up_task.cancel()
+    await menu_event_listener.stop()
+    await faq_answers.stop()
+    embedding_executor.shutdown()
 
 @app.get("/")
 async def root():
     return {"message": "Welcome to Smart Menu API"}
 
+
+@app.get("/healthz")
+async def healthz(response: Response):
+    # Liveness: the process is up and the event loop answers, and warm-up has not given up for good
+    if StartupReport.failed:
+        response.status_code = 503
+        return {"status": "warm-up failed", "error": StartupReport.error}
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz(response: Response):
+    # Readiness: model loaded and warmed, DB reachable; chat answers at full speed from here
+    if not StartupReport.ready:
+        response.status_code = 503
+    return StartupReport.report()
+
+
+# Scrape-time views of state the services already keep
+metrics.CallbackMetric("smartmenu_generations_active", "Generations holding an LM Studio slot",
+                       lambda: generation_scheduler.active)
+metrics.CallbackMetric("smartmenu_generations_waiting", "Questions queued for a generation slot",
+                       lambda: generation_scheduler.stats()["waiting"])
+metrics.CallbackMetric("smartmenu_generations_total", "Finished generations by outcome",
+                       lambda: GenerationStats.outcomes, type="counter", labelname="outcome")
+metrics.CallbackMetric("smartmenu_db_pool_checked_out", "Pooled DB connections in use", lambda: engine.pool.checkedout())
+metrics.CallbackMetric("smartmenu_db_pool_size", "Pooled DB connections open", lambda: engine.pool.checkedin() + engine.pool.checkedout())
+metrics.CallbackMetric("smartmenu_menu_version", "In-process menu version", lambda: MenuState.version)
+metrics.CallbackMetric("smartmenu_faq_lookups_total", "Questions checked against the precomputed FAQ answers",
+                       lambda: {"hit": faq_answers.hits, "miss": faq_answers.misses}, type="counter", labelname="result")
+metrics.CallbackMetric("smartmenu_menu_feed_subscribers", "Open /ws/menu sockets on this worker",
+                       lambda: menu_feed_service.subscribers)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/metrics/traces")
+async def get_traces():
+    # Sampled per-request stage timings (TRACE_SAMPLE_RATE), newest first
+    return [trace.as_dict() for trace in metrics.traces]
+
+
+@app.get("/stats")
+async def stats():
+    return {
+        "menu_version": MenuState.version,
+        "startup": StartupReport.report(),
+        "retrieval_backend": RETRIEVAL_BACKEND,
+        "db_pool": pool_status(),
+        "caches": {
+            cache.name: cache.stats() for cache in (question_cache, retrieval_cache)
+        },
+        "answer_cache": answer_cache.stats(),
+        "faq": faq_answers.stats(),
+        "generation": {**generation_scheduler.stats(), **GenerationStats.stats()},
+        "prompt": PromptStats.stats(),
+        "menu_feed": menu_feed_service.stats(),
+        "menu_snapshots": menu_snapshots.stats(),
+        "memory_index": memory_index.stats(),
+    }
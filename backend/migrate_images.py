@@ -0,0 +1,59 @@
+import asyncio
+import sys
+import os
+
+# Ensure we can import from the current directory
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import select, update
+from database import AsyncSessionLocal
+from models import MenuItem
+from services.image_store import to_stored_value, InvalidImage
+from services.menu_changes import record_menu_changes, UPDATE
+
+BATCH_SIZE = 50
+
+async def migrate_images():
+    """
+    Moves base64 images still stored inline in menu_items.image_data into the
+    image store and replaces them with /media paths. Rows holding /images/...
+    paths (seed.py, fix_images.py) are left untouched. Safe to re-run.
+    """
+    print("Migrating inline images...")
+    migrated = 0
+    failed = 0
+    last_id = None
+
+    async with AsyncSessionLocal() as db:
+        while True:
+            # Keyset pagination keeps each batch of multi-megabyte rows small
+            query = select(MenuItem.id, MenuItem.restaurant_id, MenuItem.name, MenuItem.image_data).where(MenuItem.image_data.like("data:%"))
+            if last_id is not None:
+                query = query.where(MenuItem.id > last_id)
+            rows = (await db.execute(query.order_by(MenuItem.id).limit(BATCH_SIZE))).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            moved = {}
+            for row in rows:
+                try:
+                    stored = await asyncio.to_thread(to_stored_value, row.image_data)
+                except InvalidImage as e:
+                    print(f"xx {row.name}: {e}")
+                    failed += 1
+                    continue
+                await db.execute(update(MenuItem).where(MenuItem.id == row.id).values(image_data=stored))
+                print(f"Moved image for {row.name} -> {stored}")
+                moved.setdefault(row.restaurant_id, []).append(row.id)
+                migrated += 1
+
+            # Running API workers rebuild their menu snapshot and push the new image URLs to tablets
+            for restaurant_id, item_ids in moved.items():
+                await record_menu_changes(db, restaurant_id, [(item_id, UPDATE) for item_id in item_ids])
+            await db.commit()
+
+    print(f"Image migration completed: {migrated} moved, {failed} failed.")
+
+if __name__ == "__main__":
+    asyncio.run(migrate_images())
@@ -1,14 +1,22 @@
-from sqlalchemy import Column, String, Text, Numeric, DateTime, ForeignKey, text
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, Text, Numeric, DateTime, ForeignKey, Integer, BigInteger, Identity, Computed, Index, text
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
+from sqlalchemy.orm import deferred
 from sqlalchemy.sql import func
 from pgvector.sqlalchemy import Vector
 from database import Base
 import uuid
+import os
+
+# Must match the active embedding model; reindex.py migrates existing rows when it changes
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "384"))
+# Restaurant that requests without X-Restaurant-Id (and rows from before multi-restaurant hosting) belong to
+DEFAULT_RESTAURANT = os.getenv("DEFAULT_RESTAURANT", "default")
 
 class MenuItem(Base):
     __tablename__ = "menu_items"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    restaurant_id = Column(String(32), nullable=False, server_default=DEFAULT_RESTAURANT)
     name = Column(String(255), nullable=False)
     description = Column(Text, nullable=False)
     price = Column(Numeric(10, 2), nullable=False)
@@ -16,9 +24,76 @@ class MenuItem(Base):
     category = Column(String(50), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        Index("menu_items_restaurant_id_idx", "restaurant_id"),
+    )
+
 class MenuEmbedding(Base):
     __tablename__ = "menu_embeddings"
 
+    # Partition key: each restaurant's vectors (and their ANN index) live in their own table, see services/tenancy.py
+    restaurant_id = Column(String(32), primary_key=True)
     item_id = Column(UUID(as_uuid=True), ForeignKey("menu_items.id", ondelete="CASCADE"), primary_key=True)
-    embedding = Column(Vector(384), nullable=False) # Dimension for MiniLM-L6-v2
+    embedding = Column(Vector(EMBEDDING_DIM), nullable=False) # 384 for MiniLM-L6-v2
     content_chunk = Column(Text, nullable=False)
+    content_hash = Column(String(64), nullable=True) # sha256 of content_chunk
+    # Keyword side of hybrid retrieval; maintained by Postgres, never loaded by the ORM
+    content_tsv = deferred(Column(TSVECTOR, Computed("to_tsvector('english', content_chunk)", persisted=True)))
+
+    __table_args__ = (
+        Index("menu_embeddings_content_tsv_idx", "content_tsv", postgresql_using="gin"),
+        {"postgresql_partition_by": "LIST (restaurant_id)"},
+    )
+
+class EmbeddingModel(Base):
+    __tablename__ = "embedding_models"
+
+    name = Column(String(255), primary_key=True)
+    dimension = Column(Integer, nullable=False)
+    status = Column(String(20), nullable=False) # building | active | retired
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    activated_at = Column(DateTime(timezone=True), nullable=True)
+
+class MenuChange(Base):
+    __tablename__ = "menu_changes"
+
+    # The menu version: one per changed item, increasing in commit order (writers hold an advisory lock)
+    version = Column(BigInteger, Identity(always=True), primary_key=True)
+    restaurant_id = Column(String(32), nullable=False, server_default=DEFAULT_RESTAURANT)
+    item_id = Column(UUID(as_uuid=True), nullable=False) # not a foreign key: deletes are recorded too
+    op = Column(String(10), nullable=False) # add | update | delete
+    changed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("menu_changes_restaurant_id_version_idx", "restaurant_id", "version"),
+    )
+
+class FaqAnswer(Base):
+    __tablename__ = "faq_answers"
+
+    restaurant_id = Column(String(32), primary_key=True)
+    question = Column(Text, primary_key=True)
+    answer = Column(Text, nullable=False)
+    # menu_changes version the answer was generated at; newer changes for the restaurant make it stale
+    menu_version = Column(BigInteger, nullable=False)
+    generated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class FaqLease(Base):
+    __tablename__ = "faq_leases"
+
+    # Held by the one worker regenerating a restaurant's FAQ answers; an expired lease is free to take
+    restaurant_id = Column(String(32), primary_key=True)
+    holder = Column(String(64), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+# create_all never alters existing tables; these idempotent statements bring older databases up to date
+SCHEMA_UPGRADES = [
+    "ALTER TABLE menu_embeddings ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)",
+    "ALTER TABLE menu_embeddings ADD COLUMN IF NOT EXISTS content_tsv tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('english', content_chunk)) STORED",
+    "CREATE INDEX IF NOT EXISTS menu_embeddings_content_tsv_idx ON menu_embeddings USING gin (content_tsv)",
+    f"ALTER TABLE menu_items ADD COLUMN IF NOT EXISTS restaurant_id VARCHAR(32) NOT NULL DEFAULT '{DEFAULT_RESTAURANT}'",
+    "CREATE INDEX IF NOT EXISTS menu_items_restaurant_id_idx ON menu_items (restaurant_id)",
+    f"ALTER TABLE menu_changes ADD COLUMN IF NOT EXISTS restaurant_id VARCHAR(32) NOT NULL DEFAULT '{DEFAULT_RESTAURANT}'",
+    "CREATE INDEX IF NOT EXISTS menu_changes_restaurant_id_version_idx ON menu_changes (restaurant_id, version)",
+]
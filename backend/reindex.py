@@ -0,0 +1,28 @@
+import argparse
+import asyncio
+import sys
+import os
+
+# Ensure we can import from the current directory
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-embed every menu item with a new embedding model and switch retrieval to it.")
+    parser.add_argument("model", help="sentence-transformers model name, e.g. sentence-transformers/all-mpnet-base-v2")
+    parser.add_argument("--workers", type=int, default=0, help="encoding processes (default: one per core)")
+    parser.add_argument("--chunk-size", type=int, default=256, help="items read, encoded and committed per step")
+    parser.add_argument("--restart", action="store_true", help="discard a partially built index instead of resuming it")
+    args = parser.parse_args()
+
+    # Imported here so spawned encode workers, which re-import this module, stay light
+    from services.reindex import ReindexJob, ReindexError
+
+    job = ReindexJob(args.model, workers=args.workers, chunk_size=args.chunk_size, restart=args.restart)
+    try:
+        asyncio.run(job.run())
+    except ReindexError as e:
+        print(f"xx {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,160 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
-from sqlalchemy.ext.asyncio import AsyncSession
-from database import get_db
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from services.rag_service import RAGService
+from services.answer_cache import answer_cache
+from services.faq_answers import faq_answers
+from services.menu_state import MenuState
+from services.generation_scheduler import SchedulerBusy, generation_scheduler
+from services.stream_coalescer import coalesce
+from services.tenancy import InvalidRestaurant, resolve_restaurant
+from services import metrics
+import asyncio
 import json
+import uuid
+from contextlib import aclosing
 
 router = APIRouter(tags=["chat"])
 
+BUSY_MESSAGE = "Sorry, our concierge is helping a lot of guests right now. Please ask again in a moment."
+ERROR_MESSAGE = "Sorry, something went wrong while answering. Please try again."
+
+class ChatChannel:
+    """
+    Legacy text protocol: bare text chunks, "[QUEUE:n]" while waiting, and a
+    "[DONE]" sentinel. Frames carry no id; a superseded answer still ends with
+    "[DONE]", sent before any frame of the question that replaced it.
+    """
+
+    def __init__(self, websocket: WebSocket, request_id=None):
+        self.websocket = websocket
+        self.request_id = request_id
+
+    async def chunk(self, text: str):
+        await self.websocket.send_text(text)
+
+    async def queue_position(self, position: int):
+        await self.websocket.send_text(f"[QUEUE:{position}]")
+
+    async def done(self):
+        await self.websocket.send_text("[DONE]")
+
+    async def error(self, code: str, message: str):
+        await self.websocket.send_text(message)
+        await self.websocket.send_text("[DONE]")
+
+    async def cancelled(self, reason: str):
+        await self.websocket.send_text("[DONE]")
+
+class JsonChatChannel(ChatChannel):
+    """
+    Structured protocol (/ws/chat?protocol=json): every frame is a JSON object
+    with a "done" flag, e.g. {"chunk": "...", "done": false},
+    {"queue": 2, "done": false}, {"chunk": "", "done": true},
+    {"chunk": "...", "done": true, "error": "busy"} and, for an answer cut short
+    by a newer question, {"chunk": "", "done": true, "error": "superseded"}.
+    A question sent as {"question": "...", "id": ...} gets that id echoed in
+    every frame of its answer.
+    """
+
+    async def _send(self, frame: dict):
+        if self.request_id is not None:
+            frame["id"] = self.request_id
+        await self.websocket.send_json(frame)
+
+    async def chunk(self, text: str):
+        await self._send({"chunk": text, "done": False})
+
+    async def queue_position(self, position: int):
+        await self._send({"queue": position, "done": False})
+
+    async def done(self):
+        await self._send({"chunk": "", "done": True})
+
+    async def error(self, code: str, message: str):
+        await self._send({"chunk": message, "done": True, "error": code})
+
+    async def cancelled(self, reason: str):
+        await self._send({"chunk": "", "done": True, "error": reason})
+
+async def answer_question(channel: ChatChannel, connection_id: str, question: str, restaurant_id: str, reserved=None):
+    # Runs in its own task, so the trace (if this request is sampled) stays with this answer
+    metrics.start_trace()
+    metrics.annotate(question_chars=len(question), restaurant=restaurant_id)
+    try:
+        await stream_answer(channel, connection_id, question, restaurant_id, reserved)
+    except asyncio.CancelledError as e:
+        if e.args and e.args[0] == "superseded":
+            # End the answer explicitly so the client doesn't leave it waiting; a disconnected socket can't be told
+            await channel.cancelled("superseded")
+        raise
+    except Exception:
+        # Tell the client instead of leaving it waiting for a "done" that never comes
+        await channel.error("generation_failed", ERROR_MESSAGE)
+        raise
+    finally:
+        if reserved is not None:
+            # A place in line handed over by the superseded question, unless the LLM was never needed
+            generation_scheduler.abandon(reserved)
+
+async def stream_answer(channel: ChatChannel, connection_id: str, question: str, restaurant_id: str, reserved=None):
+    # 1. Embed the question (question embeddings don't depend on the menu, so restaurants share them)
+    with metrics.timed("embed"):
+        query_vector = await RAGService.embed_question(question)
+
+    # 2. Frequently asked questions have an answer ready for the current menu
+    faq_answer = await faq_answers.match(restaurant_id, query_vector, question)
+    if faq_answer is not None:
+        metrics.annotate(outcome="faq")
+        await channel.chunk(faq_answer)
+        await channel.done()
+        return
+
+    # 3. Find context in this restaurant's menu only
+    menu_version = MenuState.version_of(restaurant_id)
+    with metrics.timed("retrieve"):
+        context = await RAGService.find_similar_context(None, query_vector, question=question, restaurant_id=restaurant_id)
+
+    # 4. Replay a cached answer to a near-identical question, if any
+    cached = answer_cache.lookup(query_vector, context, restaurant_id)
+    if cached:
+        metrics.annotate(outcome="answer_cache")
+        # The whole answer is already here; one frame instead of one per original token
+        await channel.chunk("".join(cached.chunks))
+        await channel.done()
+        return
+
+    # 5. Stream response, reporting the queue position while waiting for a generation slot.
+    # Deltas are coalesced so a busy server sends a frame per flush window, not per token.
+    answer_chunks = []
+    try:
+        # aclosing: if a send fails the upstream stream is closed now, not whenever it is garbage collected
+        upstream = RAGService.chat_stream(context, question, connection_id, channel.queue_position, reserved)
+        async with aclosing(coalesce(upstream)) as stream:
+            async for chunk in stream:
+                answer_chunks.append(chunk)
+                await channel.chunk(chunk)
+    except SchedulerBusy:
+        await channel.error("busy", BUSY_MESSAGE)
+        return
+    answer_cache.store(question, query_vector, context, answer_chunks, restaurant_id, menu_version)
+
+    # Send an indicator that streaming is finished (optional, or just wait for next msg)
+    await channel.done()
+
 @router.websocket("/ws/chat")
-async def websocket_endpoint(websocket: WebSocket, db: AsyncSession = Depends(get_db)):
+async def websocket_endpoint(websocket: WebSocket):
+    # No session for the socket's lifetime; retrieval borrows a pooled connection only when it has to
     await websocket.accept()
+    # The restaurant is fixed for the socket: ?restaurant=<id> (or X-Restaurant-Id from non-browser clients)
+    try:
+        restaurant_id = resolve_restaurant(websocket.headers, websocket.query_params)
+    except InvalidRestaurant:
+        await websocket.close(code=1008)
+        return
+    metrics.OPEN_SOCKETS.inc()
+    connection_id = uuid.uuid4().hex
+    # Older frontends speak the legacy text protocol; newer clients opt in with ?protocol=json
+    channel_class = JsonChatChannel if websocket.query_params.get("protocol") == "json" else ChatChannel
+    current = None
     try:
         while True:
             # Receive message from client
@@ -19,21 +165,29 @@ async def websocket_endpoint(websocket: WebSocket, db: AsyncSession = Depends(ge
             if not question:
                 continue
 
-            # 1. Embed the question
-            query_vector = RAGService.generate_embedding(question)
-
-            # 2. Find context
-            context = await RAGService.find_similar_context(db, query_vector)
-
-            # 3. Stream response
-            async for chunk in RAGService.chat_stream(context, question):
-                await websocket.send_text(chunk)
-            
-            # Send an indicator that streaming is finished (optional, or just wait for next msg)
-            await websocket.send_text("[DONE]")
+            # A new question supersedes the one still being answered on this socket. If that one is still
+            # waiting for a generation slot, the new question takes over its place in line.
+            reserved = None
+            if current and not current.done():
+                reserved = generation_scheduler.supersede(connection_id)
+                current.cancel("superseded")
+                # Let it send its terminal frame first, so no frame of the new answer comes before it
+                await asyncio.wait({current})
+            channel = channel_class(websocket, message_data.get("id"))
+            current = asyncio.create_task(answer_question(channel, connection_id, question, restaurant_id, reserved))
+            current.add_done_callback(report_failure)
 
     except WebSocketDisconnect:
         print("Client disconnected")
     except Exception as e:
         print(f"Error: {e}")
         await websocket.close()
+    finally:
+        metrics.OPEN_SOCKETS.dec()
+        # The receive loop above is what notices a disconnect; stop generating for a diner who left
+        if current and not current.done():
+            current.cancel("disconnected")
+
+def report_failure(task: asyncio.Task):
+    if not task.cancelled() and task.exception():
+        print(f"Error: {task.exception()}")
@@ -0,0 +1,68 @@
+import re
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response
+from fastapi.concurrency import run_in_threadpool
+from services.image_store import find_variant
+
+router = APIRouter(prefix="/media", tags=["media"])
+
+# Content-addressed files never change, so clients may keep them forever
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _read_range(path, start: int, length: int) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(start)
+        return f.read(length)
+
+
+@router.get("/{digest}")
+async def get_image(digest: str, request: Request):
+    return await get_image_variant(digest, "original", request)
+
+
+@router.get("/{digest}/{variant}")
+async def get_image_variant(digest: str, variant: str, request: Request):
+    found = find_variant(digest, variant)
+    if not found:
+        raise HTTPException(status_code=404, detail="Image not found")
+    path, content_type = found
+
+    etag = f'"{digest}-{variant}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+
+    size = path.stat().st_size
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        match = RANGE.match(range_header.strip())
+        if not match or match.group(1) == match.group(2) == "":
+            raise HTTPException(status_code=416, detail="Invalid range", headers={"Content-Range": f"bytes */{size}"})
+
+        first, last = match.group(1), match.group(2)
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            # Suffix range: the final N bytes
+            start = max(size - int(last), 0)
+            end = size - 1
+
+        if start >= size or start > end:
+            raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+
+        body = await run_in_threadpool(_read_range, path, start, end - start + 1)
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        return Response(content=body, status_code=206, media_type=content_type, headers=headers)
+
+    body = await run_in_threadpool(path.read_bytes)
+    return Response(content=body, media_type=content_type, headers=headers)
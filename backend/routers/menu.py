@@ -1,85 +1,181 @@
-from fastapi import APIRouter, Depends, HTTPException
+from dataclasses import asdict
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
-from typing import List
+from sqlalchemy import delete
+from typing import List, Optional
+from uuid import UUID
 from database import get_db
-from models import MenuItem, MenuEmbedding
-from schemas import MenuItemCreate, MenuItemResponse
+from models import MenuItem
+from schemas import MenuItemCreate, MenuItemUpdate, MenuItemPatch, MenuItemResponse, BulkImportResponse, BatchPatchResponse
 from services.rag_service import RAGService
+from services.menu_state import MenuState
+from services.memory_index import memory_index
+from services.menu_changes import record_menu_changes, changes_since, ADD, DELETE
+from services.image_store import to_stored_value, InvalidImage
+from services.menu_snapshot import menu_snapshots
+from services.tenancy import ensure_partition, get_restaurant
+from services.menu_import import import_menu_items, parse_csv
+from services.menu_update import apply_item_updates, MenuItemsNotFound
+from services.image_reconcile import reconcile_images
 
 router = APIRouter(prefix="/menu", tags=["menu"])
 
+async def store_image(image_data):
+    # Decoding and resizing uploads is CPU work, keep it off the event loop
+    try:
+        return await run_in_threadpool(to_stored_value, image_data)
+    except InvalidImage as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+MENU_FIELDS = set(MenuItemResponse.model_fields) | set(MenuItemResponse.model_computed_fields)
+
 @router.get("/", response_model=List[MenuItemResponse])
-async def get_menu(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(MenuItem))
-    return result.scalars().all()
+async def get_menu(request: Request, category: Optional[str] = None, fields: Optional[str] = None,
+                   restaurant_id: str = Depends(get_restaurant)):
+    # Served from the restaurant's snapshot, built once per menu version; Postgres is only read after a write
+    projection = None
+    if fields:
+        projection = tuple(field.strip() for field in fields.split(",") if field.strip())
+        unknown = [field for field in projection if field not in MENU_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+    snapshot = menu_snapshots.get(restaurant_id)
+    await snapshot.refresh()
+    encoded = snapshot.body(category, projection)
+    headers = {
+        "ETag": encoded.etag,
+        "X-Menu-Version": str(snapshot.menu_version),
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding, X-Restaurant-Id",
+    }
+
+    if_none_match = request.headers.get("if-none-match", "")
+    if encoded.etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    body, content_encoding = encoded.for_encoding(request.headers.get("accept-encoding", ""))
+    if content_encoding:
+        headers["Content-Encoding"] = content_encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@router.get("/changes")
+async def get_menu_changes(since: int, db: AsyncSession = Depends(get_db), restaurant_id: str = Depends(get_restaurant)):
+    # Catch-up for a client that last saw menu version `since`; "reset" means reload GET /menu/
+    return await changes_since(db, restaurant_id, since)
+
+@router.post("/images/reconcile")
+async def reconcile_menu_images(dry_run: bool = False, replace_uploads: bool = False, db: AsyncSession = Depends(get_db),
+                                restaurant_id: str = Depends(get_restaurant)):
+    # Points the restaurant's items at the matching stock photos in one transaction; dry_run only reports
+    try:
+        report = await reconcile_images(db, restaurant_id, dry_run=dry_run, replace_uploads=replace_uploads)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return asdict(report)
 
 @router.post("/", response_model=MenuItemResponse)
-async def create_menu_item(item: MenuItemCreate, db: AsyncSession = Depends(get_db)):
-    # 1. Save Menu Item
-    new_item = MenuItem(**item.model_dump())
+async def create_menu_item(item: MenuItemCreate, db: AsyncSession = Depends(get_db),
+                           restaurant_id: str = Depends(get_restaurant)):
+    # 1. Save Menu Item (uploaded images are stored separately, the row keeps a /media path)
+    new_item = MenuItem(**item.model_dump(), restaurant_id=restaurant_id)
+    new_item.image_data = await store_image(item.image_data)
     db.add(new_item)
     await db.flush() # Get the ID
 
     # 2. Generate Embedding
-    content_chunk = f"Name: {item.name}. Description: {item.description}. Category: {item.category or 'General'}."
-    embedding_vector = RAGService.generate_embedding(content_chunk)
+    content_chunk = RAGService.build_content_chunk(item.name, item.description, item.category)
+    model, [embedding_vector] = await RAGService.embed_for_write(db, [content_chunk])
     
-    # 3. Save Embedding
-    new_embedding = MenuEmbedding(
-        item_id=new_item.id,
-        embedding=embedding_vector,
-        content_chunk=content_chunk
-    )
-    db.add(new_embedding)
+    # 3. Save Embedding (into the restaurant's partition, created with its first item)
+    await ensure_partition(db, restaurant_id)
+    [embedding_vector] = await RAGService.write_embeddings(db, restaurant_id, [{
+        "item_id": new_item.id,
+        "embedding": embedding_vector,
+        "content_chunk": content_chunk,
+        "content_hash": RAGService.content_hash(content_chunk),
+    }], model)
+    await record_menu_changes(db, restaurant_id, [(new_item.id, ADD)])
     
     await db.commit()
+    memory_index.upsert(restaurant_id, new_item.id, embedding_vector, content_chunk)
+    MenuState.bump(restaurant_id)
     await db.refresh(new_item)
     return new_item
 
-@router.put("/{item_id}", response_model=MenuItemResponse)
-async def update_menu_item(item_id: str, item_update: MenuItemCreate, db: AsyncSession = Depends(get_db)):
-    # 1. Check if item exists
-    query = select(MenuItem).where(MenuItem.id == item_id)
-    result = await db.execute(query)
-    db_item = result.scalar_one_or_none()
-    
-    if not db_item:
-        raise HTTPException(status_code=404, detail="Menu item not found")
-    
-    # 2. Update fields
-    for key, value in item_update.model_dump().items():
-        setattr(db_item, key, value)
-    
-    # 3. Regenerate Embedding (since description/name might have changed)
-    content_chunk = f"Name: {item_update.name}. Description: {item_update.description}. Category: {item_update.category or 'General'}."
-    embedding_vector = RAGService.generate_embedding(content_chunk)
-    
-    # 4. Update Embedding Record
-    # Check if embedding exists
-    emb_query = select(MenuEmbedding).where(MenuEmbedding.item_id == item_id)
-    emb_result = await db.execute(emb_query)
-    db_embedding = emb_result.scalar_one_or_none()
-    
-    if db_embedding:
-        db_embedding.embedding = embedding_vector
-        db_embedding.content_chunk = content_chunk
+def decode_csv(body: bytes) -> str:
+    # utf-8-sig also strips the byte order mark Excel writes
+    try:
+        return body.decode("utf-8-sig")
+    except UnicodeDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"CSV must be UTF-8 encoded (invalid byte at position {e.start})")
+
+@router.post("/bulk", response_model=BulkImportResponse)
+async def bulk_import_menu_items(request: Request, db: AsyncSession = Depends(get_db),
+                                 restaurant_id: str = Depends(get_restaurant)):
+    # Accepts a JSON array (or {"items": [...]}), a text/csv body, or a multipart CSV upload
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="Expected a CSV upload in the 'file' field")
+        rows = parse_csv(decode_csv(await upload.read()))
+    elif content_type.startswith("text/csv"):
+        rows = parse_csv(decode_csv(await request.body()))
     else:
-        # Create if missing for some reason
-        new_embedding = MenuEmbedding(
-            item_id=item_id,
-            embedding=embedding_vector,
-            content_chunk=content_chunk
-        )
-        db.add(new_embedding)
+        try:
+            payload = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be JSON or CSV")
+        rows = payload.get("items") if isinstance(payload, dict) else payload
+        if not isinstance(rows, list):
+            raise HTTPException(status_code=400, detail="Expected a list of menu items")
 
-    await db.commit()
-    await db.refresh(db_item)
-    return db_item
+    result = await import_menu_items(db, rows, restaurant_id)
+    return BulkImportResponse(imported=len(result.item_ids), item_ids=result.item_ids, errors=result.errors)
+
+async def patch_items(db: AsyncSession, updates, restaurant_id: str):
+    try:
+        return await apply_item_updates(db, updates, restaurant_id)
+    except MenuItemsNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except InvalidImage as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@router.put("/{item_id}", response_model=MenuItemResponse)
+async def update_menu_item(item_id: UUID, item_update: MenuItemCreate, db: AsyncSession = Depends(get_db),
+                           restaurant_id: str = Depends(get_restaurant)):
+    # Full replacement; the embedding is only regenerated if name/description/category changed
+    result = await patch_items(db, [(item_id, item_update.model_dump())], restaurant_id)
+    return result.items[0]
+
+@router.patch("/{item_id}", response_model=MenuItemResponse)
+async def patch_menu_item(item_id: UUID, item_update: MenuItemUpdate, db: AsyncSession = Depends(get_db),
+                          restaurant_id: str = Depends(get_restaurant)):
+    result = await patch_items(db, [(item_id, item_update.model_dump(exclude_unset=True))], restaurant_id)
+    return result.items[0]
+
+@router.patch("/", response_model=BatchPatchResponse)
+async def batch_patch_menu_items(patches: List[MenuItemPatch], db: AsyncSession = Depends(get_db),
+                                 restaurant_id: str = Depends(get_restaurant)):
+    # All patches are applied in one transaction; an unknown id rejects the whole batch
+    updates = [(patch.id, patch.model_dump(exclude_unset=True, exclude={"id"})) for patch in patches]
+    result = await patch_items(db, updates, restaurant_id)
+    return BatchPatchResponse(items=result.items, reembedded=result.reembedded)
 
 @router.delete("/{item_id}")
-async def delete_menu_item(item_id: str, db: AsyncSession = Depends(get_db)):
-    query = delete(MenuItem).where(MenuItem.id == item_id)
-    await db.execute(query)
+async def delete_menu_item(item_id: UUID, db: AsyncSession = Depends(get_db), restaurant_id: str = Depends(get_restaurant)):
+    # Another restaurant's item id deletes nothing
+    query = delete(MenuItem).where(MenuItem.id == item_id, MenuItem.restaurant_id == restaurant_id)
+    result = await db.execute(query)
+    if not result.rowcount:
+        # Nothing changed, so no change is recorded and no worker is notified
+        await db.rollback()
+        raise HTTPException(status_code=404, detail=f"Menu item not found: {item_id}")
+    await record_menu_changes(db, restaurant_id, [(item_id, DELETE)])
     await db.commit()
+    memory_index.remove(restaurant_id, item_id)
+    MenuState.bump(restaurant_id)
     return {"status": "success"}
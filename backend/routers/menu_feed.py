@@ -0,0 +1,32 @@
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from services.menu_feed import menu_feed
+from services.tenancy import InvalidRestaurant, resolve_restaurant
+
+router = APIRouter(tags=["menu"])
+
+@router.websocket("/ws/menu")
+async def menu_feed_endpoint(websocket: WebSocket):
+    """
+    Pushes {"type": "changes", "version", "changes": [{"op", "id", "item"}]}
+    whenever the menu is edited. Connect with ?since=<version> (from
+    X-Menu-Version or the last message) to get what was missed first;
+    without it the first message is {"type": "hello", "version"}. Only the
+    edits of the restaurant named by ?restaurant= are sent.
+    """
+    await websocket.accept()
+    try:
+        restaurant_id = resolve_restaurant(websocket.headers, websocket.query_params)
+    except InvalidRestaurant:
+        # 1008 "policy violation": retrying with the same restaurant id won't help
+        await websocket.close(code=1008)
+        return
+    since = websocket.query_params.get("since")
+    try:
+        await menu_feed.subscribe(websocket, restaurant_id, int(since) if since and since.isdigit() else None)
+        while True:
+            # Nothing is expected from the client; reading is how a disconnect is noticed
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        menu_feed.unsubscribe(websocket, restaurant_id)
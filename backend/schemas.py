@@ -1,8 +1,9 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, computed_field, field_serializer, field_validator
+from typing import List, Optional
 from uuid import UUID
 from datetime import datetime
 from decimal import Decimal
+from services.image_store import public_url
 
 class MenuItemBase(BaseModel):
     name: str
@@ -14,6 +15,24 @@ class MenuItemBase(BaseModel):
 class MenuItemCreate(MenuItemBase):
     pass
 
+class MenuItemUpdate(BaseModel):
+    # Every field optional; only the fields sent are changed
+    name: Optional[str] = None
+    description: Optional[str] = None
+    price: Optional[Decimal] = None
+    image_data: Optional[str] = None
+    category: Optional[str] = None
+
+    @field_validator("name", "description", "price")
+    @classmethod
+    def not_null(cls, value):
+        if value is None:
+            raise ValueError("may not be null")
+        return value
+
+class MenuItemPatch(MenuItemUpdate):
+    id: UUID
+
 class MenuItemResponse(MenuItemBase):
     id: UUID
     created_at: datetime
@@ -21,6 +40,29 @@ class MenuItemResponse(MenuItemBase):
     class Config:
         from_attributes = True
 
+    # Stored /media paths become absolute URLs; seed.py's /images/... paths pass through
+    @field_serializer("image_data")
+    def serialize_image_data(self, image_data: Optional[str]) -> Optional[str]:
+        return public_url(image_data)
+
+    @computed_field
+    @property
+    def thumbnail_url(self) -> Optional[str]:
+        return public_url(self.image_data, "thumb")
+
+class BulkImportError(BaseModel):
+    row: int
+    error: str
+
+class BulkImportResponse(BaseModel):
+    imported: int
+    item_ids: List[UUID]
+    errors: List[BulkImportError]
+
+class BatchPatchResponse(BaseModel):
+    items: List[MenuItemResponse]
+    reembedded: int
+
 class ChatRequest(BaseModel):
     question: str
 
@@ -1,13 +1,12 @@
 import asyncio
 import sys
 import os
-from decimal import Decimal
 
 # Ensure we can import from the current directory
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from database import AsyncSessionLocal
-from models import MenuItem, MenuEmbedding
+from services.menu_import import import_menu_items
 from services.rag_service import RAGService
 
 MENU_ITEMS = [
@@ -226,35 +225,14 @@ MENU_ITEMS = [
 async def seed():
     print("Starting database seed...")
     async with AsyncSessionLocal() as db:
-        for i, item_data in enumerate(MENU_ITEMS):
-            print(f"Adding item {i+1}/{len(MENU_ITEMS)}: {item_data['name']}")
-            
-            # 1. Create Menu Item
-            new_item = MenuItem(
-                name=item_data["name"],
-                description=item_data["description"],
-                price=Decimal(item_data["price"]),
-                category=item_data["category"],
-                image_data=item_data.get("image_data")
-            )
-            db.add(new_item)
-            await db.flush() # Get ID
+        # Records the configured model on a fresh database, or loads the one reindex.py made active
+        await RAGService.sync_active_model(db)
+        # Same validation, content_chunk format and batched embedding as POST /menu/bulk
+        result = await import_menu_items(db, MENU_ITEMS)
 
-            # 2. Generate Embedding
-            # Create a rich representation for the vector search
-            content_chunk = f"Name: {item_data['name']}. Category: {item_data['category']}. Description: {item_data['description']}."
-            embedding_vector = RAGService.generate_embedding(content_chunk)
-
-            # 3. Save Embedding
-            new_embedding = MenuEmbedding(
-                item_id=new_item.id,
-                embedding=embedding_vector,
-                content_chunk=content_chunk
-            )
-            db.add(new_embedding)
-        
-        await db.commit()
-    print("Database seed completed successfully!")
+    for error in result.errors:
+        print(f"xx Row {error['row']}: {error['error']}")
+    print(f"Database seed completed successfully! Added {len(result.item_ids)}/{len(MENU_ITEMS)} items.")
 
 if __name__ == "__main__":
     loop = asyncio.get_event_loop()
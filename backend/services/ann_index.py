@@ -0,0 +1,102 @@
+import math
+import os
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from services.schema import lock_schema
+
+# "hnsw", "ivfflat" or "none" (exact sequential scan)
+VECTOR_INDEX = os.getenv("VECTOR_INDEX", "hnsw").lower()
+# Build parameters; changing them rebuilds the index on the next startup
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "64"))
+IVFFLAT_LISTS = os.getenv("IVFFLAT_LISTS", "auto")
+# Query-time recall/latency knobs, applied per retrieval
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "40"))
+IVFFLAT_PROBES = int(os.getenv("IVFFLAT_PROBES", "10"))
+
+INDEX_PREFIX = "menu_embeddings_embedding_"
+# pgvector's own defaults; when configured values match, retrieval skips the extra SET round-trip
+PGVECTOR_DEFAULT_EF_SEARCH = 40
+PGVECTOR_DEFAULT_PROBES = 1
+
+
+def ivfflat_lists(rows: int) -> int:
+    # pgvector's guidance: rows / 1000 up to 1M rows, sqrt(rows) beyond that
+    if IVFFLAT_LISTS != "auto":
+        return int(IVFFLAT_LISTS)
+    if rows > 1_000_000:
+        return int(math.sqrt(rows))
+    return max(rows // 1000, 1)
+
+
+def index_definition(method: str, rows: int) -> Optional[str]:
+    if method == "hnsw":
+        with_clause = f"m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION}"
+    elif method == "ivfflat":
+        with_clause = f"lists = {ivfflat_lists(rows)}"
+    else:
+        return None
+    return f"USING {method} (embedding vector_cosine_ops) WITH ({with_clause})"
+
+
+async def ensure_vector_index(conn: AsyncConnection):
+    """
+    Creates, rebuilds or drops the ANN index on menu_embeddings.embedding so it
+    matches VECTOR_INDEX and the build parameters.
+
+    The parameters are recorded in the index comment; an index whose comment
+    differs (or one of another method) is replaced. menu_embeddings is
+    partitioned by restaurant, so this is a partitioned index: Postgres builds
+    one per restaurant partition, and new partitions get theirs on creation.
+    Runs under ensure_schema's lock, so concurrently starting workers don't
+    build the same index twice.
+    """
+    await lock_schema(conn)
+    existing = (await conn.execute(text("""
+        SELECT i.relname, obj_description(i.oid, 'pg_class')
+        FROM pg_index x
+        JOIN pg_class i ON i.oid = x.indexrelid
+        JOIN pg_class t ON t.oid = x.indrelid
+        JOIN pg_am am ON am.oid = i.relam
+        WHERE t.relname = 'menu_embeddings' AND am.amname IN ('hnsw', 'ivfflat')
+    """))).all()
+
+    rows = 0
+    if VECTOR_INDEX == "ivfflat":
+        # Every partition gets the same lists setting; size it for the largest restaurant
+        rows = (await conn.execute(text("""
+            SELECT coalesce(max(n), 0) FROM (SELECT count(*) AS n FROM menu_embeddings GROUP BY restaurant_id) per_restaurant
+        """))).scalar_one()
+    definition = index_definition(VECTOR_INDEX, rows)
+
+    if definition and any(comment == definition for _, comment in existing):
+        return
+    for name, _ in existing:
+        print(f"Dropping vector index {name}")
+        await conn.execute(text(f'DROP INDEX IF EXISTS "{name}"'))
+    if not definition:
+        return
+
+    if VECTOR_INDEX == "ivfflat" and rows == 0:
+        # IVFFlat centroids are trained on existing rows; an index built on an empty table is useless
+        print("Skipping IVFFlat index until menu_embeddings has rows")
+        return
+
+    name = f"{INDEX_PREFIX}{VECTOR_INDEX}_idx"
+    # Every vector index on menu_embeddings is gone by now, so an index still holding this name belongs to
+    # the table a reindex.py switch (before it renamed indexes) left behind; it would turn CREATE into a no-op
+    await conn.execute(text(f'DROP INDEX IF EXISTS "{name}"'))
+    print(f"Building vector index {name} {definition}")
+    await conn.execute(text(f'CREATE INDEX IF NOT EXISTS "{name}" ON menu_embeddings {definition}'))
+    await conn.execute(text(f"COMMENT ON INDEX \"{name}\" IS '{definition}'"))
+
+
+async def apply_search_settings(session: AsyncSession):
+    # SET LOCAL only lasts for the current transaction, so it never leaks to other pool users
+    if VECTOR_INDEX == "hnsw" and HNSW_EF_SEARCH != PGVECTOR_DEFAULT_EF_SEARCH:
+        await session.execute(text(f"SET LOCAL hnsw.ef_search = {HNSW_EF_SEARCH}"))
+    elif VECTOR_INDEX == "ivfflat" and IVFFLAT_PROBES != PGVECTOR_DEFAULT_PROBES:
+        await session.execute(text(f"SET LOCAL ivfflat.probes = {IVFFLAT_PROBES}"))
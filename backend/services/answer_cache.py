@@ -0,0 +1,133 @@
+import hashlib
+import itertools
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from services.menu_state import MenuState
+
+# Cosine similarity a new question needs with a cached one to reuse its answer
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92"))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "256"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    restaurant_id: str
+    vector: np.ndarray
+    chunks: List[str]
+    menu_version: int
+    context_key: str
+    created_at: float
+    hits: int = 0
+
+
+def _context_key(context: str) -> str:
+    return hashlib.sha1(context.encode("utf-8")).hexdigest()
+
+
+class SemanticAnswerCache:
+    """
+    Completed LLM answers keyed by question embedding.
+
+    A question reuses an answer when its embedding is within the similarity
+    threshold of a cached question that was answered for the same restaurant,
+    against the same menu version and the same retrieved context. The streamed deltas are stored
+    as-is so a hit replays exactly what the original client received.
+    """
+
+    def __init__(self, maxsize: int = ANSWER_CACHE_SIZE, threshold: float = ANSWER_CACHE_THRESHOLD,
+                 ttl: Optional[float] = ANSWER_CACHE_TTL):
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self.ttl = ttl
+        self._entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        self._ids = itertools.count()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, query_vector: Sequence[float], context: str, restaurant_id: str) -> Optional[CachedAnswer]:
+        context_key = _context_key(context)
+        menu_version = MenuState.version_of(restaurant_id)
+        now = time.monotonic()
+
+        candidates = []
+        for entry_id, entry in list(self._entries.items()):
+            if self.ttl and now - entry.created_at > self.ttl:
+                del self._entries[entry_id]
+                continue
+            if (entry.restaurant_id == restaurant_id and entry.menu_version == menu_version
+                    and entry.context_key == context_key):
+                candidates.append((entry_id, entry))
+
+        if candidates:
+            query = np.asarray(query_vector, dtype=np.float32)
+            query = query / (np.linalg.norm(query) or 1.0)
+            similarities = np.stack([entry.vector for _, entry in candidates]) @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.threshold:
+                entry_id, entry = candidates[best]
+                self._entries.move_to_end(entry_id)
+                entry.hits += 1
+                self.hits += 1
+                return entry
+
+        self.misses += 1
+        return None
+
+    def store(self, question: str, query_vector: Sequence[float], context: str, chunks: List[str],
+              restaurant_id: str, menu_version: int):
+        # menu_version is the version the context was retrieved at, not the current one
+        if self.maxsize <= 0 or not chunks or menu_version != MenuState.version_of(restaurant_id):
+            return
+        vector = np.asarray(query_vector, dtype=np.float32)
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+
+        self._entries[next(self._ids)] = CachedAnswer(
+            question=question,
+            restaurant_id=restaurant_id,
+            vector=vector,
+            chunks=list(chunks),
+            menu_version=menu_version,
+            context_key=_context_key(context),
+            created_at=time.monotonic(),
+        )
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self, restaurant_id: Optional[str] = None):
+        if restaurant_id is None:
+            self._entries.clear()
+            return
+        for entry_id, entry in list(self._entries.items()):
+            if entry.restaurant_id == restaurant_id:
+                del self._entries[entry_id]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        top = sorted(self._entries.values(), key=lambda entry: entry.hits, reverse=True)[:10]
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "top_entries": [{"restaurant": entry.restaurant_id, "question": entry.question, "hits": entry.hits}
+                            for entry in top],
+        }
+
+
+answer_cache = SemanticAnswerCache()
+
+# Answers describe a specific menu; drop them as soon as it changes (other restaurants' answers stay)
+MenuState.on_change(answer_cache.clear)
@@ -0,0 +1,192 @@
+import json
+import os
+from typing import List, Optional
+
+import numpy as np
+
+# "sentence-transformers" (PyTorch), "onnx" (ONNX Runtime, int8 by default) or "openai" (an OpenAI-compatible /v1/embeddings server)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "sentence-transformers")
+# ONNX file inside the model's Hugging Face repo, or a path to a local .onnx next to tokenizer.json.
+# The sentence-transformers repos ship int8 exports such as onnx/model_qint8_avx512_vnni.onnx as well.
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "onnx/model_quint8_avx2.onnx")
+# Used when a repo has no EMBEDDING_ONNX_FILE: most repos with an ONNX export only ship the fp32 one
+ONNX_FALLBACK_FILE = "onnx/model.onnx"
+# Threads ONNX Runtime uses inside one encode (0 lets it pick)
+EMBEDDING_ONNX_THREADS = int(os.getenv("EMBEDDING_ONNX_THREADS", "0"))
+# Server and model name for the "openai" backend; the server must produce the same vectors as the indexed model
+EMBEDDING_API_URL = os.getenv("EMBEDDING_API_URL", os.getenv("LM_STUDIO_URL", "http://host.docker.internal:1234/v1"))
+EMBEDDING_API_MODEL = os.getenv("EMBEDDING_API_MODEL", "")
+EMBEDDING_API_TIMEOUT = float(os.getenv("EMBEDDING_API_TIMEOUT", "30"))
+# Unix socket of a local embedding_server.py sidecar; when set, "openai" talks to it instead of EMBEDDING_API_URL
+EMBEDDING_API_SOCKET = os.getenv("EMBEDDING_API_SOCKET", "")
+
+
+class EmbeddingBackend:
+    """
+    Turns texts into vectors for one embedding model.
+
+    encode() is blocking and is run on EmbeddingExecutor's worker threads (or
+    in reindex worker processes), never on the event loop.
+    """
+
+    kind = ""
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+    def dimension(self) -> int:
+        return int(self.encode(["dimension probe"]).shape[1])
+
+    def close(self):
+        pass
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    kind = "sentence-transformers"
+
+    def __init__(self, model_name: str, threads: Optional[int] = None):
+        super().__init__(model_name)
+        # Imported here so the other backends never load PyTorch
+        from sentence_transformers import SentenceTransformer
+
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        self.model = SentenceTransformer(model_name)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(list(texts), batch_size=max(len(texts), 1), convert_to_numpy=True).astype(np.float32)
+
+    def dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+
+class OnnxBackend(EmbeddingBackend):
+    """
+    The same sentence-transformers model run by ONNX Runtime: tokenize, run the
+    exported transformer, mean-pool over the attention mask, L2-normalize.
+    Normalizing does not change cosine distances, so vectors stay comparable
+    with the ones sentence-transformers stored.
+    """
+
+    kind = "onnx"
+
+    def __init__(self, model_name: str, onnx_file: str = EMBEDDING_ONNX_FILE, threads: Optional[int] = None):
+        super().__init__(model_name)
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        if os.path.isfile(onnx_file):
+            model_path = onnx_file
+            model_dir = os.path.dirname(os.path.abspath(onnx_file))
+            tokenizer_path = os.path.join(model_dir, "tokenizer.json")
+            config_path = os.path.join(model_dir, "sentence_bert_config.json")
+        else:
+            from huggingface_hub import hf_hub_download
+
+            model_path = self._download_model(model_name, onnx_file)
+            tokenizer_path = hf_hub_download(model_name, "tokenizer.json")
+            try:
+                config_path = hf_hub_download(model_name, "sentence_bert_config.json")
+            except Exception:
+                config_path = ""
+
+        max_length = 256
+        if config_path and os.path.isfile(config_path):
+            with open(config_path) as f:
+                max_length = json.load(f).get("max_seq_length", max_length)
+
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+
+        options = onnxruntime.SessionOptions()
+        threads = threads if threads is not None else EMBEDDING_ONNX_THREADS
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {node.name for node in self.session.get_inputs()}
+
+    @staticmethod
+    def _download_model(model_name: str, onnx_file: str) -> str:
+        from huggingface_hub import hf_hub_download
+        from huggingface_hub.utils import EntryNotFoundError
+
+        candidates = list(dict.fromkeys([onnx_file, ONNX_FALLBACK_FILE]))
+        for candidate in candidates:
+            try:
+                path = hf_hub_download(model_name, candidate)
+            except EntryNotFoundError:
+                continue
+            if candidate != onnx_file:
+                print(f"{model_name} has no {onnx_file}; using {candidate}")
+            return path
+        raise ValueError(f"{model_name} has no ONNX export ({' or '.join(candidates)}); "
+                         f"set EMBEDDING_ONNX_FILE to one of its .onnx files or use EMBEDDING_BACKEND=sentence-transformers")
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(list(texts))
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+        hidden = self.session.run(None, {name: value for name, value in feeds.items() if name in self.input_names})[0]
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+
+class OpenAIEmbeddingBackend(EmbeddingBackend):
+    """
+    Calls an OpenAI-compatible /v1/embeddings endpoint: LM Studio serving the
+    same model, or the embedding_server.py sidecar shared by all API workers.
+    """
+
+    kind = "openai"
+
+    def __init__(self, model_name: str, base_url: str = EMBEDDING_API_URL, api_model: str = EMBEDDING_API_MODEL):
+        super().__init__(model_name)
+        import httpx
+        from openai import OpenAI
+
+        http_client = None
+        if EMBEDDING_API_SOCKET:
+            # The host part of the URL is ignored; requests go over the socket
+            base_url = "http://embedding-sidecar/v1"
+            http_client = httpx.Client(transport=httpx.HTTPTransport(uds=EMBEDDING_API_SOCKET),
+                                       timeout=EMBEDDING_API_TIMEOUT)
+
+        # Synchronous client: encode() already runs on a worker thread
+        self.client = OpenAI(base_url=base_url, api_key=os.getenv("EMBEDDING_API_KEY", "lm-studio"),
+                             timeout=EMBEDDING_API_TIMEOUT, http_client=http_client)
+        self.api_model = api_model or model_name
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        response = self.client.embeddings.create(model=self.api_model, input=list(texts))
+        rows = sorted(response.data, key=lambda row: row.index)
+        return np.array([row.embedding for row in rows], dtype=np.float32)
+
+    def close(self):
+        self.client.close()
+
+
+BACKENDS = {
+    SentenceTransformerBackend.kind: SentenceTransformerBackend,
+    OnnxBackend.kind: OnnxBackend,
+    OpenAIEmbeddingBackend.kind: OpenAIEmbeddingBackend,
+}
+
+
+def create_backend(model_name: str, kind: Optional[str] = None, threads: Optional[int] = None) -> EmbeddingBackend:
+    kind = kind or EMBEDDING_BACKEND
+    if kind not in BACKENDS:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND {kind!r}; expected one of {', '.join(BACKENDS)}")
+    if kind == OpenAIEmbeddingBackend.kind:
+        return OpenAIEmbeddingBackend(model_name)
+    return BACKENDS[kind](model_name, threads=threads)
@@ -0,0 +1,110 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Set, Tuple
+
+import numpy as np
+
+# How long the first request of a batch waits for others to join it
+EMBED_BATCH_WAIT_MS = float(os.getenv("EMBED_BATCH_WAIT_MS", "5"))
+# Largest number of texts sent to a single model.encode call
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "32"))
+# Worker threads running encode (torch releases the GIL inside the forward pass)
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "1"))
+
+
+class EmbeddingExecutor:
+    """
+    Runs embedding requests on a worker pool instead of the event loop.
+
+    Requests arriving within the wait window are gathered into one encode
+    call, so concurrent chat questions share a single forward pass.
+    """
+
+    def __init__(
+        self,
+        encode: Callable[[List[str]], np.ndarray],
+        max_batch: int = EMBED_MAX_BATCH,
+        wait_ms: float = EMBED_BATCH_WAIT_MS,
+        workers: int = EMBED_WORKERS,
+    ):
+        self._encode = encode
+        self.max_batch = max(1, max_batch)
+        self.wait = max(0.0, wait_ms) / 1000.0
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="embed")
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # The loop only keeps weak references to tasks; these are held until they finish
+        self._batches: Set[asyncio.Task] = set()
+
+    async def embed(self, content: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((content, future))
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.wait, self._flush)
+
+        return await future
+
+    async def embed_many(self, contents: List[str]) -> List[List[float]]:
+        """Encodes a known list of texts in max_batch sized chunks off the event loop."""
+        loop = asyncio.get_running_loop()
+        vectors: List[List[float]] = []
+        for start in range(0, len(contents), self.max_batch):
+            batch = contents[start:start + self.max_batch]
+            encoded = await loop.run_in_executor(self._pool, self._encode, batch)
+            vectors.extend(row.tolist() for row in encoded)
+        return vectors
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        while self._pending:
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+            task = asyncio.ensure_future(self._run_batch(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batch_done)
+
+    def _batch_done(self, task: asyncio.Task):
+        self._batches.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            # _run_batch hands encode errors to its callers; anything reaching here is a bug in it
+            print(f"Embedding batch failed: {task.exception()!r}")
+
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future]]):
+        loop = asyncio.get_running_loop()
+        texts = [content for content, _ in batch]
+        try:
+            encoded = await loop.run_in_executor(self._pool, self._encode, texts)
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), row in zip(batch, encoded):
+            # A caller that was cancelled while waiting leaves a done future behind
+            if not future.done():
+                future.set_result(row.tolist())
+
+    def shutdown(self):
+        # Callers still waiting get CancelledError instead of hanging on a pool that is going away
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for _, future in self._pending:
+            future.cancel()
+        self._pending.clear()
+        for task in list(self._batches):
+            task.cancel()
+        self._pool.shutdown(wait=False)
@@ -0,0 +1,95 @@
+import asyncio
+import os
+from collections import OrderedDict
+from typing import List, Optional, Tuple, Union
+
+from fastapi import FastAPI
+from pydantic import BaseModel
+
+from services.embedding_backends import EmbeddingBackend, create_backend
+from services.embedding_executor import EmbeddingExecutor
+
+# Models held at once: the active one and, around a reindex.py switch, the one workers that haven't switched yet ask for
+SIDECAR_MODELS = int(os.getenv("EMBEDDING_SIDECAR_MODELS", "2"))
+
+
+class EmbeddingsRequest(BaseModel):
+    input: Union[str, List[str]]
+    model: Optional[str] = None
+
+
+def create_sidecar_app(model_name: str, kind: str, max_models: int = SIDECAR_MODELS) -> FastAPI:
+    """
+    One process holding the embedding model for every API worker on the host,
+    speaking the OpenAI /v1/embeddings protocol. Questions from different
+    workers land in the same EmbeddingExecutor batches.
+
+    A request naming another model (after reindex.py switched it) loads that
+    model next to the current one, once, with its own executor. Workers on
+    either side of the switch are then both served without reloading; only a
+    model beyond max_models evicts the least recently used one.
+    """
+    app = FastAPI(title="Smart Menu embedding sidecar")
+    models: "OrderedDict[str, Tuple[EmbeddingBackend, EmbeddingExecutor]]" = OrderedDict()
+    state = {"requests": 0, "texts": 0, "loads": 0, "evictions": 0}
+    load_lock = asyncio.Lock()
+
+    def unload(backend: EmbeddingBackend, executor: EmbeddingExecutor):
+        executor.shutdown()
+        backend.close()
+
+    async def executor_for(name: str) -> EmbeddingExecutor:
+        if name not in models:
+            async with load_lock:
+                if name not in models:
+                    backend = await asyncio.to_thread(create_backend, name, kind)
+                    models[name] = (backend, EmbeddingExecutor(backend.encode))
+                    state["loads"] += 1
+                    print(f"Embedding sidecar serving {name} ({kind})")
+                    while len(models) > max(1, max_models):
+                        evicted, loaded = models.popitem(last=False)
+                        unload(*loaded)
+                        state["evictions"] += 1
+                        print(f"Embedding sidecar unloaded {evicted}")
+        models.move_to_end(name)
+        return models[name][1]
+
+    @app.on_event("startup")
+    async def load():
+        await executor_for(model_name)
+
+    @app.on_event("shutdown")
+    async def shutdown():
+        while models:
+            unload(*models.popitem()[1])
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: EmbeddingsRequest):
+        name = request.model or model_name
+        executor = await executor_for(name)
+        texts = [request.input] if isinstance(request.input, str) else request.input
+        if len(texts) == 1:
+            # Single questions are the ones worth batching across workers
+            vectors = [await executor.embed(texts[0])]
+        else:
+            vectors = await executor.embed_many(texts)
+        state["requests"] += 1
+        state["texts"] += len(texts)
+        return {
+            "object": "list",
+            "model": name,
+            "data": [{"object": "embedding", "index": i, "embedding": vector} for i, vector in enumerate(vectors)],
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        }
+
+    @app.get("/healthz")
+    async def healthz():
+        return {
+            "status": "ok" if models else "loading",
+            "model": model_name,
+            "loaded": list(models),
+            "backend": kind,
+            **state,
+        }
+
+    return app
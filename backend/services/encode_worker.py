@@ -0,0 +1,16 @@
+import numpy as np
+
+# Lives in its own module so spawned worker processes import nothing but the embedding backend
+_backend = None
+
+
+def init_worker(model_name: str, threads: int = 1):
+    global _backend
+    from services.embedding_backends import create_backend
+
+    # One process per core, so each process gets a single intra-op thread
+    _backend = create_backend(model_name, threads=threads)
+
+
+def encode(texts) -> np.ndarray:
+    return _backend.encode(list(texts))
@@ -0,0 +1,287 @@
+import asyncio
+import os
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+
+from database import AsyncSessionLocal, borrow_session
+from models import FaqAnswer
+from services.cache import normalize_question
+from services.menu_changes import origin
+from services.menu_state import MenuState
+from services.query_filters import extract_filters
+from services.rag_service import RAGService
+
+DEFAULT_FAQ_QUESTIONS = [
+    "What's spicy?",
+    "What are the vegetarian options?",
+    "What contains shellfish?",
+    "What's the best dessert?",
+    "What do you recommend?",
+    "What drinks do you have?",
+]
+# Questions answered ahead of time for every restaurant, separated by "|" (empty disables FAQ answers)
+FAQ_QUESTIONS = [q.strip() for q in os.getenv("FAQ_QUESTIONS", "|".join(DEFAULT_FAQ_QUESTIONS)).split("|") if q.strip()]
+# Cosine similarity a diner's question needs with an FAQ to be served its precomputed answer
+FAQ_THRESHOLD = float(os.getenv("FAQ_THRESHOLD", "0.9"))
+# FAQ answers generated at once; LM Studio's other slots stay free for diners
+FAQ_CONCURRENCY = int(os.getenv("FAQ_CONCURRENCY", "1"))
+# Quiet period after a menu write before regenerating, so a burst of admin edits costs one batch
+FAQ_DEBOUNCE_S = float(os.getenv("FAQ_DEBOUNCE_S", "10"))
+
+# Tells every worker to reload a restaurant's answers (services/menu_events.py listens)
+FAQ_CHANNEL = "faq_answers"
+# How long a regenerating worker's lease lasts; renewed before every batch, and left to expire if the worker dies
+FAQ_LEASE_S = int(os.getenv("FAQ_LEASE_S", "600"))
+
+LATEST_CHANGE = "SELECT coalesce(max(version), 0) FROM menu_changes WHERE restaurant_id = :restaurant"
+# Takes (or renews) the lease unless another holder's is still running; a row comes back only on success
+TAKE_LEASE = """
+    INSERT INTO faq_leases (restaurant_id, holder, expires_at)
+    VALUES (:restaurant, :holder, now() + make_interval(secs => :seconds))
+    ON CONFLICT (restaurant_id) DO UPDATE SET holder = EXCLUDED.holder, expires_at = EXCLUDED.expires_at
+    WHERE faq_leases.holder = EXCLUDED.holder OR faq_leases.expires_at < now()
+    RETURNING holder
+"""
+
+
+class FaqAnswers:
+    """
+    Answers to FAQ_QUESTIONS, generated in the background and stored in
+    faq_answers, so the most common questions skip retrieval and LM Studio.
+
+    A menu write schedules its restaurant; further writes push the batch back
+    by FAQ_DEBOUNCE_S, so a burst of edits regenerates once. Across workers a
+    per-restaurant lease row in faq_leases lets one of them do the work, and answers
+    are only replaced for questions whose stored answer predates the
+    restaurant's latest menu change. Until then, diners get live answers.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._pending: Dict[str, float] = {}
+        self._runner: Optional[asyncio.Task] = None
+        # restaurant -> (MenuState version the answers were loaded at, {question: answer})
+        self._loaded: Dict[str, Tuple[int, Dict[str, str]]] = {}
+        self._vectors: Optional[np.ndarray] = None
+        self.hits = 0
+        self.misses = 0
+        self.batches = 0
+        self.generated = 0
+        self.failed = 0
+        self.skipped = 0
+        self.skipped_constrained = 0
+
+    def start(self):
+        # Only the API process regenerates; scripts that write the menu (seed.py, ...) leave it to the API
+        self.enabled = bool(FAQ_QUESTIONS)
+
+    async def stop(self):
+        self.enabled = False
+        if self._runner and not self._runner.done():
+            self._runner.cancel()
+
+    def schedule(self, restaurant_id: str, delay: float = FAQ_DEBOUNCE_S):
+        if not self.enabled:
+            return
+        # Never brings a pending batch forward, only pushes it back
+        self._pending[restaurant_id] = max(self._pending.get(restaurant_id, 0.0), time.monotonic() + delay)
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.create_task(self._run())
+
+    def invalidate(self, restaurant_id: Optional[str] = None):
+        if restaurant_id is None:
+            self._loaded.clear()
+            # Possibly a new embedding model: the FAQ vectors are recomputed on the next question
+            self._vectors = None
+        else:
+            self._loaded.pop(restaurant_id, None)
+
+    async def _run(self):
+        while self._pending:
+            restaurant_id, due = min(self._pending.items(), key=lambda pending: pending[1])
+            wait = due - time.monotonic()
+            if wait > 0:
+                # Re-evaluated after the sleep: a write in the meantime may have pushed `due` back
+                await asyncio.sleep(wait)
+                continue
+            del self._pending[restaurant_id]
+            try:
+                await self.refresh(restaurant_id)
+            except Exception as e:
+                print(f"FAQ answers for {restaurant_id} failed: {e}")
+
+    async def _take_lease(self, restaurant_id: str, holder: str) -> bool:
+        async with borrow_session() as db:
+            taken = (await db.execute(text(TAKE_LEASE), {"restaurant": restaurant_id, "holder": holder,
+                                                         "seconds": FAQ_LEASE_S})).scalar()
+            await db.commit()
+        return taken is not None
+
+    async def _release_lease(self, restaurant_id: str, holder: str):
+        try:
+            async with borrow_session() as db:
+                await db.execute(text("DELETE FROM faq_leases WHERE restaurant_id = :restaurant AND holder = :holder"),
+                                 {"restaurant": restaurant_id, "holder": holder})
+                await db.commit()
+        except Exception as e:
+            # The lease expires on its own after FAQ_LEASE_S
+            print(f"Releasing the FAQ lease for {restaurant_id} failed: {e}")
+
+    async def _stale_questions(self, restaurant_id: str) -> Tuple[int, List[str]]:
+        async with borrow_session() as db:
+            version = (await db.execute(text(LATEST_CHANGE), {"restaurant": restaurant_id})).scalar_one()
+            fresh = set((await db.execute(text(
+                "SELECT question FROM faq_answers WHERE restaurant_id = :restaurant AND menu_version >= :version"
+            ), {"restaurant": restaurant_id, "version": version})).scalars())
+        return version, [question for question in FAQ_QUESTIONS if question not in fresh]
+
+    async def refresh(self, restaurant_id: str):
+        """
+        Regenerates the restaurant's stale FAQ answers, again if the menu changes meanwhile.
+
+        Generation can take minutes, so nothing is held open across it: the
+        lease is taken and renewed in short transactions on pooled
+        connections, and a worker that dies or is cancelled mid-batch leaves
+        a lease that simply expires.
+        """
+        holder = f"{origin()}:{uuid.uuid4().hex[:8]}"
+        if not await self._take_lease(restaurant_id, holder):
+            # Another worker is on it, and it re-checks the menu version before letting go
+            self.skipped += 1
+            return
+        try:
+            version, stale = await self._stale_questions(restaurant_id)
+            while stale:
+                if not await self._take_lease(restaurant_id, holder):
+                    # Our lease ran out mid-batch and another worker took over
+                    break
+                await self._generate(restaurant_id, stale, version)
+                latest, stale = await self._stale_questions(restaurant_id)
+                if latest == version:
+                    # Answers that failed stay stale; the next question or menu write schedules another try
+                    break
+                version = latest
+        finally:
+            await self._release_lease(restaurant_id, holder)
+
+    async def _generate(self, restaurant_id: str, questions: Sequence[str], version: int):
+        semaphore = asyncio.Semaphore(max(1, FAQ_CONCURRENCY))
+
+        async def answer(question: str) -> str:
+            # The same pipeline as a diner's question, through the generation scheduler like any other
+            async with semaphore:
+                vector = await RAGService.embed_question(question)
+                context = await RAGService.find_similar_context(None, vector, question=question, restaurant_id=restaurant_id)
+                return "".join([chunk async for chunk in RAGService.chat_stream(context, question)])
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(answer(question) for question in questions), return_exceptions=True)
+        rows = []
+        for question, result in zip(questions, results):
+            if isinstance(result, Exception) or not result:
+                # Left stale: diners get live answers and the next batch tries again
+                self.failed += 1
+                print(f"FAQ answer for {restaurant_id!r} / {question!r} failed: {result!r}")
+                continue
+            rows.append({"restaurant_id": restaurant_id, "question": question, "answer": result, "menu_version": version})
+
+        if rows:
+            statement = insert(FaqAnswer).values(rows)
+            statement = statement.on_conflict_do_update(
+                index_elements=[FaqAnswer.restaurant_id, FaqAnswer.question],
+                set_={"answer": statement.excluded.answer, "menu_version": statement.excluded.menu_version,
+                      "generated_at": text("now()")},
+            )
+            async with AsyncSessionLocal() as db:
+                await db.execute(statement)
+                await db.execute(text("SELECT pg_notify(:channel, :restaurant)"),
+                                 {"channel": FAQ_CHANNEL, "restaurant": restaurant_id})
+                await db.commit()
+        self.batches += 1
+        self.generated += len(rows)
+        print(f"Generated {len(rows)}/{len(questions)} FAQ answers for {restaurant_id} "
+              f"in {time.perf_counter() - started:.1f}s")
+
+    async def _answers(self, restaurant_id: str) -> Dict[str, str]:
+        # Read before loading: a write during the load leaves a version mismatch, so the next question reloads
+        version = MenuState.version_of(restaurant_id)
+        loaded = self._loaded.get(restaurant_id)
+        if loaded is not None and loaded[0] == version:
+            return loaded[1]
+
+        async with borrow_session() as db:
+            rows = (await db.execute(text(f"""
+                SELECT question, answer FROM faq_answers
+                WHERE restaurant_id = :restaurant AND menu_version >= ({LATEST_CHANGE})
+            """), {"restaurant": restaurant_id})).all()
+        answers = {row.question: row.answer for row in rows if row.question in FAQ_QUESTIONS}
+        self._loaded[restaurant_id] = (version, answers)
+        if len(answers) < len(FAQ_QUESTIONS):
+            # First questions after a restart, a new restaurant, or a batch that failed
+            self.schedule(restaurant_id, delay=0)
+        return answers
+
+    async def _faq_vectors(self) -> np.ndarray:
+        if self._vectors is None:
+            vectors = np.asarray(await RAGService.embed_many([normalize_question(q) for q in FAQ_QUESTIONS]),
+                                 dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            self._vectors = vectors / np.clip(norms, 1e-12, None)
+        return self._vectors
+
+    async def match(self, restaurant_id: str, query_vector: Sequence[float], question: str) -> Optional[str]:
+        """The precomputed answer for the FAQ closest to this question, if it is close enough and current."""
+        if not self.enabled:
+            return None
+        if extract_filters(question).constrained:
+            # "What's spicy under $10?" embeds right next to "What's spicy?", but the canned answer ignores the price
+            self.skipped_constrained += 1
+            return None
+        answers = await self._answers(restaurant_id)
+        if not answers:
+            self.misses += 1
+            return None
+
+        query = np.asarray(query_vector, dtype=np.float32)
+        similarities = await self._faq_vectors() @ (query / (np.linalg.norm(query) or 1.0))
+        for i in np.argsort(-similarities):
+            if similarities[i] < FAQ_THRESHOLD:
+                break
+            answer = answers.get(FAQ_QUESTIONS[i])
+            if answer is not None:
+                self.hits += 1
+                return answer
+        self.misses += 1
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "questions": len(FAQ_QUESTIONS),
+            "threshold": FAQ_THRESHOLD,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "pending": sorted(self._pending),
+            "batches": self.batches,
+            "generated": self.generated,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "skipped_constrained": self.skipped_constrained,
+        }
+
+
+faq_answers = FaqAnswers()
+
+
+@MenuState.on_change
+def _menu_changed(restaurant_id: Optional[str]):
+    faq_answers.invalidate(restaurant_id)
+    # Every worker hears about the write; the lease in refresh() lets only one regenerate
+    if restaurant_id is not None:
+        faq_answers.schedule(restaurant_id)
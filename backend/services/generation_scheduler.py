@@ -0,0 +1,152 @@
+import asyncio
+import os
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Optional
+
+# Generations LM Studio runs at once; more than this just slows every stream down
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+# Questions allowed to wait for a slot before new ones get an immediate "busy"
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "32"))
+
+_GRANTED = object()
+
+
+class SchedulerBusy(Exception):
+    pass
+
+
+class _Ticket:
+    def __init__(self, connection_id: Hashable):
+        self.connection_id = connection_id
+        self.events: asyncio.Queue = asyncio.Queue()
+        self.granted = False
+        # A ticket handed over by supersede() is unclaimed until the next question passes it to slot()
+        self.claimed = True
+
+
+class GenerationScheduler:
+    """
+    Admission control in front of the LLM client.
+
+    At most max_concurrent generations run at once; further requests wait in
+    a bounded FIFO queue. A connection that asks again while its previous
+    question is queued hands that place in line to the new question (see
+    supersede()). When the queue is full, new requests are rejected
+    immediately rather than piling up behind a saturated model.
+    """
+
+    def __init__(self, max_concurrent: int = LLM_MAX_CONCURRENCY, max_queue: int = LLM_MAX_QUEUE):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.active = 0
+        self._waiting: Deque[_Ticket] = deque()
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.superseded = 0
+
+    @asynccontextmanager
+    async def slot(self, connection_id: Hashable,
+                   on_position: Optional[Callable[[int], Awaitable[Any]]] = None,
+                   reserved: Optional[_Ticket] = None):
+        if connection_id is None:
+            connection_id = object()
+        await self._acquire(connection_id, on_position, reserved)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def supersede(self, connection_id: Hashable) -> Optional[_Ticket]:
+        """
+        For a connection asking a new question while its previous one waits for
+        a slot: swaps the waiting ticket for an unclaimed one in the same place
+        and returns it. The caller cancels the previous question, passes the
+        ticket to slot() for the new one, and abandon()s it if the new question
+        ends without generating. Returns None if nothing of this connection waits.
+        """
+        previous = next((t for t in self._waiting if t.connection_id == connection_id), None)
+        if previous is None:
+            return None
+        ticket = _Ticket(connection_id)
+        ticket.claimed = False
+        self._waiting[self._waiting.index(previous)] = ticket
+        self.superseded += 1
+        return ticket
+
+    def abandon(self, ticket: _Ticket):
+        # The question a ticket was handed to ended (cached answer, error, cancel) without claiming it
+        if ticket.claimed:
+            return
+        ticket.claimed = True
+        if ticket.granted:
+            self._release()
+        elif ticket in self._waiting:
+            self._waiting.remove(ticket)
+            self._notify_positions()
+
+    async def _acquire(self, connection_id: Hashable, on_position, reserved: Optional[_Ticket]):
+        if reserved is not None and not reserved.claimed:
+            # The place in line of the question this one superseded; it may even have been granted already
+            ticket = reserved
+            ticket.claimed = True
+        elif self.active < self.max_concurrent and not self._waiting:
+            self.active += 1
+            self.admitted += 1
+            return
+        elif len(self._waiting) >= self.max_queue:
+            self.rejected += 1
+            raise SchedulerBusy()
+        else:
+            ticket = _Ticket(connection_id)
+            self._waiting.append(ticket)
+            self.queued += 1
+
+        try:
+            if on_position and not ticket.granted:
+                await on_position(self._waiting.index(ticket) + 1)
+            while True:
+                event = await ticket.events.get()
+                if event is _GRANTED:
+                    self.admitted += 1
+                    return
+                if on_position and not ticket.granted:
+                    await on_position(event)
+        except BaseException:
+            if ticket.granted:
+                # The slot was handed to us but we are not going to use it
+                self._release()
+            elif ticket in self._waiting:
+                self._waiting.remove(ticket)
+                self._notify_positions()
+            raise
+
+    def _release(self):
+        if self._waiting:
+            # Hand the slot straight to the next ticket; active stays the same
+            ticket = self._waiting.popleft()
+            ticket.granted = True
+            ticket.events.put_nowait(_GRANTED)
+            self._notify_positions()
+        else:
+            self.active -= 1
+
+    def _notify_positions(self):
+        for position, ticket in enumerate(self._waiting, start=1):
+            ticket.events.put_nowait(position)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "waiting": len(self._waiting),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "superseded": self.superseded,
+        }
+
+
+generation_scheduler = GenerationScheduler()
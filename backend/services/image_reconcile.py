@@ -0,0 +1,162 @@
+import os
+import re
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import MenuItem
+from services.image_store import MEDIA_PREFIX
+from services.menu_changes import record_menu_changes, UPDATE
+from services.menu_state import MenuState
+
+# The stock dish photos the frontend serves under /images/ (frontend/public/images in this repo)
+IMAGE_ASSET_DIR = Path(os.getenv("IMAGE_ASSET_DIR", os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "frontend", "public", "images")))
+IMAGE_ASSET_PREFIX = "/images/"
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp", ".gif"}
+# Share of a file's name tokens an item name must contain, so "Duck Salad" doesn't get red_curry_roast_duck.png
+MIN_FILE_COVERAGE = 0.5
+
+TIMESTAMP_SUFFIX = re.compile(r"_\d{6,}$")
+NON_LETTERS = re.compile(r"[^a-z]+")
+
+
+def tokens(name: str) -> Tuple[str, ...]:
+    # "Pad Thai!" and the stem of "Pad_Thai_1769850416425.png" both become ("pad", "thai")
+    stem = TIMESTAMP_SUFFIX.sub("", name.lower())
+    return tuple(token for token in NON_LETTERS.split(stem) if token)
+
+
+def file_tokens(filename: str) -> Tuple[str, ...]:
+    return tokens(os.path.splitext(filename)[0])
+
+
+class AssetIndex:
+    """
+    The image directory's files, tokenized once, with an inverted index from
+    token to files. Matching an item only scores the files that share a
+    token with its name, instead of re-normalizing every file per item.
+    """
+
+    def __init__(self, filenames: List[str]):
+        self.filenames = sorted(filenames)
+        self._names = set(self.filenames)
+        self._tokens = [frozenset(file_tokens(filename)) for filename in self.filenames]
+        self._exact: Dict[Tuple[str, ...], int] = {}
+        self._postings: Dict[str, Set[int]] = defaultdict(set)
+        for i, filename in enumerate(self.filenames):
+            self._exact.setdefault(file_tokens(filename), i)
+            for token in self._tokens[i]:
+                self._postings[token].add(i)
+
+    @classmethod
+    def scan(cls, directory: Path = IMAGE_ASSET_DIR) -> "AssetIndex":
+        if not directory.is_dir():
+            raise FileNotFoundError(f"Image directory {directory} does not exist (set IMAGE_ASSET_DIR)")
+        return cls([entry.name for entry in os.scandir(directory)
+                    if entry.is_file() and os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS])
+
+    def __len__(self) -> int:
+        return len(self.filenames)
+
+    def __contains__(self, filename: str) -> bool:
+        return filename in self._names
+
+    def match(self, item_name: str) -> Tuple[Optional[str], str]:
+        """Returns (filename, "exact" | "tokens") or (None, "none" | "ambiguous")."""
+        item_tokens = tokens(item_name)
+        exact = self._exact.get(item_tokens)
+        if exact is not None:
+            return self.filenames[exact], "exact"
+
+        scores: Dict[int, int] = defaultdict(int)
+        for token in set(item_tokens):
+            for i in self._postings.get(token, ()):
+                scores[i] += 1
+        ranked = sorted(
+            ((score, score / len(self._tokens[i]), i) for i, score in scores.items()
+             if score / len(self._tokens[i]) >= MIN_FILE_COVERAGE),
+            key=lambda candidate: (-candidate[0], -candidate[1], candidate[2]),
+        )
+        if not ranked:
+            return None, "none"
+        if len(ranked) > 1 and ranked[0][:2] == ranked[1][:2]:
+            # Two files fit equally well; guessing would just swap one wrong photo for another
+            return None, "ambiguous"
+        return self.filenames[ranked[0][2]], "tokens"
+
+
+@dataclass
+class ReconcileReport:
+    dry_run: bool
+    directory: str
+    files: int = 0
+    items: int = 0
+    unchanged: int = 0
+    updates: List[Dict[str, Any]] = field(default_factory=list)
+    unmatched: List[Dict[str, Any]] = field(default_factory=list)
+    kept_uploads: int = 0
+
+
+async def reconcile_images(db: AsyncSession, restaurant_id: Optional[str] = None, dry_run: bool = False,
+                           directory: Path = IMAGE_ASSET_DIR, replace_uploads: bool = False) -> ReconcileReport:
+    """
+    Points every menu item at the stock photo in `directory` that matches its
+    name, in one pass and one transaction.
+
+    Only image_data changes, so no embedding is touched. Images uploaded
+    through the API (/media/... or inline data) are kept unless
+    replace_uploads is set. With dry_run the report lists what would change.
+    """
+    index = AssetIndex.scan(directory)
+    report = ReconcileReport(dry_run=dry_run, directory=str(directory), files=len(index))
+
+    # Only a prefix of image_data: enough to compare against /images/ paths without pulling inline base64
+    query = select(MenuItem.id, MenuItem.restaurant_id, MenuItem.name, func.left(MenuItem.image_data, 256).label("image"))
+    if restaurant_id is not None:
+        query = query.where(MenuItem.restaurant_id == restaurant_id)
+    rows = (await db.execute(query.order_by(MenuItem.restaurant_id, MenuItem.name))).all()
+    report.items = len(rows)
+
+    changes: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for row in rows:
+        current = row.image or ""
+        uploaded = current.startswith(MEDIA_PREFIX) or current.startswith("data:")
+        if uploaded and not replace_uploads:
+            report.kept_uploads += 1
+            continue
+
+        filename, how = index.match(row.name)
+        if filename is None:
+            # An existing /images/ path that still resolves is left alone even without a match
+            existing = current[len(IMAGE_ASSET_PREFIX):] if current.startswith(IMAGE_ASSET_PREFIX) else None
+            if existing in index:
+                report.unchanged += 1
+            else:
+                report.unmatched.append({"id": str(row.id), "restaurant": row.restaurant_id, "name": row.name,
+                                         "reason": how, "current": current[:80]})
+            continue
+
+        desired = f"{IMAGE_ASSET_PREFIX}{filename}"
+        if current == desired:
+            report.unchanged += 1
+            continue
+        changes[row.restaurant_id].append({"id": row.id, "image_data": desired})
+        report.updates.append({"id": str(row.id), "restaurant": row.restaurant_id, "name": row.name,
+                               "old": current[:80], "new": desired, "match": how})
+
+    if dry_run or not changes:
+        return report
+
+    # ORM bulk UPDATE by primary key: one executemany, plus the menu_changes rows, in one commit
+    for restaurant, values in changes.items():
+        await db.execute(update(MenuItem), values)
+        await record_menu_changes(db, restaurant, [(value["id"], UPDATE) for value in values])
+    await db.commit()
+    for restaurant in changes:
+        MenuState.bump(restaurant)
+    return report
@@ -0,0 +1,133 @@
+import base64
+import binascii
+import hashlib
+import io
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from PIL import Image
+
+# Where uploaded images and their resized variants live on disk
+IMAGE_STORE_DIR = Path(os.getenv("IMAGE_STORE_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "media")))
+# Public origin of this API, used to turn stored /media paths into URLs the frontend can load
+MEDIA_BASE_URL = os.getenv("MEDIA_BASE_URL", "http://localhost:8000").rstrip("/")
+# Resized variants generated once on upload, as name:max_edge pairs
+IMAGE_VARIANTS: Dict[str, int] = {
+    name: int(size)
+    for name, size in (
+        pair.split(":") for pair in os.getenv("IMAGE_VARIANTS", "thumb:320,medium:800").split(",") if pair
+    )
+}
+
+MEDIA_PREFIX = "/media/"
+DATA_URI = re.compile(r"^data:(?P<mime>[\w.+-]+/[\w.+-]+)?(;[\w-]+=[\w.-]+)*;base64,(?P<data>.*)$", re.DOTALL)
+DIGEST = re.compile(r"^[0-9a-f]{64}$")
+
+CONTENT_TYPES = {
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+    "gif": "image/gif",
+    "webp": "image/webp",
+}
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+def _image_dir(digest: str) -> Path:
+    return IMAGE_STORE_DIR / digest[:2] / digest
+
+
+def save_image(raw: bytes) -> str:
+    """
+    Stores an image under its SHA-256 digest and renders the resized variants.
+
+    Uploading the same bytes twice is a no-op, so rows can share one copy.
+    """
+    digest = hashlib.sha256(raw).hexdigest()
+    target = _image_dir(digest)
+    if target.exists():
+        return digest
+
+    try:
+        image = Image.open(io.BytesIO(raw))
+        image.load()
+    except Exception as e:
+        raise InvalidImage(f"Unsupported image data: {e}")
+
+    image_format = (image.format or "").lower()
+    if image_format not in CONTENT_TYPES:
+        raise InvalidImage(f"Unsupported image format: {image.format}")
+
+    # Write into a temporary directory and rename so readers never see half a set of files
+    target.parent.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=f".{digest}.", dir=target.parent))
+    (staging / f"original.{image_format}").write_bytes(raw)
+
+    for variant, max_edge in IMAGE_VARIANTS.items():
+        resized = image.copy()
+        if resized.mode not in ("RGB", "RGBA"):
+            resized = resized.convert("RGBA")
+        resized.thumbnail((max_edge, max_edge))
+        resized.save(staging / f"{variant}.webp", "WEBP", quality=80, method=4)
+
+    try:
+        staging.rename(target)
+    except OSError:
+        # Another worker stored the same image first
+        for path in staging.iterdir():
+            path.unlink()
+        staging.rmdir()
+    return digest
+
+
+def decode_data_uri(value: str) -> Optional[bytes]:
+    match = DATA_URI.match(value)
+    if not match:
+        return None
+    try:
+        return base64.b64decode(match.group("data"), validate=False)
+    except (binascii.Error, ValueError):
+        raise InvalidImage("Malformed base64 image data")
+
+
+def to_stored_value(value: Optional[str]) -> Optional[str]:
+    """
+    Normalizes an incoming image_data value to what we keep in menu_items.
+
+    Base64 data URIs are stored as files and replaced by their /media path,
+    absolute /media URLs echoed back by the admin UI are made relative again,
+    and anything else (such as seed.py's /images/... paths) is kept as-is.
+    """
+    if not value:
+        return value
+    raw = decode_data_uri(value)
+    if raw is not None:
+        return f"{MEDIA_PREFIX}{save_image(raw)}"
+    if value.startswith(f"{MEDIA_BASE_URL}{MEDIA_PREFIX}"):
+        return value[len(MEDIA_BASE_URL):]
+    return value
+
+
+def public_url(value: Optional[str], variant: Optional[str] = None) -> Optional[str]:
+    if not value or not value.startswith(MEDIA_PREFIX):
+        return value
+    if variant:
+        return f"{MEDIA_BASE_URL}{value}/{variant}"
+    return f"{MEDIA_BASE_URL}{value}"
+
+
+def find_variant(digest: str, variant: str) -> Optional[Tuple[Path, str]]:
+    """Returns the file and content type for a stored image variant, if it exists."""
+    if not DIGEST.match(digest) or (variant != "original" and variant not in IMAGE_VARIANTS):
+        return None
+    directory = _image_dir(digest)
+    if not directory.is_dir():
+        return None
+    for path in directory.glob(f"{variant}.*"):
+        return path, CONTENT_TYPES.get(path.suffix.lstrip("."), "application/octet-stream")
+    return None
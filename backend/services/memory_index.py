@@ -0,0 +1,214 @@
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import EmbeddingModel, MenuEmbedding, EMBEDDING_DIM
+
+# Restaurants whose embeddings a worker keeps in memory; the least recently asked one is dropped first
+MEMORY_INDEX_RESTAURANTS = int(os.getenv("MEMORY_INDEX_RESTAURANTS", "32"))
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _key(item_id) -> str:
+    # Path parameters arrive as strings in any case; rows arrive as UUIDs
+    return str(uuid.UUID(str(item_id)))
+
+
+class MemoryVectorIndex:
+    """
+    One restaurant's menu embeddings held as a contiguous, L2-normalized
+    float32 matrix.
+
+    Cosine distance against every row is a single matrix-vector product, so a
+    top-k query for a restaurant-sized menu costs microseconds instead of a
+    database round-trip. Rows are patched in place on menu writes.
+    """
+
+    def __init__(self, restaurant_id: str, dimension: int = EMBEDDING_DIM):
+        self.restaurant_id = restaurant_id
+        self.dimension = dimension
+        self.loaded = False
+        # The active embedding model when the rows were read; None while the restaurant has no rows
+        self.model: Optional[str] = None
+        self._matrix = np.zeros((0, dimension), dtype=np.float32)
+        self._ids: List[str] = []
+        self._chunks: List[str] = []
+        self._positions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    async def load(self, session: AsyncSession):
+        # Reads only this restaurant's partition of menu_embeddings
+        # The active model is read in the same statement, so it can't straddle a reindex.py switch
+        active_model = select(EmbeddingModel.name).where(EmbeddingModel.status == "active").scalar_subquery()
+        result = await session.execute(
+            select(MenuEmbedding.item_id, MenuEmbedding.embedding, MenuEmbedding.content_chunk, active_model.label("model"))
+            .where(MenuEmbedding.restaurant_id == self.restaurant_id)
+        )
+        rows = result.all()
+        model = rows[0].model if rows else None
+
+        if rows:
+            # Follow whatever dimension the stored vectors have (it changes with the embedding model)
+            self.dimension = len(rows[0].embedding)
+        else:
+            # Nothing to measure: size the empty matrix for the active model, so the first upsert fits
+            active = (await session.execute(
+                select(EmbeddingModel.name, EmbeddingModel.dimension).where(EmbeddingModel.status == "active")
+            )).first()
+            if active is not None:
+                model, self.dimension = active.name, active.dimension
+        matrix = np.zeros((len(rows), self.dimension), dtype=np.float32)
+        for i, row in enumerate(rows):
+            matrix[i] = row.embedding
+
+        with self._lock:
+            self._matrix = _normalize(matrix)
+            self._ids = [str(row.item_id) for row in rows]
+            self._chunks = [row.content_chunk for row in rows]
+            self._positions = {item_id: i for i, item_id in enumerate(self._ids)}
+            self.model = model
+            self.loaded = True
+
+    def upsert(self, item_id, vector: Sequence[float], content_chunk: str):
+        if not self.loaded:
+            return
+        item_id = _key(item_id)
+        row = _normalize(np.asarray(vector, dtype=np.float32).reshape(1, -1))
+
+        with self._lock:
+            if row.shape[1] != self.dimension:
+                if self._ids:
+                    raise ValueError(f"{row.shape[1]}-dimensional vector for a {self.dimension}-dimensional index")
+                self.dimension = row.shape[1]
+                self._matrix = np.zeros((0, self.dimension), dtype=np.float32)
+            position = self._positions.get(item_id)
+            if position is None:
+                self._positions[item_id] = len(self._ids)
+                self._ids.append(item_id)
+                self._chunks.append(content_chunk)
+                self._matrix = np.vstack([self._matrix, row])
+            else:
+                self._matrix[position] = row[0]
+                self._chunks[position] = content_chunk
+
+    def remove(self, item_id):
+        if not self.loaded:
+            return
+        item_id = _key(item_id)
+
+        with self._lock:
+            position = self._positions.pop(item_id, None)
+            if position is None:
+                return
+            # Move the last row into the hole so the matrix stays contiguous
+            last = len(self._ids) - 1
+            if position != last:
+                self._matrix[position] = self._matrix[last]
+                self._ids[position] = self._ids[last]
+                self._chunks[position] = self._chunks[last]
+                self._positions[self._ids[position]] = position
+            self._matrix = self._matrix[:last].copy()
+            self._ids.pop()
+            self._chunks.pop()
+
+    def search(self, query_vector: Sequence[float], limit: int = 3) -> List[Tuple[str, float]]:
+        """Returns (content_chunk, cosine distance) pairs, closest first, like `<=>` in pgvector."""
+        query = _normalize(np.asarray(query_vector, dtype=np.float32))
+
+        with self._lock:
+            matrix, chunks = self._matrix, self._chunks
+
+        count = len(chunks)
+        if count == 0 or limit <= 0:
+            return []
+
+        distances = 1.0 - matrix @ query
+        if limit < count:
+            top = np.argpartition(distances, limit - 1)[:limit]
+        else:
+            top = np.arange(count)
+        top = top[np.argsort(distances[top], kind="stable")]
+        return [(chunks[i], float(distances[i])) for i in top]
+
+
+class MemoryIndexes:
+    """
+    A MemoryVectorIndex per restaurant, loaded on the restaurant's first
+    question and kept for the MEMORY_INDEX_RESTAURANTS most recently asked
+    ones. A worker's memory follows the menus it is busy with, not the fleet.
+    """
+
+    def __init__(self, maxsize: int = MEMORY_INDEX_RESTAURANTS):
+        self.maxsize = maxsize
+        self._indexes: "OrderedDict[str, MemoryVectorIndex]" = OrderedDict()
+        self.loads = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return sum(len(index) for index in list(self._indexes.values()))
+
+    def get(self, restaurant_id: str) -> Optional[MemoryVectorIndex]:
+        index = self._indexes.get(restaurant_id)
+        if index is not None:
+            self._indexes.move_to_end(restaurant_id)
+        return index
+
+    def restaurants(self) -> List[str]:
+        return list(self._indexes)
+
+    async def load(self, session: AsyncSession, restaurant_id: str) -> MemoryVectorIndex:
+        # Also used to reload: the fresh index replaces the old one only once it is complete
+        index = MemoryVectorIndex(restaurant_id)
+        await index.load(session)
+        self._indexes[restaurant_id] = index
+        self._indexes.move_to_end(restaurant_id)
+        self.loads += 1
+        while len(self._indexes) > self.maxsize:
+            self._indexes.popitem(last=False)
+            self.evictions += 1
+        return index
+
+    def upsert(self, restaurant_id: str, item_id, vector: Sequence[float], content_chunk: str):
+        index = self._indexes.get(restaurant_id)
+        if index is None:
+            return
+        try:
+            index.upsert(item_id, vector, content_chunk)
+        except ValueError:
+            # The index holds another model's vectors; the restaurant's next question loads it afresh
+            self._indexes.pop(restaurant_id, None)
+
+    def remove(self, restaurant_id: str, item_id):
+        index = self._indexes.get(restaurant_id)
+        if index is not None:
+            index.remove(item_id)
+
+    def clear(self):
+        # After an embedding model switch every cached index holds the old model's vectors
+        self._indexes.clear()
+
+    def stats(self):
+        return {
+            "restaurants": len(self._indexes),
+            "maxsize": self.maxsize,
+            "rows": len(self),
+            "loads": self.loads,
+            "evictions": self.evictions,
+        }
+
+
+memory_index = MemoryIndexes()
@@ -0,0 +1,116 @@
+import json
+import os
+import socket
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import insert, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import MenuChange, MenuItem
+from schemas import MenuItemResponse
+
+MENU_CHANNEL = "menu_version"
+# Change rows kept for catching up (across all restaurants); a client further behind is told to reload the full menu
+MENU_CHANGE_RETENTION = int(os.getenv("MENU_CHANGE_RETENTION", "10000"))
+# Any constant works; it only has to be the same for every menu writer
+MENU_WRITE_LOCK = 7310420
+
+ADD = "add"
+UPDATE = "update"
+DELETE = "delete"
+
+
+def origin() -> str:
+    # Computed per call: with a preloaded app every worker imports this module before it forks
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+async def publish_menu_change(db: AsyncSession, version: int, restaurant_id: Optional[str] = None):
+    """
+    Queues a menu_version notification in the caller's transaction; Postgres
+    delivers it to every listening worker (services/menu_events.py) when, and
+    only if, it commits. restaurant_id None means any restaurant may have changed.
+    """
+    payload = {"origin": origin(), "version": version, "restaurant": restaurant_id}
+    await db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": MENU_CHANNEL, "payload": json.dumps(payload)})
+
+
+async def record_menu_changes(db: AsyncSession, restaurant_id: str, changes: Iterable[Tuple[Any, str]]) -> int:
+    """
+    Appends (item_id, op) rows for one restaurant to menu_changes and notifies
+    every worker, in the caller's transaction. Returns the new menu version.
+
+    Writers are serialized on an advisory lock held until commit, so versions
+    become visible in order and a reader of "since=v" can never miss a lower
+    version that commits later.
+    """
+    rows = [{"restaurant_id": restaurant_id, "op": op,
+             "item_id": item_id if isinstance(item_id, uuid.UUID) else uuid.UUID(str(item_id))}
+            for item_id, op in changes]
+    await db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MENU_WRITE_LOCK})
+    if rows:
+        await db.execute(insert(MenuChange), rows)
+    version = (await db.execute(text("SELECT coalesce(max(version), 0) FROM menu_changes"))).scalar_one()
+    await db.execute(text("DELETE FROM menu_changes WHERE version <= :oldest"),
+                     {"oldest": version - MENU_CHANGE_RETENTION})
+    await publish_menu_change(db, version, restaurant_id)
+    return version
+
+
+async def current_version(db: AsyncSession) -> int:
+    # One sequence for every restaurant: a restaurant's deltas are the rows above `since` carrying its id
+    return (await db.execute(text("SELECT coalesce(max(version), 0) FROM menu_changes"))).scalar_one()
+
+
+async def changes_since(db: AsyncSession, restaurant_id: str, since: int) -> Dict[str, Any]:
+    """
+    What a client of restaurant_id at menu version `since` needs to apply to be current.
+
+    Several changes to one item collapse into one delta: "add" if the item is
+    new since then, "delete" if it is gone, "update" otherwise; an item added
+    and deleted in between is left out. Deltas carry the item as GET /menu/
+    serves it. {"reset": true} means `since` is too old (or from another
+    database) and the client should reload GET /menu/.
+    """
+    bounds = (await db.execute(text("SELECT coalesce(min(version), 0), coalesce(max(version), 0) FROM menu_changes"))).one()
+    oldest, version = bounds
+    if since > version or since < oldest - 1:
+        return {"version": version, "reset": True, "changes": []}
+
+    collapsed = (await db.execute(text("""
+        SELECT item_id,
+               (array_agg(op ORDER BY version DESC))[1] AS last_op,
+               bool_or(op = 'add') AS added,
+               max(version) AS version
+        FROM menu_changes
+        WHERE restaurant_id = :restaurant AND version > :since AND version <= :version
+        GROUP BY item_id
+        ORDER BY max(version)
+    """), {"restaurant": restaurant_id, "since": since, "version": version})).all()
+
+    live_ids = [row.item_id for row in collapsed if row.last_op != DELETE]
+    items = {}
+    if live_ids:
+        result = await db.execute(select(MenuItem).where(MenuItem.id.in_(live_ids), MenuItem.restaurant_id == restaurant_id))
+        items = {item.id: item for item in result.scalars()}
+
+    return {"version": version, "reset": False, "changes": collapse_deltas(collapsed, items)}
+
+
+def collapse_deltas(collapsed: Iterable[Any], items: Dict[uuid.UUID, MenuItem]) -> List[Dict[str, Any]]:
+    # One row per item (item_id, last_op, added, version) and the items that still exist, keyed by id
+    deltas: List[Dict[str, Any]] = []
+    for row in collapsed:
+        item = items.get(row.item_id)
+        if row.last_op == DELETE or item is None:
+            if not row.added:
+                deltas.append({"op": DELETE, "id": str(row.item_id), "version": row.version})
+            continue
+        deltas.append({
+            "op": ADD if row.added else UPDATE,
+            "id": str(row.item_id),
+            "version": row.version,
+            "item": MenuItemResponse.model_validate(item).model_dump(mode="json"),
+        })
+    return deltas
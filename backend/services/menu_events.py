@@ -0,0 +1,123 @@
+import asyncio
+import json
+import os
+from typing import Optional, Set
+
+import asyncpg
+
+from database import AsyncSessionLocal, DATABASE_URL
+from services.cache import question_cache
+from services.memory_index import memory_index
+from services.menu_state import MenuState
+from services.menu_changes import MENU_CHANNEL, origin
+from services.menu_feed import menu_feed
+from services.faq_answers import FAQ_CHANNEL, faq_answers
+from services.rag_service import RAGService
+
+# Published by reindex.py when it switches the active embedding model
+MODEL_CHANNEL = "embedding_model"
+# Delay before reconnecting a dropped listener connection
+LISTEN_RETRY_S = float(os.getenv("MENU_EVENTS_RETRY_S", "2"))
+
+
+class MenuEventListener:
+    """
+    Keeps one asyncpg connection per worker LISTENing for menu and embedding
+    model changes made by other processes, and drops this worker's stale state.
+
+    Notifications name the restaurant that changed, so only that restaurant's
+    caches and in-memory index are dropped. The writing worker already bumped
+    its own version, so its own notifications are skipped. After a dropped
+    connection every restaurant is bumped once, since notifications sent while
+    disconnected are lost.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._reload: Optional[asyncio.Task] = None
+        self._reload_pending: Set[str] = set()
+        self._model_task: Optional[asyncio.Task] = None
+        self.received = 0
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        for task in (self._task, self._reload, self._model_task):
+            if task and not task.done():
+                task.cancel()
+
+    async def _run(self):
+        connected_before = False
+        while True:
+            try:
+                conn = await asyncpg.connect(DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://"))
+            except (OSError, asyncpg.PostgresError) as e:
+                print(f"Menu event listener could not connect: {e}")
+                await asyncio.sleep(LISTEN_RETRY_S)
+                continue
+
+            closed = asyncio.Event()
+            conn.add_termination_listener(lambda _: closed.set())
+            try:
+                await conn.add_listener(MENU_CHANNEL, self._on_menu_change)
+                await conn.add_listener(MODEL_CHANNEL, self._on_model_change)
+                await conn.add_listener(FAQ_CHANNEL, self._on_faq_change)
+                if connected_before:
+                    self._menu_changed(None)
+                    menu_feed.notify(None, None)
+                connected_before = True
+                await closed.wait()
+                print("Menu event listener lost its connection; reconnecting")
+            finally:
+                if not conn.is_closed():
+                    await conn.close()
+            await asyncio.sleep(LISTEN_RETRY_S)
+
+    def _on_menu_change(self, connection, pid, channel, payload):
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            message = {}
+        restaurant_id = message.get("restaurant")
+        # Every worker pushes deltas to its own /ws/menu subscribers, including the one that wrote
+        menu_feed.notify(restaurant_id, message.get("version"))
+        if message.get("origin") == origin():
+            return
+        self.received += 1
+        self._menu_changed(restaurant_id)
+
+    def _on_faq_change(self, connection, pid, channel, payload):
+        # Whichever worker regenerated a restaurant's FAQ answers, every worker reloads them
+        faq_answers.invalidate(payload)
+
+    def _on_model_change(self, connection, pid, channel, payload):
+        self.received += 1
+        self._model_task = asyncio.create_task(self._switch_model())
+
+    def _menu_changed(self, restaurant_id: Optional[str]):
+        MenuState.bump(restaurant_id)
+        # Only restaurants this worker holds in memory are reloaded; the rest load on their next question
+        loaded = memory_index.restaurants()
+        stale = loaded if restaurant_id is None else [r for r in loaded if r == restaurant_id]
+        if stale:
+            # A burst of notifications collapses into the reload already running plus at most one more per restaurant
+            self._reload_pending.update(stale)
+            if self._reload is None or self._reload.done():
+                self._reload = asyncio.create_task(self._reload_memory_indexes())
+
+    async def _reload_memory_indexes(self):
+        while self._reload_pending:
+            restaurant_id = self._reload_pending.pop()
+            async with AsyncSessionLocal() as db:
+                await memory_index.load(db, restaurant_id)
+
+    async def _switch_model(self):
+        async with AsyncSessionLocal() as db:
+            await RAGService.sync_active_model(db)
+        # Question vectors from the old model would retrieve nonsense against the new table
+        question_cache.clear()
+        self._menu_changed(None)
+
+
+menu_event_listener = MenuEventListener()
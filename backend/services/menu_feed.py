@@ -0,0 +1,149 @@
+import asyncio
+import json
+import os
+from typing import Dict, Optional, Set
+
+from fastapi import WebSocket
+
+from database import borrow_session
+from services.menu_changes import changes_since, current_version
+
+# A tablet that can't take a delta within this long is dropped; it reconnects with ?since=
+MENU_FEED_SEND_TIMEOUT = float(os.getenv("MENU_FEED_SEND_TIMEOUT", "5"))
+
+
+class MenuFeed:
+    """
+    Pushes one restaurant's menu deltas to this worker's /ws/menu subscribers.
+
+    menu_events.py calls notify() for every menu_version notification. The
+    deltas since the last broadcast are read once and the same JSON text is
+    sent to every subscriber, so a menu edit costs one query per worker no
+    matter how many tablets are open. Bursts of notifications collapse into
+    one broadcast.
+    """
+
+    def __init__(self, restaurant_id: str):
+        self.restaurant_id = restaurant_id
+        self.subscribers: Set[WebSocket] = set()
+        self.version: Optional[int] = None
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._pending = False
+        self.broadcasts = 0
+        self.dropped = 0
+
+    async def subscribe(self, websocket: WebSocket, since: Optional[int]):
+        # Under the broadcast lock, so no delta is sent between the catch-up and joining the feed
+        async with self._lock:
+            async with borrow_session() as db:
+                if since is None:
+                    message = {"type": "hello", "version": await current_version(db)}
+                else:
+                    message = {"type": "changes", **await changes_since(db, self.restaurant_id, since)}
+            if self.version is None or not self.subscribers:
+                self.version = message["version"]
+            await websocket.send_json(message)
+            self.subscribers.add(websocket)
+
+    def unsubscribe(self, websocket: WebSocket):
+        self.subscribers.discard(websocket)
+
+    def notify(self, version: Optional[int]):
+        # version None means "unknown" (e.g. after the listener reconnected): always check
+        if not self.subscribers:
+            return
+        if version is not None and self.version is not None and version <= self.version:
+            return
+        self._pending = True
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._broadcast())
+
+    async def _broadcast(self):
+        while self._pending:
+            self._pending = False
+            async with self._lock:
+                if not self.subscribers or self.version is None:
+                    continue
+                async with borrow_session() as db:
+                    delta = await changes_since(db, self.restaurant_id, self.version)
+                if not delta["changes"] and not delta["reset"]:
+                    continue
+                text = json.dumps({"type": "changes", **delta}, separators=(",", ":"))
+                subscribers = list(self.subscribers)
+                results = await asyncio.gather(*(self._send(websocket, text) for websocket in subscribers))
+                for websocket, sent in zip(subscribers, results):
+                    if not sent:
+                        self.subscribers.discard(websocket)
+                        self.dropped += 1
+                        asyncio.create_task(self._close(websocket))
+                self.version = delta["version"]
+                self.broadcasts += 1
+
+    async def _send(self, websocket: WebSocket, text: str) -> bool:
+        try:
+            await asyncio.wait_for(websocket.send_text(text), MENU_FEED_SEND_TIMEOUT)
+            return True
+        except Exception:
+            return False
+
+    async def _close(self, websocket: WebSocket):
+        # 1013 "try again later": the client reconnects with ?since= and catches up
+        try:
+            await asyncio.wait_for(websocket.close(code=1013), MENU_FEED_SEND_TIMEOUT)
+        except Exception:
+            pass
+
+    def stats(self):
+        return {
+            "subscribers": len(self.subscribers),
+            "version": self.version,
+            "broadcasts": self.broadcasts,
+            "dropped": self.dropped,
+        }
+
+
+class MenuFeeds:
+    """
+    A MenuFeed per restaurant with subscribers on this worker. An edit only
+    queries for, and wakes, the tablets of the restaurant it was made in.
+    """
+
+    def __init__(self):
+        self._feeds: Dict[str, MenuFeed] = {}
+
+    def feed(self, restaurant_id: str) -> MenuFeed:
+        if restaurant_id not in self._feeds:
+            self._feeds[restaurant_id] = MenuFeed(restaurant_id)
+        return self._feeds[restaurant_id]
+
+    async def subscribe(self, websocket: WebSocket, restaurant_id: str, since: Optional[int]):
+        await self.feed(restaurant_id).subscribe(websocket, since)
+
+    def unsubscribe(self, websocket: WebSocket, restaurant_id: str):
+        if restaurant_id in self._feeds:
+            self._feeds[restaurant_id].unsubscribe(websocket)
+
+    def notify(self, restaurant_id: Optional[str], version: Optional[int]):
+        # restaurant_id None: a change of unknown scope, every feed checks for deltas
+        if restaurant_id is None:
+            for feed in list(self._feeds.values()):
+                feed.notify(version)
+        elif restaurant_id in self._feeds:
+            self._feeds[restaurant_id].notify(version)
+
+    @property
+    def subscribers(self) -> int:
+        return sum(len(feed.subscribers) for feed in self._feeds.values())
+
+    def stats(self):
+        feeds = list(self._feeds.values())
+        return {
+            "restaurants": sum(1 for feed in feeds if feed.subscribers),
+            "subscribers": self.subscribers,
+            "broadcasts": sum(feed.broadcasts for feed in feeds),
+            "dropped": sum(feed.dropped for feed in feeds),
+        }
+
+
+menu_feed = MenuFeeds()
@@ -0,0 +1,99 @@
+import asyncio
+import csv
+import io
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import DEFAULT_RESTAURANT, MenuItem
+from schemas import MenuItemCreate
+from services.rag_service import RAGService
+from services.image_store import to_stored_value, InvalidImage
+from services.memory_index import memory_index
+from services.menu_changes import record_menu_changes, ADD
+from services.menu_state import MenuState
+from services.tenancy import ensure_partition
+
+CSV_COLUMNS = ("name", "description", "price", "category", "image_data")
+
+
+@dataclass
+class ImportResult:
+    item_ids: List[uuid.UUID] = field(default_factory=list)
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+
+
+def _describe(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in e['loc'])}: {e['msg']}" for e in error.errors()
+    )
+
+
+def parse_csv(content: str) -> List[Dict[str, Any]]:
+    reader = csv.DictReader(io.StringIO(content))
+    rows = []
+    for row in reader:
+        # Blank cells mean "not set", not an empty string
+        rows.append({key.strip(): (value or None) for key, value in row.items() if key and key.strip() in CSV_COLUMNS})
+    return rows
+
+
+async def import_menu_items(db: AsyncSession, rows: Iterable[Dict[str, Any]],
+                            restaurant_id: str = DEFAULT_RESTAURANT) -> ImportResult:
+    """
+    Validates and inserts many menu items for one restaurant, with their
+    embeddings, in one transaction.
+
+    Invalid rows are reported by their 1-based position and skipped; the valid
+    rows are embedded in batched encode calls and written with two set-based
+    INSERTs (menu_items, then menu_embeddings).
+    """
+    result = ImportResult()
+    items: List[Dict[str, Any]] = []
+
+    # 1. Validate rows and move uploaded images to the image store
+    for row_number, row in enumerate(rows, start=1):
+        try:
+            item = MenuItemCreate.model_validate(row)
+            image_data = await asyncio.to_thread(to_stored_value, item.image_data)
+        except ValidationError as e:
+            result.errors.append({"row": row_number, "error": _describe(e)})
+            continue
+        except InvalidImage as e:
+            result.errors.append({"row": row_number, "error": f"image_data: {e}"})
+            continue
+
+        values = item.model_dump()
+        values["id"] = uuid.uuid4()
+        values["restaurant_id"] = restaurant_id
+        values["image_data"] = image_data
+        items.append(values)
+
+    if not items:
+        return result
+
+    # 2. Embed every content chunk in batched encode calls
+    chunks = [RAGService.build_content_chunk(item["name"], item["description"], item["category"]) for item in items]
+    model, vectors = await RAGService.embed_for_write(db, chunks)
+
+    # 3. Set-based inserts, committed together
+    await db.execute(insert(MenuItem), items)
+    await ensure_partition(db, restaurant_id)
+    vectors = await RAGService.write_embeddings(db, restaurant_id, [
+        {"item_id": item["id"], "embedding": vector, "content_chunk": chunk, "content_hash": RAGService.content_hash(chunk)}
+        for item, vector, chunk in zip(items, vectors, chunks)
+    ], model)
+    # Feeds /ws/menu and tells other workers to drop their caches once this commits
+    await record_menu_changes(db, restaurant_id, [(item["id"], ADD) for item in items])
+    await db.commit()
+
+    for item, vector, chunk in zip(items, vectors, chunks):
+        memory_index.upsert(restaurant_id, item["id"], vector, chunk)
+    MenuState.bump(restaurant_id)
+
+    result.item_ids = [item["id"] for item in items]
+    return result
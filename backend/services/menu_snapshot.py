@@ -0,0 +1,160 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from database import AsyncSessionLocal
+from models import MenuItem
+from schemas import MenuItemResponse
+from services.cache import LRUCache
+from services.menu_state import MenuState
+from services.menu_changes import current_version
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+# Filtered/projected variants kept per snapshot; each is a few KB of bytes
+SNAPSHOT_VARIANTS = 64
+# Restaurants whose listing a worker keeps materialized; the least recently requested one is dropped first
+SNAPSHOT_RESTAURANTS = int(os.getenv("SNAPSHOT_RESTAURANTS", "64"))
+
+
+@dataclass
+class EncodedBody:
+    etag: str
+    identity: bytes
+    gzip: bytes
+    br: Optional[bytes]
+
+    def for_encoding(self, accept_encoding: str) -> Tuple[bytes, Optional[str]]:
+        accepted = _accepted_encodings(accept_encoding)
+        if self.br is not None and "br" in accepted:
+            return self.br, "br"
+        if "gzip" in accepted:
+            return self.gzip, "gzip"
+        return self.identity, None
+
+
+def _accepted_encodings(header: str) -> set:
+    accepted = set()
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        if name:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def _encode(items: List[Dict[str, Any]]) -> EncodedBody:
+    body = json.dumps(items, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    # Content hash rather than the version number, so ETags stay valid across restarts
+    etag = f'W/"{hashlib.sha1(body).hexdigest()[:20]}"'
+    return EncodedBody(
+        etag=etag,
+        identity=body,
+        gzip=gzip.compress(body, compresslevel=6, mtime=0),
+        br=brotli.compress(body, quality=9) if brotli else None,
+    )
+
+
+class MenuSnapshot:
+    """
+    One restaurant's GET /menu/ listing materialized once per menu version.
+
+    Items are validated through MenuItemResponse a single time and kept as
+    ready-to-send JSON bytes with gzip/brotli variants. Category filters and
+    field projections are derived from the same items and cached alongside.
+    """
+
+    def __init__(self, restaurant_id: str):
+        self.restaurant_id = restaurant_id
+        self.version: Optional[int] = None
+        # menu_changes version the items are at least as new as; clients pass it to /ws/menu?since=
+        self.menu_version = 0
+        self._items: List[Dict[str, Any]] = []
+        self._variants = LRUCache("menu_snapshot", SNAPSHOT_VARIANTS)
+        self._lock = asyncio.Lock()
+        self.builds = 0
+
+    @property
+    def current(self) -> bool:
+        return self.version == MenuState.version_of(self.restaurant_id)
+
+    def invalidate(self):
+        self.version = None
+
+    async def refresh(self):
+        if self.current:
+            return
+        async with self._lock:
+            if self.current:
+                return
+            version = MenuState.version_of(self.restaurant_id)
+            async with AsyncSessionLocal() as db:
+                # Read before the items: a delta the items already include is harmless to re-apply
+                menu_version = await current_version(db)
+                result = await db.execute(select(MenuItem).where(MenuItem.restaurant_id == self.restaurant_id))
+                rows = result.scalars().all()
+            self._items = [MenuItemResponse.model_validate(row).model_dump(mode="json") for row in rows]
+            self._variants.clear()
+            self.menu_version = menu_version
+            self.version = version
+            self.builds += 1
+
+    def body(self, category: Optional[str] = None, fields: Optional[Tuple[str, ...]] = None) -> EncodedBody:
+        key = (category.lower() if category else None, fields)
+        encoded = self._variants.get(key)
+        if encoded is None:
+            items = self._items
+            if category:
+                items = [item for item in items if (item.get("category") or "").lower() == key[0]]
+            if fields:
+                items = [{field: item.get(field) for field in fields} for item in items]
+            encoded = _encode(items)
+            self._variants.set(key, encoded)
+        return encoded
+
+
+class MenuSnapshots:
+    """Snapshots of the SNAPSHOT_RESTAURANTS most recently requested restaurants, built on first request."""
+
+    def __init__(self, maxsize: int = SNAPSHOT_RESTAURANTS):
+        self.maxsize = maxsize
+        self._snapshots: "OrderedDict[str, MenuSnapshot]" = OrderedDict()
+
+    def get(self, restaurant_id: str) -> MenuSnapshot:
+        snapshot = self._snapshots.get(restaurant_id)
+        if snapshot is None:
+            snapshot = self._snapshots[restaurant_id] = MenuSnapshot(restaurant_id)
+            while len(self._snapshots) > self.maxsize:
+                self._snapshots.popitem(last=False)
+        self._snapshots.move_to_end(restaurant_id)
+        return snapshot
+
+    def invalidate(self, restaurant_id: Optional[str] = None):
+        if restaurant_id is None:
+            for snapshot in self._snapshots.values():
+                snapshot.invalidate()
+        elif restaurant_id in self._snapshots:
+            self._snapshots[restaurant_id].invalidate()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "restaurants": len(self._snapshots),
+            "maxsize": self.maxsize,
+            "builds": sum(snapshot.builds for snapshot in self._snapshots.values()),
+        }
+
+
+menu_snapshots = MenuSnapshots()
+
+MenuState.on_change(menu_snapshots.invalidate)
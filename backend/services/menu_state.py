@@ -0,0 +1,36 @@
+from typing import Callable, Dict, List, Optional
+
+# Listeners run after every committed menu write (create/update/delete) with the restaurant it
+# touched, or None when every restaurant's menu may have changed (e.g. an embedding model switch)
+_listeners: List[Callable[[Optional[str]], None]] = []
+
+
+class MenuState:
+    """Tracks in-process menu versions, per restaurant, so caches can drop stale entries."""
+
+    version = 0
+    # Every restaurant is at least at this version; raised by bump(None)
+    floor = 0
+    _versions: Dict[str, int] = {}
+
+    @classmethod
+    def bump(cls, restaurant_id: Optional[str] = None) -> int:
+        cls.version += 1
+        if restaurant_id is None:
+            cls.floor = cls.version
+            cls._versions.clear()
+        else:
+            cls._versions[restaurant_id] = cls.version
+        for listener in _listeners:
+            listener(restaurant_id)
+        return cls.version
+
+    @classmethod
+    def version_of(cls, restaurant_id: str) -> int:
+        # Changes to one restaurant leave every other restaurant's cached state valid
+        return cls._versions.get(restaurant_id, cls.floor)
+
+    @staticmethod
+    def on_change(listener: Callable[[Optional[str]], None]):
+        _listeners.append(listener)
+        return listener
@@ -0,0 +1,99 @@
+import asyncio
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import DEFAULT_RESTAURANT, MenuItem, MenuEmbedding
+from services.rag_service import RAGService
+from services.image_store import to_stored_value
+from services.memory_index import memory_index
+from services.menu_changes import record_menu_changes, UPDATE
+from services.menu_state import MenuState
+from services.tenancy import ensure_partition
+
+
+class MenuItemsNotFound(LookupError):
+    def __init__(self, item_ids: Sequence[uuid.UUID]):
+        super().__init__(f"Menu items not found: {', '.join(str(item_id) for item_id in item_ids)}")
+        self.item_ids = list(item_ids)
+
+
+@dataclass
+class UpdateResult:
+    items: List[MenuItem] = field(default_factory=list)
+    reembedded: int = 0
+
+
+async def apply_item_updates(db: AsyncSession, updates: Sequence[Tuple[uuid.UUID, Dict[str, Any]]],
+                             restaurant_id: str = DEFAULT_RESTAURANT) -> UpdateResult:
+    """
+    Applies partial updates to many of one restaurant's menu items in one
+    transaction; ids belonging to another restaurant count as not found.
+
+    Each item's content chunk is rebuilt and hashed; only items whose hash
+    differs from the stored one are re-encoded, in a single batched encode.
+    Price or image changes therefore never touch the embedding model.
+    """
+    item_ids = [item_id for item_id, _ in updates]
+
+    # 1. Load all items and their embeddings in two queries
+    items = {
+        item.id: item
+        for item in (await db.execute(
+            select(MenuItem).where(MenuItem.id.in_(item_ids), MenuItem.restaurant_id == restaurant_id)
+        )).scalars()
+    }
+    missing = [item_id for item_id in item_ids if item_id not in items]
+    if missing:
+        raise MenuItemsNotFound(missing)
+    embeddings = {
+        embedding.item_id: embedding
+        for embedding in (await db.execute(
+            select(MenuEmbedding).where(MenuEmbedding.restaurant_id == restaurant_id, MenuEmbedding.item_id.in_(item_ids))
+        )).scalars()
+    }
+
+    # 2. Apply fields and work out which embedded texts actually changed
+    stale: Dict[uuid.UUID, Tuple[str, str]] = {}
+    for item_id, fields in updates:
+        db_item = items[item_id]
+        if "image_data" in fields:
+            fields = {**fields, "image_data": await asyncio.to_thread(to_stored_value, fields["image_data"])}
+        for key, value in fields.items():
+            setattr(db_item, key, value)
+
+        content_chunk = RAGService.build_content_chunk(db_item.name, db_item.description, db_item.category)
+        content_hash = RAGService.content_hash(content_chunk)
+        db_embedding = embeddings.get(item_id)
+        if db_embedding is None:
+            stale[item_id] = (content_chunk, content_hash)
+        elif db_embedding.content_hash != content_hash:
+            # Rows written before hashes existed compare on the text itself
+            if db_embedding.content_hash is None and db_embedding.content_chunk == content_chunk:
+                db_embedding.content_hash = content_hash
+            else:
+                stale[item_id] = (content_chunk, content_hash)
+
+    # 3. One batched encode for everything that changed
+    vectors = []
+    if any(item_id not in embeddings for item_id in stale):
+        await ensure_partition(db, restaurant_id)
+    if stale:
+        model, vectors = await RAGService.embed_for_write(db, [chunk for chunk, _ in stale.values()])
+        vectors = await RAGService.write_embeddings(db, restaurant_id, [
+            {"item_id": item_id, "embedding": vector, "content_chunk": content_chunk, "content_hash": content_hash}
+            for (item_id, (content_chunk, content_hash)), vector in zip(stale.items(), vectors)
+        ], model)
+
+    # Feeds /ws/menu and tells other workers to drop their caches once this commits
+    await record_menu_changes(db, restaurant_id, [(item_id, UPDATE) for item_id in item_ids])
+    await db.commit()
+
+    for (item_id, (content_chunk, _)), vector in zip(stale.items(), vectors):
+        memory_index.upsert(restaurant_id, item_id, vector, content_chunk)
+    MenuState.bump(restaurant_id)
+
+    return UpdateResult(items=[items[item_id] for item_id in item_ids], reembedded=len(stale))
@@ -0,0 +1,208 @@
+import os
+import random
+import time
+import uuid
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+# Fraction of chat requests whose per-stage timings are kept for GET /metrics/traces (0 turns tracing off)
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+# How many sampled traces are kept, newest first
+TRACE_BUFFER = int(os.getenv("TRACE_BUFFER", "200"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (10, 25, 50, 100, 200, 400, 800, 1600, 3200)
+
+_registry: List["Metric"] = []
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        _registry.append(self)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        return "\n".join([f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"] + self.samples())
+
+
+class Histogram(Metric):
+    """
+    Cumulative buckets rendered Prometheus-style. observe() is a bisect and two
+    additions, cheap enough for every request on the event loop.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, buckets=LATENCY_BUCKETS, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self._series.get(labels)
+        if series is None:
+            # One count per bucket, then +Inf, then the sum
+            series = self._series[labels] = [0.0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def samples(self) -> List[str]:
+        lines = []
+        for labels, series in self._series.items():
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative:g}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {series[-1]:g}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative:g}")
+        return lines
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def __init__(self, name: str, help: str):
+        super().__init__(name, help)
+        self.value = 0.0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+    def samples(self) -> List[str]:
+        return [f"{self.name} {self.value:g}"]
+
+
+class CallbackMetric(Metric):
+    """A gauge or counter read from state another module already keeps, at scrape time."""
+
+    def __init__(self, name: str, help: str, read: Callable[[], Any], type: str = "gauge",
+                 labelname: Optional[str] = None):
+        super().__init__(name, help, (labelname,) if labelname else ())
+        self.type = type
+        self.read = read
+
+    def samples(self) -> List[str]:
+        value = self.read()
+        if isinstance(value, dict):
+            return [f"{self.name}{_format_labels(self.labelnames, (label,))} {count:g}" for label, count in value.items()]
+        return [f"{self.name} {value:g}"]
+
+
+def render() -> str:
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+
+STAGE_SECONDS = {
+    "embed": Histogram("smartmenu_embed_seconds", "Question embedding, including question cache hits"),
+    "retrieve": Histogram("smartmenu_retrieve_seconds", "find_similar_context, including retrieval cache hits"),
+    "queue": Histogram("smartmenu_generation_queue_seconds", "Wait for a generation slot"),
+    "ttft": Histogram("smartmenu_ttft_seconds", "From sending the prompt to LM Studio's first token"),
+    "generation": Histogram("smartmenu_generation_seconds", "From sending the prompt to the end of the stream"),
+}
+TOKENS_STREAMED = Histogram("smartmenu_tokens_streamed", "Tokens streamed per answer", TOKEN_BUCKETS)
+PROMPT_TOKENS = Histogram("smartmenu_prompt_tokens", "Prefill tokens per prompt", TOKEN_BUCKETS)
+HTTP_SECONDS = Histogram("smartmenu_http_request_seconds", "Timed HTTP routes",
+                         labelnames=("method", "route", "status"))
+OPEN_SOCKETS = Gauge("smartmenu_chat_sockets_open", "Open /ws/chat sockets")
+
+
+class Trace:
+    def __init__(self):
+        self.id = uuid.uuid4().hex[:12]
+        self.started = time.time()
+        self.stages_ms: Dict[str, float] = {}
+        self.attributes: Dict[str, Any] = {}
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"id": self.id, "started": self.started, "stages_ms": self.stages_ms, **self.attributes}
+
+
+current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+traces: Deque[Trace] = deque(maxlen=max(1, TRACE_BUFFER))
+
+
+def start_trace() -> Optional[Trace]:
+    # Sampled per request; tasks created afterwards (the coalescer's reader) inherit it through the context
+    if TRACE_SAMPLE_RATE <= 0 or random.random() >= TRACE_SAMPLE_RATE:
+        current_trace.set(None)
+        return None
+    trace = Trace()
+    current_trace.set(trace)
+    traces.appendleft(trace)
+    return trace
+
+
+def annotate(**attributes: Any):
+    trace = current_trace.get()
+    if trace is not None:
+        trace.attributes.update(attributes)
+
+
+def record_stage(stage: str, seconds: float):
+    STAGE_SECONDS[stage].observe(seconds)
+    trace = current_trace.get()
+    if trace is not None:
+        trace.stages_ms[stage] = round(seconds * 1000, 3)
+
+
+@contextmanager
+def timed(stage: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+
+class RouteTimingMiddleware:
+    """
+    Times HTTP requests whose path starts with one of `prefixes`, labelled by
+    route template rather than raw path so item ids don't explode the series.
+    Plain ASGI, so streaming responses pass straight through.
+    """
+
+    def __init__(self, app, prefixes: Tuple[str, ...] = ("/menu",)):
+        self.app = app
+        self.prefixes = prefixes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router records the matched route in the (shared) scope
+            route = getattr(scope.get("route"), "path", None) or self.prefixes[0]
+            HTTP_SECONDS.observe(time.perf_counter() - started, scope["method"], route, str(status))
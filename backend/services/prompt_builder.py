@@ -0,0 +1,127 @@
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Sequence, Tuple
+
+# Retrieved context is trimmed to roughly this many tokens before it reaches the LLM
+PROMPT_CONTEXT_TOKENS = int(os.getenv("PROMPT_CONTEXT_TOKENS", "600"))
+# Chunks further than this cosine distance from the question are not worth their prefill time
+CONTEXT_MAX_DISTANCE = float(os.getenv("CONTEXT_MAX_DISTANCE", "0.8"))
+# Rough size of a token for English menu text; only used for budgeting and when the server reports no usage
+CHARS_PER_TOKEN = 4
+
+# Never interpolate anything into this: it is the byte-identical prefix LM Studio can reuse from its KV cache
+SYSTEM_PROMPT = (
+    "You are a helpful restaurant concierge. Answer the customer's question based ONLY on the menu context "
+    "given with the question. If the answer is not in the context, say you don't know and suggest they ask "
+    "about the dishes listed."
+)
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+@dataclass
+class ContextSelection:
+    chunks: List[str] = field(default_factory=list)
+    duplicates: int = 0
+    too_far: int = 0
+    over_budget: int = 0
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.chunks)
+
+
+def select_context(matches: Sequence[Tuple], budget: int = PROMPT_CONTEXT_TOKENS,
+                   max_distance: float = CONTEXT_MAX_DISTANCE) -> ContextSelection:
+    """
+    Picks the chunks that go into the prompt from (content_chunk, distance)
+    pairs, or (content_chunk, distance, keyword_only) from hybrid retrieval.
+
+    Duplicates are dropped, as are chunks further than max_distance, unless
+    the distance is missing or the chunk only came from the full-text ranking:
+    an exact dish name can sit far from the question in vector space. Chunks
+    are then taken closest first while they fit in the token budget; the
+    closest one is always kept, truncated if it has to be. They stay in that
+    (distance, text) order, so the best match leads the prompt and the same
+    matches always produce the same prompt.
+    """
+    selection = ContextSelection()
+    best: Dict[str, float] = {}
+    for chunk, distance, *flags in matches:
+        chunk = chunk.strip()
+        distance = float(distance) if distance is not None else 0.0
+        keyword_only = bool(flags and flags[0])
+        if chunk in best:
+            selection.duplicates += 1
+            best[chunk] = min(best[chunk], distance)
+        elif distance > max_distance and not keyword_only:
+            selection.too_far += 1
+        else:
+            best[chunk] = distance
+
+    used = 0
+    for chunk, _ in sorted(best.items(), key=lambda item: (item[1], item[0])):
+        # +1 for the newline joining chunks
+        cost = estimate_tokens(chunk) + 1
+        if used + cost <= budget:
+            selection.chunks.append(chunk)
+            used += cost
+        elif not selection.chunks and budget > 0:
+            selection.chunks.append(chunk[:budget * CHARS_PER_TOKEN].rstrip())
+            used = budget
+        else:
+            selection.over_budget += 1
+
+    PromptStats.record_selection(selection)
+    return selection
+
+
+def build_messages(context: str, question: str) -> List[Dict[str, str]]:
+    # Static system message first, then everything that varies per question
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"Menu context:\n{context or '(no matching dishes)'}\n\nQuestion: {question}"},
+    ]
+
+
+def estimate_prompt_tokens(messages: List[Dict[str, str]]) -> int:
+    # A few tokens of chat template framing per message
+    return sum(estimate_tokens(message["content"]) + 4 for message in messages)
+
+
+class PromptStats:
+    """Prefill sizes of prompts sent to the LLM and what context selection left out."""
+
+    prompts = 0
+    prefill_tokens = 0
+    max_prefill_tokens = 0
+    reported_by_server = 0
+    dropped: Dict[str, int] = {"duplicates": 0, "too_far": 0, "over_budget": 0}
+
+    @classmethod
+    def record_selection(cls, selection: ContextSelection):
+        cls.dropped["duplicates"] += selection.duplicates
+        cls.dropped["too_far"] += selection.too_far
+        cls.dropped["over_budget"] += selection.over_budget
+
+    @classmethod
+    def record_prefill(cls, tokens: int, reported: bool):
+        cls.prompts += 1
+        cls.prefill_tokens += tokens
+        cls.max_prefill_tokens = max(cls.max_prefill_tokens, tokens)
+        if reported:
+            cls.reported_by_server += 1
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        return {
+            "context_token_budget": PROMPT_CONTEXT_TOKENS,
+            "context_max_distance": CONTEXT_MAX_DISTANCE,
+            "prompts": cls.prompts,
+            "prefill_tokens_avg": round(cls.prefill_tokens / cls.prompts, 1) if cls.prompts else 0.0,
+            "prefill_tokens_max": cls.max_prefill_tokens,
+            "reported_by_server": cls.reported_by_server,
+            "chunks_dropped": dict(cls.dropped),
+        }
@@ -0,0 +1,84 @@
+import re
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import List, Optional
+
+_AMOUNT = r"\$?\s*(\d+(?:\.\d{1,2})?)\s*(?:dollars|bucks)?"
+MAX_PRICE = re.compile(
+    r"\b(?:under|below|less than|cheaper than|at most|max(?:imum)?|up to|no more than)\s*" + _AMOUNT
+    + r"|<=?\s*" + _AMOUNT,
+    re.IGNORECASE,
+)
+MIN_PRICE = re.compile(
+    r"\b(?:over|above|more than|at least|min(?:imum)?|pricier than)\s*" + _AMOUNT
+    + r"|>=?\s*" + _AMOUNT,
+    re.IGNORECASE,
+)
+WORD = re.compile(r"[a-z][a-z']*")
+# "without nuts", "nothing fried", "dairy-free", "I'm allergic to shellfish": the question excludes something
+NEGATION = re.compile(
+    r"\b(?:no|not|without|except|excluding|nothing|never|avoid(?:ing)?|allergic|free)\b|n't\b",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class QueryFilters:
+    max_price: Optional[Decimal] = None
+    min_price: Optional[Decimal] = None
+    # Candidate category names; only applied if one of them is a real category
+    category_terms: List[str] = field(default_factory=list)
+    # Words for the full-text ranking, OR-ed together
+    keywords: List[str] = field(default_factory=list)
+    # The question rules something out; retrieval can't express that, but canned answers must not ignore it
+    negated: bool = False
+
+    @property
+    def tsquery(self) -> str:
+        return " | ".join(self.keywords)
+
+    @property
+    def constrained(self) -> bool:
+        return self.max_price is not None or self.min_price is not None or self.negated
+
+
+def _amount(match: re.Match) -> Decimal:
+    return Decimal(next(group for group in match.groups() if group))
+
+
+def _singular(word: str) -> List[str]:
+    forms = [word]
+    if word.endswith("ies") and len(word) > 4:
+        forms.append(word[:-3] + "y")
+    elif word.endswith("es") and len(word) > 3:
+        forms.extend([word[:-2], word[:-1]])
+    elif word.endswith("s") and len(word) > 3:
+        forms.append(word[:-1])
+    return forms
+
+
+def extract_filters(question: str) -> QueryFilters:
+    """
+    Pulls structured constraints out of a diner's question.
+
+    "anything with prawns under $15?" gives max_price=15 and keywords
+    ["anything", "with", "prawns"]; Postgres drops the stop words.
+    """
+    filters = QueryFilters()
+    text = question.lower()
+    filters.negated = NEGATION.search(text) is not None
+
+    match = MAX_PRICE.search(text)
+    if match:
+        filters.max_price = _amount(match)
+        text = text[:match.start()] + " " + text[match.end():]
+    match = MIN_PRICE.search(text)
+    if match:
+        filters.min_price = _amount(match)
+        text = text[:match.start()] + " " + text[match.end():]
+
+    words = [word.strip("'-").replace("'", "") for word in WORD.findall(text)]
+    words = [word for word in words if len(word) > 1]
+    filters.keywords = list(dict.fromkeys(words))
+    filters.category_terms = list(dict.fromkeys(form for word in words for form in _singular(word)))
+    return filters
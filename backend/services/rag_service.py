@@ -1,55 +1,439 @@
 import os
+import asyncio
+import hashlib
+import threading
+import time
 import numpy as np
-from sentence_transformers import SentenceTransformer
 from openai import AsyncOpenAI
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text
-from typing import List, AsyncGenerator
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import bindparam, text, select, func
+from sqlalchemy.dialects.postgresql import insert
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+from services.embedding_executor import EmbeddingExecutor
+from services.embedding_backends import create_backend
+from services.cache import question_cache, retrieval_cache, normalize_question
+from services.menu_state import MenuState
+from services.memory_index import memory_index
+from models import DEFAULT_RESTAURANT, EmbeddingModel, MenuEmbedding
+from services.ann_index import apply_search_settings
+from services.query_filters import extract_filters
+from database import borrow_session
+from services.generation_scheduler import generation_scheduler, SchedulerBusy
+from services.prompt_builder import PromptStats, build_messages, estimate_prompt_tokens, select_context
+from services import metrics
 
-# Load embedding model (cached globally)
-model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+# Load embedding model (cached globally); reindex.py can switch the active model in the database.
+# EMBEDDING_BACKEND picks what runs it: sentence-transformers, onnx or openai.
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+# Nothing is loaded at import time: the first encode (or main.py's warm-up) loads the backend
+model_name = EMBEDDING_MODEL
+backend = None
+# The active model's vector size, once sync_active_model has read it; menu_embeddings' column follows it
+embedding_dimension: Optional[int] = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    # Called from embedding worker threads, so the first load is guarded
+    global backend
+    if backend is None:
+        with _backend_lock:
+            if backend is None:
+                backend = create_backend(model_name)
+    return backend
+
+
+# gunicorn --preload sets this so the model is loaded once in the master and shared copy-on-write by the workers.
+# One intra-op thread: a thread pool started before gunicorn forks would not exist in the workers.
+if os.getenv("EMBEDDING_PRELOAD", "false").lower() == "true":
+    backend = create_backend(model_name, threads=1)
+
+# Batches concurrent encodes and keeps them off the event loop
+embedding_executor = EmbeddingExecutor(lambda texts: get_backend().encode(texts))
 
 # LM Studio Client
 LM_STUDIO_URL = os.getenv("LM_STUDIO_URL", "http://host.docker.internal:1234/v1")
 client = AsyncOpenAI(base_url=LM_STUDIO_URL, api_key="lm-studio")
 
+# "pgvector" queries the restaurant's menu_embeddings partition per question, "memory" searches a NumPy copy of it
+RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "pgvector")
+# "vector" ranks by embedding only; "hybrid" fuses full-text and vector ranks in SQL and applies price/category filters
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "vector")
+# Candidates taken from each ranking before fusion, and the reciprocal rank fusion constant
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# Vectors are only compared while menu_embeddings holds this worker's model: reindex.py swaps the table and the
+# active model in one commit, and a worker that hasn't heard yet gets no rows instead of a dimension error
+ACTIVE_MODEL_GUARD = "(SELECT name FROM embedding_models WHERE status = 'active') = :model"
+
+# Price bounds and "one of these words is a category" are pushed into both rankings
+HYBRID_FILTER = """
+    (CAST(:max_price AS numeric) IS NULL OR mi.price <= CAST(:max_price AS numeric))
+    AND (CAST(:min_price AS numeric) IS NULL OR mi.price >= CAST(:min_price AS numeric))
+    AND (
+        NOT EXISTS (SELECT 1 FROM menu_items c
+                    WHERE c.restaurant_id = :restaurant AND lower(c.category) = ANY(CAST(:categories AS text[])))
+        OR lower(mi.category) = ANY(CAST(:categories AS text[]))
+    )
+"""
+HYBRID_QUERY = text(f"""
+    WITH vector_ranked AS (
+        SELECT e.item_id, e.content_chunk, e.embedding <=> :vector AS distance,
+               row_number() OVER (ORDER BY e.embedding <=> :vector) AS rank
+        FROM menu_embeddings e
+        JOIN menu_items mi ON mi.id = e.item_id
+        WHERE e.restaurant_id = :restaurant AND {ACTIVE_MODEL_GUARD} AND {HYBRID_FILTER}
+        ORDER BY e.embedding <=> :vector
+        LIMIT :candidates
+    ),
+    keyword_ranked AS (
+        SELECT e.item_id, e.content_chunk, e.embedding <=> :vector AS distance,
+               row_number() OVER (ORDER BY ts_rank_cd(e.content_tsv, q) DESC) AS rank
+        FROM menu_embeddings e
+        JOIN menu_items mi ON mi.id = e.item_id,
+             to_tsquery('english', :tsquery) q
+        WHERE e.restaurant_id = :restaurant AND e.content_tsv @@ q AND {ACTIVE_MODEL_GUARD} AND {HYBRID_FILTER}
+        ORDER BY ts_rank_cd(e.content_tsv, q) DESC
+        LIMIT :candidates
+    )
+    SELECT coalesce(v.content_chunk, k.content_chunk) AS content_chunk,
+           coalesce(v.distance, k.distance) AS distance,
+           v.item_id IS NULL AS keyword_only,
+           coalesce(1.0 / (:rrf_k + v.rank), 0) + coalesce(1.0 / (:rrf_k + k.rank), 0) AS score
+    FROM vector_ranked v
+    FULL OUTER JOIN keyword_ranked k ON k.item_id = v.item_id
+    ORDER BY score DESC, distance
+    LIMIT :limit
+""")
+
+# Retrieved chunks are only valid for the menu they were read from. Keys carry the restaurant's
+# version, so one restaurant's edit leaves the others' entries alone; a fleet-wide change drops them all.
+@MenuState.on_change
+def _drop_retrieval_cache(restaurant_id: Optional[str]):
+    if restaurant_id is None:
+        retrieval_cache.clear()
+
+class GenerationStats:
+    """
+    Outcomes of LLM generations. Tokens saved by cancelling is an estimate:
+    the average length of completed answers minus what was already generated.
+    """
+
+    outcomes: Dict[str, int] = {}
+    completed_tokens = 0
+    tokens_generated = 0
+    tokens_saved = 0
+
+    @classmethod
+    def record(cls, outcome: str, generated: int):
+        cls.outcomes[outcome] = cls.outcomes.get(outcome, 0) + 1
+        cls.tokens_generated += generated
+        if outcome == "completed":
+            cls.completed_tokens += generated
+        elif outcome not in ("error", "rejected"):
+            completed = cls.outcomes.get("completed", 0)
+            if completed:
+                cls.tokens_saved += max(0, round(cls.completed_tokens / completed) - generated)
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        return {
+            "outcomes": dict(cls.outcomes),
+            "tokens_generated": cls.tokens_generated,
+            "tokens_saved_by_cancellation": cls.tokens_saved,
+        }
+
+class EmbeddingModelChanged(RuntimeError):
+    pass
+
+
 class RAGService:
+    @staticmethod
+    def load_model(name: str):
+        # Swaps the global model; encodes already queued finish on whichever model they started with
+        global backend, model_name
+        with _backend_lock:
+            if name == model_name:
+                return
+            previous = backend
+            # Not loaded yet: just remember the name and load the right model first time round
+            backend = create_backend(name) if previous is not None else None
+            model_name = name
+        if previous is not None:
+            previous.close()
+
+    @staticmethod
+    async def sync_active_model(session: AsyncSession):
+        """Loads the model reindex.py marked active, or records the configured one if none is."""
+        active = (await session.execute(
+            select(EmbeddingModel).where(EmbeddingModel.status == "active")
+        )).scalar_one_or_none()
+
+        global embedding_dimension
+        if active is None:
+            dimension = await asyncio.to_thread(lambda: get_backend().dimension())
+            session.add(EmbeddingModel(name=model_name, dimension=dimension, status="active", activated_at=func.now()))
+            await session.commit()
+            embedding_dimension = dimension
+            return
+
+        if active.name != model_name:
+            print(f"Switching embedding model to {active.name} (set by reindex.py)")
+            await asyncio.to_thread(RAGService.load_model, active.name)
+            memory_index.clear()
+        embedding_dimension = active.dimension
+
+    @staticmethod
+    async def refresh_model(session: Optional[AsyncSession]) -> bool:
+        """
+        Switches to the active model if reindex.py changed it and this worker
+        hasn't processed the notification yet. Returns whether it switched.
+        """
+        if session is None:
+            async with borrow_session() as borrowed:
+                return await RAGService.refresh_model(borrowed)
+        active = (await session.execute(text("SELECT name FROM embedding_models WHERE status = 'active'"))).scalar()
+        if active is None or active == model_name:
+            return False
+        await RAGService.sync_active_model(session)
+        # Question vectors from the old model would retrieve nonsense against the new table
+        question_cache.clear()
+        MenuState.bump()
+        return True
+
+    @staticmethod
+    async def embed_for_write(db: AsyncSession, contents: List[str]) -> Tuple[str, List[List[float]]]:
+        """
+        Encodes menu text that is about to be stored, with the active model
+        even if this worker hasn't heard about a reindex.py switch yet.
+        Returns the model name with the vectors; pass both to write_embeddings.
+        """
+        await RAGService.refresh_model(db)
+        model = model_name
+        return model, await embedding_executor.embed_many(contents)
+
+    @staticmethod
+    async def write_embeddings(db: AsyncSession, restaurant_id: str, rows: List[Dict[str, Any]],
+                               model: str) -> List[List[float]]:
+        """
+        Inserts or replaces embeddings (dicts of item_id, embedding,
+        content_chunk and content_hash) for one restaurant, in one executemany.
+
+        `model` is the model that encoded the rows (from embed_for_write). If
+        it is no longer the active one, the rows are encoded again with the
+        active model rather than stored with a content_hash that would keep
+        the wrong vectors forever. Call this after writing menu_items in the
+        same transaction: reindex.py's switch locks menu_items, so the active
+        model can't change between this check and the commit. Returns the
+        vectors actually written.
+        """
+        active = (await db.execute(text("SELECT name FROM embedding_models WHERE status = 'active'"))).scalar()
+        if active is not None and active != model:
+            await RAGService.refresh_model(db)
+            if model_name != active:
+                raise EmbeddingModelChanged(f"Encoded with {model}, but {active} is the active embedding model")
+            vectors = await embedding_executor.embed_many([row["content_chunk"] for row in rows])
+            rows = [{**row, "embedding": vector} for row, vector in zip(rows, vectors)]
+
+        table = MenuEmbedding.__table__
+        # Vectors are checked against the active model's size, not the size the model class was declared with
+        statement = insert(table).values(embedding=bindparam("vector", type_=Vector(embedding_dimension)))
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.restaurant_id, table.c.item_id],
+            set_={"embedding": statement.excluded.embedding, "content_chunk": statement.excluded.content_chunk,
+                  "content_hash": statement.excluded.content_hash},
+        )
+        await db.execute(statement, [
+            {"restaurant_id": restaurant_id, "item_id": row["item_id"], "vector": row["embedding"],
+             "content_chunk": row["content_chunk"], "content_hash": row["content_hash"]}
+            for row in rows
+        ])
+        return [row["embedding"] for row in rows]
+
+    @staticmethod
+    def build_content_chunk(name: str, description: str, category: Optional[str]) -> str:
+        # The text that gets embedded for a menu item; keep every writer on this one format
+        return f"Name: {name}. Description: {description}. Category: {category or 'General'}."
+
+    @staticmethod
+    def content_hash(content_chunk: str) -> str:
+        # Stored next to the embedding so unchanged text is never re-encoded
+        return hashlib.sha256(content_chunk.encode("utf-8")).hexdigest()
+
     @staticmethod
     def generate_embedding(content: str) -> List[float]:
-        embedding = model.encode(content)
-        return embedding.tolist()
+        return get_backend().encode([content])[0].tolist()
+
+    @staticmethod
+    async def embed(content: str) -> List[float]:
+        # Async variant for request handlers; never blocks the event loop
+        return await embedding_executor.embed(content)
+
+    @staticmethod
+    async def embed_many(contents: List[str]) -> List[List[float]]:
+        # Batched encode for bulk writes
+        return await embedding_executor.embed_many(contents)
 
     @staticmethod
-    async def find_similar_context(session: AsyncSession, query_vector: List[float], limit: int = 3) -> str:
-        # Perform cosine similarity search using pgvector
-        query = text("""
-            SELECT content_chunk 
+    async def embed_question(question: str) -> List[float]:
+        key = normalize_question(question)
+        vector = question_cache.get(key)
+        if vector is None:
+            vector = await embedding_executor.embed(key)
+            question_cache.set(key, vector)
+        return vector
+
+    @staticmethod
+    async def find_similar_context(session: Optional[AsyncSession], query_vector: List[float], limit: int = 3,
+                                   question: Optional[str] = None, restaurant_id: str = DEFAULT_RESTAURANT) -> str:
+        """
+        Retrieves the context for a question from one restaurant's menu. With
+        session=None a pooled connection is borrowed only if the cache and
+        in-memory index can't answer.
+        """
+        # Hybrid results depend on the question's words and filters, not just its embedding
+        hybrid = RETRIEVAL_MODE == "hybrid" and question is not None
+        cache_key = (restaurant_id, MenuState.version_of(restaurant_id), tuple(query_vector), limit,
+                     normalize_question(question) if hybrid else None)
+        cached = retrieval_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        matches = await RAGService._search(session, restaurant_id, query_vector, limit, question if hybrid else None)
+        if not matches and question is not None and await RAGService.refresh_model(session):
+            # reindex.py switched models before this worker heard: embed the question again and retry on the new table
+            query_vector = await RAGService.embed_question(question)
+            matches = await RAGService._search(session, restaurant_id, query_vector, limit, question if hybrid else None)
+        # Deduplicated, distance-filtered, token-budgeted and in a stable order
+        context = select_context(matches).text
+        retrieval_cache.set(cache_key, context)
+        return context
+
+    @staticmethod
+    async def _search(session: Optional[AsyncSession], restaurant_id: str, query_vector: List[float], limit: int,
+                      question: Optional[str]) -> List[Tuple]:
+        # The memory backend needs a connection once per restaurant (and model), to load its index
+        index = memory_index.get(restaurant_id)
+        needs_db = (question is not None or RETRIEVAL_BACKEND != "memory" or index is None
+                    or index.model not in (None, model_name))
+        if session is None and needs_db:
+            async with borrow_session() as borrowed:
+                return await RAGService._search(borrowed, restaurant_id, query_vector, limit, question)
+        if question is not None:
+            return await RAGService.hybrid_retrieve(session, query_vector, question, limit, restaurant_id)
+        return await RAGService.retrieve(session, query_vector, limit, restaurant_id)
+
+    @staticmethod
+    async def retrieve(session: AsyncSession, query_vector: List[float], limit: int = 3,
+                       restaurant_id: str = DEFAULT_RESTAURANT) -> List[Tuple[str, float]]:
+        # Returns (content_chunk, cosine distance) pairs, closest first
+        if RETRIEVAL_BACKEND == "memory":
+            index = memory_index.get(restaurant_id)
+            if index is None or index.model not in (None, model_name):
+                index = await memory_index.load(session, restaurant_id)
+            if index.model not in (None, model_name):
+                # Loaded from a table another model wrote; find_similar_context syncs the model and retries
+                return []
+            return index.search(query_vector, limit)
+
+        # Perform cosine similarity search using pgvector. The restaurant_id filter prunes the scan to
+        # that restaurant's partition, and its own ANN index when there is one.
+        await apply_search_settings(session)
+        query = text(f"""
+            SELECT content_chunk, embedding <=> :vector AS distance
             FROM menu_embeddings 
+            WHERE restaurant_id = :restaurant AND {ACTIVE_MODEL_GUARD}
             ORDER BY embedding <=> :vector 
             LIMIT :limit
         """)
         
-        result = await session.execute(query, {"vector": str(query_vector), "limit": limit})
-        chunks = [row[0] for row in result.fetchall()]
-        return "\n".join(chunks)
+        result = await session.execute(query, {"vector": str(query_vector), "restaurant": restaurant_id, "limit": limit,
+                                               "model": model_name})
+        return [(row[0], row[1]) for row in result.fetchall()]
 
     @staticmethod
-    async def chat_stream(context: str, question: str) -> AsyncGenerator[str, None]:
-        system_prompt = (
-            "You are a helpful restaurant concierge. Answer the customer's question based ONLY on the menu context provided below. "
-            "If the answer is not in the context, say you don't know and suggest they ask about the dishes listed.\n\n"
-            f"Context:\n{context}"
-        )
+    async def hybrid_retrieve(session: AsyncSession, query_vector: List[float], question: str,
+                              limit: int = 3, restaurant_id: str = DEFAULT_RESTAURANT) -> List[Tuple[str, float, bool]]:
+        """
+        Reciprocal rank fusion of a GIN-indexed full-text ranking and the vector
+        ranking, in one round-trip, with filters taken from the question.
+        Returns (content_chunk, cosine distance, keyword_only) triples.
+        """
+        filters = extract_filters(question)
+        await apply_search_settings(session)
+        result = await session.execute(HYBRID_QUERY, {
+            "vector": str(query_vector),
+            "restaurant": restaurant_id,
+            "tsquery": filters.tsquery,
+            "max_price": filters.max_price,
+            "min_price": filters.min_price,
+            "categories": filters.category_terms,
+            "candidates": max(HYBRID_CANDIDATES, limit),
+            "rrf_k": RRF_K,
+            "limit": limit,
+            "model": model_name,
+        })
+        return [(row.content_chunk, row.distance, row.keyword_only) for row in result.fetchall()]
 
-        response = await client.chat.completions.create(
-            model="qwen3-vl-4b-instruct-abliterated-v2", # Model name is ignored by LM Studio usually
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": question}
-            ],
-            stream=True
-        )
+    @staticmethod
+    async def chat_stream(context: str, question: str, connection_id: Hashable = None,
+                          on_queue_position: Optional[Callable[[int], Awaitable[Any]]] = None,
+                          reserved: Any = None) -> AsyncGenerator[str, None]:
+        # Waits for a generation slot first (in a superseded question's place, if handed one); raises SchedulerBusy when the queue is full
+        messages = build_messages(context, question)
+        prefill_tokens = estimate_prompt_tokens(messages)
+        reported = False
+
+        generated = 0
+        outcome = "completed"
+        sent = 0.0
+        queued = time.perf_counter()
+        try:
+            async with generation_scheduler.slot(connection_id, on_queue_position, reserved):
+                sent = time.perf_counter()
+                metrics.record_stage("queue", sent - queued)
+                response = await client.chat.completions.create(
+                    model="qwen3-vl-4b-instruct-abliterated-v2", # Model name is ignored by LM Studio usually
+                    messages=messages,
+                    stream=True,
+                    # The last chunk then carries the server's own prompt token count
+                    stream_options={"include_usage": True},
+                )
 
-        async for chunk in response:
-            if chunk.choices[0].delta.content:
-                yield chunk.choices[0].delta.content
+                try:
+                    async for chunk in response:
+                        if chunk.usage and chunk.usage.prompt_tokens:
+                            prefill_tokens = chunk.usage.prompt_tokens
+                            reported = True
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            if not generated:
+                                metrics.record_stage("ttft", time.perf_counter() - sent)
+                            generated += 1
+                            yield chunk.choices[0].delta.content
+                finally:
+                    # Closing the HTTP stream is what makes LM Studio stop generating
+                    await response.close()
+        except asyncio.CancelledError as e:
+            outcome = e.args[0] if e.args else "cancelled"
+            raise
+        except GeneratorExit:
+            # The consumer stopped reading, e.g. the socket send failed
+            outcome = "closed"
+            raise
+        except SchedulerBusy:
+            outcome = "rejected"
+            raise
+        except Exception:
+            outcome = "error"
+            raise
+        finally:
+            GenerationStats.record(outcome, generated)
+            if sent:
+                metrics.record_stage("generation", time.perf_counter() - sent)
+                metrics.TOKENS_STREAMED.observe(generated)
+                metrics.PROMPT_TOKENS.observe(prefill_tokens)
+                PromptStats.record_prefill(prefill_tokens, reported)
+            metrics.annotate(outcome=outcome, tokens=generated, prefill_tokens=prefill_tokens,
+                             prefill_reported=reported)
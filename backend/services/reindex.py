@@ -0,0 +1,250 @@
+import asyncio
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import text, bindparam
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncSessionLocal
+from services import encode_worker
+from services.rag_service import RAGService
+from services.tenancy import EMBEDDINGS_TABLE, create_partition_sql
+
+SHADOW_TABLE = "menu_embeddings_next"
+PREVIOUS_TABLE = "menu_embeddings_previous"
+
+UPSERT_SHADOW = text(f"""
+    INSERT INTO {SHADOW_TABLE} (restaurant_id, item_id, embedding, content_chunk, content_hash)
+    VALUES (:restaurant_id, :item_id, :embedding, :content_chunk, :content_hash)
+    ON CONFLICT (restaurant_id, item_id) DO UPDATE
+    SET embedding = EXCLUDED.embedding,
+        content_chunk = EXCLUDED.content_chunk,
+        content_hash = EXCLUDED.content_hash
+""").bindparams(bindparam("embedding", type_=Vector()))
+
+
+class ReindexError(RuntimeError):
+    pass
+
+
+class ReindexJob:
+    """
+    Re-embeds every menu item with a new model without interrupting retrieval.
+
+    Rows are written to a shadow table while menu_embeddings keeps serving.
+    Work is committed per chunk and the job only picks up items missing from
+    the shadow table, so an interrupted run resumes where it stopped. The
+    shadow table is partitioned by restaurant like the live one, and the
+    final switch renames both tables and their partitions inside one transaction.
+    """
+
+    def __init__(self, model_name: str, workers: int = 0, chunk_size: int = 256, restart: bool = False):
+        self.model_name = model_name
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.restart = restart
+        self._pool: ProcessPoolExecutor = None
+
+    async def run(self):
+        # spawn, not fork: torch's thread pools do not survive a fork, and this process may hold a multi-threaded
+        # model (gunicorn_conf.py only forks a master whose model was loaded with one thread)
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=encode_worker.init_worker,
+            initargs=(self.model_name, 1),
+        )
+        try:
+            dimension = len((await self._encode(["dimension probe"]))[0])
+            print(f"Re-indexing with {self.model_name} ({dimension} dims) on {self.workers} processes")
+            await self._prepare(dimension)
+            await self._backfill()
+            await self._switch(dimension)
+        finally:
+            self._pool.shutdown()
+
+    async def _encode(self, texts: Sequence[str]) -> np.ndarray:
+        # Fan one chunk out across all processes and stitch the results back in order
+        loop = asyncio.get_running_loop()
+        size = max(1, -(-len(texts) // self.workers))
+        parts = [texts[i:i + size] for i in range(0, len(texts), size)]
+        encoded = await asyncio.gather(*(loop.run_in_executor(self._pool, encode_worker.encode, part) for part in parts))
+        return np.concatenate(encoded) if encoded else np.zeros((0, 0), dtype=np.float32)
+
+    async def _prepare(self, dimension: int):
+        async with AsyncSessionLocal() as db:
+            building = (await db.execute(
+                text("SELECT name, dimension FROM embedding_models WHERE status = 'building'")
+            )).all()
+            for name, built_dimension in building:
+                if name != self.model_name or built_dimension != dimension:
+                    if not self.restart:
+                        raise ReindexError(f"A re-index for {name} is in progress; pass --restart to discard it")
+                    await db.execute(text("DELETE FROM embedding_models WHERE name = :name AND status = 'building'"), {"name": name})
+                    await db.execute(text(f"DROP TABLE IF EXISTS {SHADOW_TABLE}"))
+
+            if self.restart:
+                await db.execute(text(f"DROP TABLE IF EXISTS {SHADOW_TABLE}"))
+
+            # Same columns, defaults, indexes and partitioning as the live table, with the new vector size
+            await db.execute(text(f"""
+                CREATE TABLE IF NOT EXISTS {SHADOW_TABLE}
+                (LIKE menu_embeddings INCLUDING ALL)
+                PARTITION BY LIST (restaurant_id)
+            """))
+            await db.execute(text(f"ALTER TABLE {SHADOW_TABLE} ALTER COLUMN embedding TYPE vector({dimension})"))
+            await db.execute(text(f"""
+                DO $$ BEGIN
+                    ALTER TABLE {SHADOW_TABLE} ADD CONSTRAINT {SHADOW_TABLE}_item_id_fkey
+                        FOREIGN KEY (item_id) REFERENCES menu_items(id) ON DELETE CASCADE;
+                EXCEPTION WHEN duplicate_object THEN NULL;
+                END $$
+            """))
+            await db.execute(text("""
+                INSERT INTO embedding_models (name, dimension, status)
+                VALUES (:name, :dimension, 'building')
+                ON CONFLICT (name) DO UPDATE SET dimension = EXCLUDED.dimension, status = 'building'
+            """), {"name": self.model_name, "dimension": dimension})
+            await db.commit()
+
+    async def _ensure_shadow_partitions(self, db: AsyncSession):
+        # One per restaurant with items, including restaurants created since the job started
+        restaurants = (await db.execute(text("SELECT DISTINCT restaurant_id FROM menu_items"))).scalars().all()
+        for restaurant_id in restaurants:
+            await db.execute(text(create_partition_sql(restaurant_id, SHADOW_TABLE)))
+
+    async def _rename_partitions(self, db: AsyncSession, table: str, old_parent: str, new_parent: str):
+        # Keeps partition names following their parent: menu_embeddings_next__x -> menu_embeddings__x
+        names = (await db.execute(text("""
+            SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(:table)
+        """), {"table": table})).scalars().all()
+        for name in names:
+            if name.startswith(f"{old_parent}__"):
+                await db.execute(text(f'ALTER TABLE "{name}" RENAME TO "{new_parent}{name[len(old_parent):]}"'))
+
+    async def _parent_indexes(self, db: AsyncSession, table: str) -> Dict[str, str]:
+        # index name -> its definition without the index and table names, e.g. "USING hnsw (embedding ...) WITH (...)"
+        rows = (await db.execute(text("""
+            SELECT i.relname, pg_get_indexdef(i.oid) FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid
+            WHERE x.indrelid = to_regclass(:table)
+        """), {"table": table})).all()
+        return {name: ("UNIQUE " if definition.startswith("CREATE UNIQUE") else "") + definition.split(" USING ", 1)[1]
+                for name, definition in rows}
+
+    async def _rename_indexes(self, db: AsyncSession):
+        """
+        Gives the new menu_embeddings the index names the old one had. LIKE ...
+        INCLUDING ALL generated menu_embeddings_next_* names, while
+        ensure_vector_index and SCHEMA_UPGRADES create fixed names with IF NOT
+        EXISTS, which would otherwise no-op against the previous table's index.
+        """
+        previous = await self._parent_indexes(db, PREVIOUS_TABLE)
+        for name in previous:
+            if name.startswith(f"{EMBEDDINGS_TABLE}_"):
+                await db.execute(text(f'ALTER INDEX "{name}" RENAME TO "{PREVIOUS_TABLE}{name[len(EMBEDDINGS_TABLE):]}"'))
+        canonical = {definition: name for name, definition in previous.items()}
+        for name, definition in (await self._parent_indexes(db, EMBEDDINGS_TABLE)).items():
+            target = canonical.get(definition)
+            if target and target != name:
+                await db.execute(text(f'ALTER INDEX "{name}" RENAME TO "{target}"'))
+
+    async def _write(self, db: AsyncSession, rows: List[Tuple[uuid.UUID, str, str]]):
+        chunks = [chunk for _, _, chunk in rows]
+        vectors = await self._encode(chunks)
+        await db.execute(UPSERT_SHADOW, [
+            {"restaurant_id": restaurant_id, "item_id": item_id, "embedding": vector,
+             "content_chunk": chunk, "content_hash": RAGService.content_hash(chunk)}
+            for (item_id, restaurant_id, chunk), vector in zip(rows, vectors)
+        ])
+
+    async def _backfill(self):
+        async with AsyncSessionLocal() as db:
+            await self._ensure_shadow_partitions(db)
+            await db.commit()
+            total = (await db.execute(text("SELECT count(*) FROM menu_items"))).scalar_one()
+            done = (await db.execute(text(f"SELECT count(*) FROM {SHADOW_TABLE}"))).scalar_one()
+            if done:
+                print(f"Resuming: {done}/{total} items already embedded")
+
+            started = time.monotonic()
+            processed = 0
+            last_id = None
+            while True:
+                # Keyset pagination over items that are not in the shadow table yet
+                result = await db.execute(text(f"""
+                    SELECT mi.id, mi.restaurant_id, mi.name, mi.description, mi.category
+                    FROM menu_items mi
+                    LEFT JOIN {SHADOW_TABLE} n ON n.item_id = mi.id
+                    WHERE n.item_id IS NULL AND (CAST(:after AS uuid) IS NULL OR mi.id > :after)
+                    ORDER BY mi.id
+                    LIMIT :limit
+                """), {"after": last_id, "limit": self.chunk_size})
+                batch = result.all()
+                if not batch:
+                    break
+                last_id = batch[-1].id
+
+                await self._write(db, [
+                    (row.id, row.restaurant_id, RAGService.build_content_chunk(row.name, row.description, row.category))
+                    for row in batch
+                ])
+                await db.commit()
+
+                processed += len(batch)
+                done += len(batch)
+                elapsed = time.monotonic() - started
+                rate = processed / elapsed if elapsed else 0.0
+                eta = (total - done) / rate if rate else 0.0
+                print(f"  {done}/{total} items ({rate:.1f} items/s, ETA {eta:.0f}s)")
+
+    async def _catch_up(self, db: AsyncSession) -> int:
+        # Items created or edited through the API since the backfill read them
+        await self._ensure_shadow_partitions(db)
+        result = await db.execute(text(f"""
+            SELECT mi.id, mi.restaurant_id, mi.name, mi.description, mi.category, n.content_hash
+            FROM menu_items mi
+            LEFT JOIN {SHADOW_TABLE} n ON n.item_id = mi.id
+        """))
+        stale = []
+        for row in result.all():
+            chunk = RAGService.build_content_chunk(row.name, row.description, row.category)
+            if row.content_hash != RAGService.content_hash(chunk):
+                stale.append((row.id, row.restaurant_id, chunk))
+
+        for start in range(0, len(stale), self.chunk_size):
+            await self._write(db, stale[start:start + self.chunk_size])
+        return len(stale)
+
+    async def _switch(self, dimension: int):
+        async with AsyncSessionLocal() as db:
+            # A first pass without locks keeps the locked window short
+            caught_up = await self._catch_up(db)
+            await db.commit()
+            print(f"Caught up {caught_up} items edited during the backfill")
+
+            # Block menu writes until the swap commits; reads keep going
+            await db.execute(text("LOCK TABLE menu_items IN SHARE ROW EXCLUSIVE MODE"))
+            caught_up = await self._catch_up(db)
+            await db.execute(text(f"DROP TABLE IF EXISTS {PREVIOUS_TABLE}"))
+            await db.execute(text(f"ALTER TABLE {EMBEDDINGS_TABLE} RENAME TO {PREVIOUS_TABLE}"))
+            await self._rename_partitions(db, PREVIOUS_TABLE, EMBEDDINGS_TABLE, PREVIOUS_TABLE)
+            await db.execute(text(f"ALTER TABLE {SHADOW_TABLE} RENAME TO {EMBEDDINGS_TABLE}"))
+            await self._rename_partitions(db, EMBEDDINGS_TABLE, SHADOW_TABLE, EMBEDDINGS_TABLE)
+            await self._rename_indexes(db)
+            await db.execute(text("UPDATE embedding_models SET status = 'retired' WHERE status = 'active'"))
+            await db.execute(text("""
+                UPDATE embedding_models SET status = 'active', activated_at = now() WHERE name = :name
+            """), {"name": self.model_name})
+            # Delivered on commit; API processes also read the active model at startup
+            await db.execute(text("SELECT pg_notify('embedding_model', :name)"), {"name": self.model_name})
+            await db.commit()
+
+        print(f"Switched retrieval to {self.model_name} ({dimension} dims, {caught_up} late edits applied)")
+        print(f"The previous embeddings are kept in {PREVIOUS_TABLE} until the next re-index")
@@ -0,0 +1,115 @@
+import hashlib
+from typing import Iterable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncConnection
+from sqlalchemy.schema import CreateTable
+
+from database import Base
+from models import DEFAULT_RESTAURANT, EMBEDDING_DIM, SCHEMA_UPGRADES
+from services.tenancy import ensure_partition
+
+# The fingerprint of the last schema applied is kept as a comment on this table
+MARKER_TABLE = "menu_items"
+# An unpartitioned menu_embeddings (from before restaurant_id) is moved here while its rows are copied over
+LEGACY_EMBEDDINGS_TABLE = "menu_embeddings_unpartitioned"
+# Advisory lock key for schema and vector index DDL; any constant works as long as every process uses the same one
+SCHEMA_LOCK = 7310421
+
+
+def schema_fingerprint() -> str:
+    dialect = postgresql.dialect()
+    ddl = [str(CreateTable(table).compile(dialect=dialect)) for table in Base.metadata.sorted_tables]
+    return "schema:" + hashlib.sha1("\n".join(ddl + SCHEMA_UPGRADES).encode("utf-8")).hexdigest()
+
+
+async def _detach_legacy_embeddings(conn: AsyncConnection) -> Optional[int]:
+    """
+    Renames a plain (unpartitioned) menu_embeddings out of the way and drops
+    its constraints and indexes, whose names the partitioned table reuses.
+    Returns the dimension of its vectors, or None if there is nothing to move.
+    """
+    relkind = (await conn.execute(text("SELECT relkind FROM pg_class WHERE oid = to_regclass('menu_embeddings')"))).scalar()
+    if relkind != "r":
+        return None
+
+    # pgvector keeps the dimension in the type modifier
+    dimension = (await conn.execute(text("""
+        SELECT atttypmod FROM pg_attribute WHERE attrelid = 'menu_embeddings'::regclass AND attname = 'embedding'
+    """))).scalar()
+    await conn.execute(text(f"ALTER TABLE menu_embeddings RENAME TO {LEGACY_EMBEDDINGS_TABLE}"))
+    constraints = (await conn.execute(text("SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(:table)"),
+                                      {"table": LEGACY_EMBEDDINGS_TABLE})).scalars().all()
+    for name in constraints:
+        await conn.execute(text(f'ALTER TABLE {LEGACY_EMBEDDINGS_TABLE} DROP CONSTRAINT "{name}"'))
+    indexes = (await conn.execute(text("SELECT indexname FROM pg_indexes WHERE tablename = :table"),
+                                  {"table": LEGACY_EMBEDDINGS_TABLE})).scalars().all()
+    for name in indexes:
+        await conn.execute(text(f'DROP INDEX "{name}"'))
+    return dimension
+
+
+def legacy_copy_sql(legacy_columns: Iterable[str]) -> str:
+    # Baseline menu_embeddings had no content_hash; a NULL hash just makes the next content check re-embed the row
+    content_hash = "e.content_hash" if "content_hash" in legacy_columns else "NULL::varchar"
+    return f"""
+        INSERT INTO menu_embeddings (restaurant_id, item_id, embedding, content_chunk, content_hash)
+        SELECT mi.restaurant_id, e.item_id, e.embedding, e.content_chunk, {content_hash}
+        FROM {LEGACY_EMBEDDINGS_TABLE} e
+        JOIN menu_items mi ON mi.id = e.item_id
+    """
+
+
+async def lock_schema(conn: AsyncConnection):
+    # Held until the caller's transaction ends; re-entrant, so ensure_vector_index can take it again
+    await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SCHEMA_LOCK})
+
+
+async def _current_fingerprint(conn: AsyncConnection) -> Optional[str]:
+    return (await conn.execute(
+        text("SELECT obj_description(to_regclass(:table), 'pg_class')"), {"table": MARKER_TABLE}
+    )).scalar()
+
+
+async def ensure_schema(conn: AsyncConnection) -> bool:
+    """
+    Creates the extension, tables and upgrades, unless the database already
+    carries this code's schema fingerprint. A normal restart then costs one
+    catalog lookup instead of a round of DDL. Returns whether DDL ran.
+
+    Every gunicorn worker calls this at startup. The DDL runs under
+    SCHEMA_LOCK and the fingerprint is checked again once it is held, so
+    one worker migrates and the others wait for it, then find nothing to do.
+    """
+    fingerprint = schema_fingerprint()
+    if await _current_fingerprint(conn) == fingerprint:
+        return False
+    await lock_schema(conn)
+    if await _current_fingerprint(conn) == fingerprint:
+        return False
+
+    # Enable pgvector extension
+    await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+    legacy_dimension = await _detach_legacy_embeddings(conn)
+    await conn.run_sync(Base.metadata.create_all)
+    if legacy_dimension and legacy_dimension != EMBEDDING_DIM:
+        # Keep the vectors' current size, which reindex.py may have changed from EMBEDDING_DIM.
+        # The new table has no partitions or vector index yet, so this is a catalog change only.
+        await conn.execute(text(f"ALTER TABLE menu_embeddings ALTER COLUMN embedding TYPE vector({int(legacy_dimension)})"))
+    for statement in SCHEMA_UPGRADES:
+        await conn.execute(text(statement))
+
+    # Partitions for every restaurant that already has items; new ones are added on their first write
+    restaurants = set((await conn.execute(text("SELECT DISTINCT restaurant_id FROM menu_items"))).scalars())
+    for restaurant_id in sorted(restaurants | {DEFAULT_RESTAURANT}):
+        await ensure_partition(conn, restaurant_id)
+    if legacy_dimension is not None:
+        legacy_columns = (await conn.execute(text("""
+            SELECT column_name FROM information_schema.columns WHERE table_schema = current_schema() AND table_name = :table
+        """), {"table": LEGACY_EMBEDDINGS_TABLE})).scalars().all()
+        moved = await conn.execute(text(legacy_copy_sql(legacy_columns)))
+        await conn.execute(text(f"DROP TABLE {LEGACY_EMBEDDINGS_TABLE}"))
+        print(f"Moved {moved.rowcount} embeddings into the partitioned menu_embeddings")
+    await conn.execute(text(f"COMMENT ON TABLE {MARKER_TABLE} IS '{fingerprint}'"))
+    return True
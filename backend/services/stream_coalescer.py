@@ -0,0 +1,83 @@
+import asyncio
+import os
+import time
+from typing import AsyncIterator
+
+# Deltas are buffered until this much time has passed since the first one, or until the byte threshold
+STREAM_FLUSH_MS = float(os.getenv("STREAM_FLUSH_MS", "30"))
+STREAM_FLUSH_BYTES = int(os.getenv("STREAM_FLUSH_BYTES", "512"))
+
+_END = object()
+
+
+async def coalesce(stream: AsyncIterator[str], window_ms: float = STREAM_FLUSH_MS,
+                   max_bytes: int = STREAM_FLUSH_BYTES) -> AsyncIterator[str]:
+    """
+    Merges small deltas from `stream` into fewer, larger chunks.
+
+    A chunk is emitted when window_ms has passed since its first delta or when
+    it reaches max_bytes, whichever comes first, so a stalled upstream never
+    holds text back for longer than the window. window_ms <= 0 passes deltas
+    through unchanged.
+    """
+    if window_ms <= 0:
+        async for delta in stream:
+            yield delta
+        return
+
+    window = window_ms / 1000.0
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def pump():
+        try:
+            async for delta in stream:
+                queue.put_nowait(delta)
+            queue.put_nowait(_END)
+        except asyncio.CancelledError:
+            raise
+        except BaseException as e:
+            queue.put_nowait(e)
+
+    # The upstream is read by its own task so the flush timer can fire while it is idle
+    reader = asyncio.create_task(pump())
+    buffer = []
+    size = 0
+    deadline = 0.0
+    try:
+        while True:
+            timeout = max(0.0, deadline - time.monotonic()) if buffer else None
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                yield "".join(buffer)
+                buffer, size = [], 0
+                continue
+
+            if item is _END:
+                break
+            if isinstance(item, BaseException):
+                if buffer:
+                    yield "".join(buffer)
+                raise item
+
+            if not buffer:
+                deadline = time.monotonic() + window
+            buffer.append(item)
+            size += len(item.encode("utf-8"))
+            if size >= max_bytes:
+                yield "".join(buffer)
+                buffer, size = [], 0
+
+        if buffer:
+            yield "".join(buffer)
+    except asyncio.CancelledError as e:
+        # Pass the reason ("superseded", "disconnected") on to the upstream generator
+        reader.cancel(*e.args)
+        raise
+    finally:
+        if not reader.done():
+            reader.cancel()
+        try:
+            await reader
+        except BaseException:
+            pass
@@ -0,0 +1,63 @@
+import re
+from typing import Mapping
+
+from fastapi import HTTPException, Request
+from sqlalchemy import text
+
+from models import DEFAULT_RESTAURANT
+from services.menu_changes import MENU_WRITE_LOCK
+
+RESTAURANT_HEADER = "X-Restaurant-Id"
+# Browsers can't set headers on a WebSocket, so /ws/chat and /ws/menu also accept ?restaurant=
+RESTAURANT_PARAM = "restaurant"
+# Restaurant ids end up in partition names (menu_embeddings__<id>), hence the short, plain alphabet
+RESTAURANT_ID = re.compile(r"^[a-z0-9_]{1,32}$")
+
+EMBEDDINGS_TABLE = "menu_embeddings"
+
+
+class InvalidRestaurant(ValueError):
+    pass
+
+
+def resolve_restaurant(headers: Mapping[str, str], query_params: Mapping[str, str]) -> str:
+    restaurant_id = (headers.get(RESTAURANT_HEADER) or query_params.get(RESTAURANT_PARAM) or DEFAULT_RESTAURANT).strip().lower()
+    if not RESTAURANT_ID.match(restaurant_id):
+        raise InvalidRestaurant(f"Invalid restaurant id {restaurant_id!r}; use 1-32 lowercase letters, digits or underscores")
+    return restaurant_id
+
+
+def get_restaurant(request: Request) -> str:
+    # Dependency for the HTTP routes: the restaurant every query of this request is scoped to
+    try:
+        return resolve_restaurant(request.headers, request.query_params)
+    except InvalidRestaurant as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def partition_name(restaurant_id: str, table: str = EMBEDDINGS_TABLE) -> str:
+    # Double underscore: menu_embeddings__<id> can never equal reindex.py's menu_embeddings_next__<id>
+    return f"{table}__{restaurant_id}"
+
+
+def create_partition_sql(restaurant_id: str, table: str = EMBEDDINGS_TABLE) -> str:
+    # restaurant_id has been through RESTAURANT_ID, so it is safe to inline (DDL takes no bind parameters)
+    return (f'CREATE TABLE IF NOT EXISTS "{partition_name(restaurant_id, table)}" '
+            f"PARTITION OF {table} FOR VALUES IN ('{restaurant_id}')")
+
+
+async def ensure_partition(db, restaurant_id: str):
+    """
+    Creates the restaurant's menu_embeddings partition before its first
+    embedding is written. The partition inherits the parent's vector and
+    full-text indexes, so every restaurant gets its own, menu-sized ANN index.
+    Works on a session or a connection, inside the caller's transaction.
+    """
+    if not RESTAURANT_ID.match(restaurant_id):
+        raise InvalidRestaurant(f"Invalid restaurant id {restaurant_id!r}")
+    exists = (await db.execute(text("SELECT to_regclass(:name)"), {"name": partition_name(restaurant_id)})).scalar()
+    if exists:
+        return
+    # Same lock as record_menu_changes, so two first writes for a new restaurant don't race on the DDL
+    await db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MENU_WRITE_LOCK})
+    await db.execute(text(create_partition_sql(restaurant_id)))
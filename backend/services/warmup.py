@@ -0,0 +1,113 @@
+import asyncio
+import os
+import time
+from typing import Any, Dict, Optional
+
+from sqlalchemy import text
+
+from database import AsyncSessionLocal, DB_POOL_SIZE, borrow_session
+from models import DEFAULT_RESTAURANT
+from services.memory_index import memory_index
+from services.rag_service import RAGService, RETRIEVAL_BACKEND, embedding_executor, get_backend
+
+# A warm-up that fails (database still starting, model download timing out) is retried this many times in all,
+# waiting WARMUP_RETRY_DELAY seconds before the second attempt and twice as long before each one after that
+WARMUP_ATTEMPTS = int(os.getenv("WARMUP_ATTEMPTS", "5"))
+WARMUP_RETRY_DELAY = float(os.getenv("WARMUP_RETRY_DELAY", "2"))
+WARMUP_MAX_RETRY_DELAY = 60.0
+
+
+class StartupReport:
+    """
+    Where boot time went. Phases before "serving" delay every route; the
+    ones after it run in the background and only delay readiness.
+    """
+
+    phases: Dict[str, float] = {}
+    serving = False
+    ready = False
+    attempts = 0
+    # Set once every warm-up attempt has failed; /healthz then fails so the process gets restarted
+    failed = False
+    error: Optional[str] = None
+
+    @classmethod
+    def record(cls, phase: str, started: float):
+        cls.phases[phase] = round(time.perf_counter() - started, 3)
+
+    @classmethod
+    def report(cls) -> Dict[str, Any]:
+        return {
+            "serving": cls.serving,
+            "ready": cls.ready,
+            "attempts": cls.attempts,
+            "failed": cls.failed,
+            "error": cls.error,
+            "phases_s": dict(cls.phases),
+        }
+
+
+async def prime_pool():
+    # Open the pool's steady-state connections now rather than on the first few requests
+    async def touch():
+        async with borrow_session() as session:
+            await session.execute(text("SELECT 1"))
+
+    await asyncio.gather(*(touch() for _ in range(DB_POOL_SIZE)))
+
+
+async def _warm_up_once():
+    started = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        await RAGService.sync_active_model(db)
+    await asyncio.to_thread(get_backend)
+    StartupReport.record("model_load", started)
+
+    started = time.perf_counter()
+    await embedding_executor.embed("warm up")
+    StartupReport.record("first_encode", started)
+
+    started = time.perf_counter()
+    await prime_pool()
+    StartupReport.record("db_pool", started)
+
+    if RETRIEVAL_BACKEND == "memory":
+        started = time.perf_counter()
+        async with AsyncSessionLocal() as db:
+            index = await memory_index.load(db, DEFAULT_RESTAURANT)
+        StartupReport.record("memory_index", started)
+        print(f"Loaded {len(index)} menu embeddings of {DEFAULT_RESTAURANT} into the in-memory index")
+
+
+async def warm_up():
+    """
+    Loads the embedding model, runs a first encode, primes the DB pool and
+    (for RETRIEVAL_BACKEND=memory) loads the default restaurant's in-memory
+    index; other restaurants load on their first question. Menu routes are
+    already serving while this runs; /readyz turns green when it is done.
+
+    Failures are retried with exponential backoff. If every attempt fails,
+    StartupReport.failed turns /healthz red as well, so the orchestrator
+    restarts the process instead of leaving it live but never ready.
+    """
+    delay = WARMUP_RETRY_DELAY
+    try:
+        while True:
+            StartupReport.attempts += 1
+            try:
+                await _warm_up_once()
+            except Exception as e:
+                StartupReport.error = f"{type(e).__name__}: {e}"
+                if StartupReport.attempts >= WARMUP_ATTEMPTS:
+                    StartupReport.failed = True
+                    print(f"Warm-up failed {StartupReport.attempts} times, giving up: {StartupReport.error}")
+                    return
+                print(f"Warm-up attempt {StartupReport.attempts} failed, retrying in {delay:.0f}s: {StartupReport.error}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, WARMUP_MAX_RETRY_DELAY)
+            else:
+                StartupReport.error = None
+                StartupReport.ready = True
+                return
+    finally:
+        print(f"Startup report: {StartupReport.report()}")
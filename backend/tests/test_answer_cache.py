@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from services import answer_cache as answer_cache_module
+from services.answer_cache import SemanticAnswerCache
+from services.menu_state import MenuState
+
+CONTEXT = "Name: Green Curry. Description: Hot. Category: Mains."
+SPICY = [1.0, 0.0]
+
+
+def near(similarity):
+    # A unit vector with exactly this cosine similarity to SPICY
+    return [similarity, float(np.sqrt(1 - similarity ** 2))]
+
+
+@pytest.fixture
+def cache():
+    return SemanticAnswerCache(maxsize=4, threshold=0.92, ttl=3600)
+
+
+def store(cache, restaurant_id, vector=SPICY, context=CONTEXT, question="What's spicy?"):
+    cache.store(question, vector, context, ["The green ", "curry."], restaurant_id,
+                MenuState.version_of(restaurant_id))
+
+
+def test_similar_question_replays_the_stored_chunks(cache):
+    store(cache, "answers_hit")
+    entry = cache.lookup(near(0.95), CONTEXT, "answers_hit")
+    assert entry is not None
+    assert entry.chunks == ["The green ", "curry."]
+    assert (cache.hits, entry.hits) == (1, 1)
+
+
+def test_question_below_the_threshold_misses(cache):
+    store(cache, "answers_threshold")
+    assert cache.lookup(near(0.9), CONTEXT, "answers_threshold") is None
+    assert cache.lookup(near(0.92), CONTEXT, "answers_threshold") is not None
+    assert cache.misses == 1
+
+
+def test_answers_are_scoped_to_their_restaurant(cache):
+    store(cache, "answers_a")
+    assert cache.lookup(SPICY, CONTEXT, "answers_b") is None
+
+
+def test_a_menu_write_makes_answers_unreachable(cache):
+    store(cache, "answers_version")
+    MenuState.bump("answers_version")
+    assert cache.lookup(SPICY, CONTEXT, "answers_version") is None
+
+
+def test_answer_for_a_context_retrieved_before_a_write_is_not_stored(cache):
+    retrieved_at = MenuState.version_of("answers_late")
+    MenuState.bump("answers_late")
+    cache.store("What's spicy?", SPICY, CONTEXT, ["Curry."], "answers_late", retrieved_at)
+    assert cache.stats()["size"] == 0
+
+
+def test_different_context_misses(cache):
+    store(cache, "answers_context")
+    assert cache.lookup(SPICY, CONTEXT + " Name: Som Tum.", "answers_context") is None
+
+
+def test_expired_answers_are_dropped(cache, monkeypatch):
+    store(cache, "answers_ttl")
+    later = answer_cache_module.time.monotonic() + 3601
+    monkeypatch.setattr(answer_cache_module.time, "monotonic", lambda: later)
+    assert cache.lookup(SPICY, CONTEXT, "answers_ttl") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_oldest_answer_is_evicted(cache):
+    for i in range(5):
+        store(cache, "answers_lru", vector=[1.0, float(i)], question=f"q{i}")
+    assert cache.evictions == 1
+    assert [entry["question"] for entry in cache.stats()["top_entries"]] == ["q1", "q2", "q3", "q4"]
+
+
+def test_answers_without_chunks_are_not_stored(cache):
+    cache.store("What's spicy?", SPICY, CONTEXT, [], "answers_empty", MenuState.version_of("answers_empty"))
+    assert cache.stats()["size"] == 0
+
+
+def test_clear_one_restaurant_keeps_the_others(cache):
+    store(cache, "answers_keep")
+    store(cache, "answers_drop")
+    cache.clear("answers_drop")
+    assert cache.lookup(SPICY, CONTEXT, "answers_keep") is not None
+    assert cache.lookup(SPICY, CONTEXT, "answers_drop") is None
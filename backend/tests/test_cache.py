@@ -0,0 +1,83 @@
+import pytest
+
+from services import cache
+from services.cache import LRUCache, normalize_question
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_least_recently_used_entry_is_evicted():
+    lru = LRUCache("test", maxsize=2)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    assert lru.get("a") == 1
+    lru.set("c", 3)
+    assert lru.get("b") is None
+    assert (lru.get("a"), lru.get("c")) == (1, 3)
+    assert lru.evictions == 1
+
+
+def test_setting_an_existing_key_refreshes_it():
+    lru = LRUCache("test", maxsize=2)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    lru.set("a", 10)
+    lru.set("c", 3)
+    assert lru.get("a") == 10
+    assert lru.get("b") is None
+
+
+def test_entries_expire_after_the_ttl(clock):
+    lru = LRUCache("test", maxsize=8, ttl=60)
+    lru.set("a", 1)
+    clock[0] += 59
+    assert lru.get("a") == 1
+    clock[0] += 2
+    assert lru.get("a", "gone") == "gone"
+    assert len(lru) == 0
+
+
+def test_reading_does_not_extend_the_ttl(clock):
+    lru = LRUCache("test", maxsize=8, ttl=60)
+    lru.set("a", 1)
+    clock[0] += 40
+    lru.get("a")
+    clock[0] += 40
+    assert lru.get("a") is None
+
+
+def test_no_ttl_never_expires(clock):
+    lru = LRUCache("test", maxsize=8)
+    lru.set("a", 1)
+    clock[0] += 10 ** 9
+    assert lru.get("a") == 1
+
+
+def test_zero_size_caches_nothing():
+    lru = LRUCache("test", maxsize=0)
+    lru.set("a", 1)
+    assert lru.get("a") is None
+
+
+def test_stats_count_hits_and_misses(clock):
+    lru = LRUCache("test", maxsize=8, ttl=60)
+    lru.set("a", 1)
+    lru.get("a")
+    lru.get("b")
+    clock[0] += 61
+    lru.get("a")
+    assert lru.stats() == {"size": 0, "maxsize": 8, "hits": 1, "misses": 2, "evictions": 0, "hit_rate": 0.3333}
+
+
+@pytest.mark.parametrize("question", ["What is spicy?", "what is  spicy", "  WHAT is spicy ?!", "what is spicy."])
+def test_normalize_question_collapses_case_space_and_trailing_punctuation(question):
+    assert normalize_question(question) == "what is spicy"
+
+
+def test_normalize_question_keeps_inner_punctuation():
+    assert normalize_question("Is the pad thai gluten-free, or not?") == "is the pad thai gluten-free, or not"
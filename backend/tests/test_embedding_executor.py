@@ -0,0 +1,97 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+from services.embedding_executor import EmbeddingExecutor
+
+
+def lengths(texts):
+    return np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+
+
+def test_concurrent_requests_share_one_encode():
+    calls = []
+
+    def encode(texts):
+        calls.append(list(texts))
+        return lengths(texts)
+
+    async def scenario():
+        executor = EmbeddingExecutor(encode, max_batch=8, wait_ms=20)
+        vectors = await asyncio.gather(*(executor.embed(text) for text in ("a", "bb", "ccc")))
+        assert not executor._batches
+        executor.shutdown()
+        return vectors
+
+    assert asyncio.run(scenario()) == [[1.0, 1.0], [2.0, 1.0], [3.0, 1.0]]
+    assert calls == [["a", "bb", "ccc"]]
+
+
+def test_full_batch_is_sent_without_waiting():
+    calls = []
+
+    def encode(texts):
+        calls.append(list(texts))
+        return lengths(texts)
+
+    async def scenario():
+        executor = EmbeddingExecutor(encode, max_batch=2, wait_ms=10_000)
+        await asyncio.wait_for(asyncio.gather(executor.embed("a"), executor.embed("b")), 5)
+        executor.shutdown()
+
+    asyncio.run(scenario())
+    assert calls == [["a", "b"]]
+
+
+def test_encode_errors_reach_every_caller():
+    def encode(texts):
+        raise RuntimeError("model not loaded")
+
+    async def scenario():
+        executor = EmbeddingExecutor(encode, wait_ms=1)
+        results = await asyncio.gather(executor.embed("a"), executor.embed("b"), return_exceptions=True)
+        executor.shutdown()
+        return results
+
+    assert [str(result) for result in asyncio.run(scenario())] == ["model not loaded"] * 2
+
+
+def test_shutdown_cancels_batches_in_flight():
+    release = threading.Event()
+
+    def encode(texts):
+        release.wait(5)
+        return lengths(texts)
+
+    async def scenario():
+        executor = EmbeddingExecutor(encode, wait_ms=0)
+        waiting = asyncio.ensure_future(executor.embed("a"))
+        while not executor._batches:
+            await asyncio.sleep(0.001)
+        executor.shutdown()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        await asyncio.sleep(0)
+        assert not executor._batches
+        release.set()
+
+    asyncio.run(scenario())
+
+
+def test_embed_many_splits_into_batches():
+    calls = []
+
+    def encode(texts):
+        calls.append(len(texts))
+        return lengths(texts)
+
+    async def scenario():
+        executor = EmbeddingExecutor(encode, max_batch=2)
+        vectors = await executor.embed_many(["a", "bb", "ccc"])
+        executor.shutdown()
+        return vectors
+
+    assert asyncio.run(scenario()) == [[1.0, 1.0], [2.0, 1.0], [3.0, 1.0]]
+    assert calls == [2, 1]
@@ -0,0 +1,78 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from services import rag_service
+from services.rag_service import EmbeddingModelChanged, RAGService
+
+
+class FakeSession:
+    """Answers the active-model lookup and records the embeddings upsert."""
+
+    def __init__(self, active):
+        self.active = active
+        self.written = []
+
+    async def execute(self, statement, params=None):
+        if params is None:
+            return SimpleNamespace(scalar=lambda: self.active)
+        self.written.extend(params)
+
+
+@pytest.fixture
+def encoder(monkeypatch):
+    encoded = []
+
+    async def embed_many(contents):
+        encoded.append((rag_service.model_name, list(contents)))
+        return [[float(len(rag_service.model_name))] * 2 for _ in contents]
+
+    async def refresh_model(session):
+        # What sync_active_model does once it reads the switch from embedding_models
+        switched = session.active != rag_service.model_name
+        monkeypatch.setattr(rag_service, "model_name", session.active)
+        return switched
+
+    monkeypatch.setattr(rag_service, "model_name", "old-model")
+    monkeypatch.setattr(rag_service.embedding_executor, "embed_many", embed_many)
+    monkeypatch.setattr(RAGService, "refresh_model", staticmethod(refresh_model))
+    return encoded
+
+
+def rows(vector):
+    return [{"item_id": uuid.uuid4(), "embedding": vector, "content_chunk": "Soup", "content_hash": "h"}]
+
+
+def test_rows_from_the_active_model_are_written_as_encoded(encoder):
+    db = FakeSession(active="old-model")
+    written = asyncio.run(RAGService.write_embeddings(db, "bistro", rows([1.0, 1.0]), "old-model"))
+    assert written == [[1.0, 1.0]]
+    assert db.written[0]["vector"] == [1.0, 1.0]
+    assert encoder == []
+
+
+def test_rows_from_a_retired_model_are_encoded_again(encoder):
+    # This worker encoded with old-model; reindex.py has made new-model active since
+    db = FakeSession(active="new-model")
+    written = asyncio.run(RAGService.write_embeddings(db, "bistro", rows([1.0, 1.0]), "old-model"))
+    assert encoder == [("new-model", ["Soup"])]
+    assert written == [[9.0, 9.0]]
+    assert db.written[0]["vector"] == [9.0, 9.0]
+    assert db.written[0]["content_hash"] == "h"
+
+
+def test_unresolvable_model_mismatch_raises(encoder, monkeypatch):
+    async def refresh_model(session):
+        return False
+
+    monkeypatch.setattr(RAGService, "refresh_model", staticmethod(refresh_model))
+    with pytest.raises(EmbeddingModelChanged):
+        asyncio.run(RAGService.write_embeddings(FakeSession(active="new-model"), "bistro", rows([1.0]), "old-model"))
+
+
+def test_embed_for_write_picks_up_a_switch_first(encoder):
+    model, vectors = asyncio.run(RAGService.embed_for_write(FakeSession(active="new-model"), ["Soup"]))
+    assert model == "new-model"
+    assert encoder == [("new-model", ["Soup"])]
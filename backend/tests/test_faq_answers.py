@@ -0,0 +1,134 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from services import faq_answers as faq_module
+from services.faq_answers import FaqAnswers
+
+QUESTIONS = ["What's spicy?", "What are the vegetarian options?", "What drinks do you have?"]
+
+
+@pytest.fixture
+def faq(monkeypatch):
+    monkeypatch.setattr(faq_module, "FAQ_QUESTIONS", QUESTIONS)
+    faq = FaqAnswers()
+    faq.enabled = True
+
+    async def answers(restaurant_id):
+        return {question: f"canned: {question}" for question in QUESTIONS}
+
+    monkeypatch.setattr(faq, "_answers", answers)
+    # One axis per FAQ, so a question's vector can be placed exactly on (or off) an FAQ without a model
+    faq._vectors = np.eye(len(QUESTIONS), dtype=np.float32)
+    return faq
+
+
+def vector_for(index):
+    return np.eye(len(QUESTIONS), dtype=np.float32)[index].tolist()
+
+
+def test_close_question_gets_the_canned_answer(faq):
+    answer = asyncio.run(faq.match("default", vector_for(0), "what's spicy"))
+    assert answer == "canned: What's spicy?"
+    assert faq.hits == 1
+
+
+def test_dissimilar_question_misses(faq):
+    between = np.array([1.0, 1.0, 0.0]) / np.sqrt(2)
+    assert asyncio.run(faq.match("default", between.tolist(), "spicy drinks?")) is None
+    assert faq.misses == 1
+
+
+@pytest.mark.parametrize("question, index", [
+    ("What's spicy under $10?", 0),
+    ("What's spicy but not too hot?", 0),
+    ("What's vegetarian without nuts?", 1),
+    ("What are the dairy-free vegetarian options?", 1),
+    ("What drinks don't have alcohol?", 2),
+])
+def test_near_miss_with_a_constraint_skips_the_canned_answer(faq, question, index):
+    # Embeds right on top of the FAQ, but the canned answer would ignore the price or the exclusion
+    assert asyncio.run(faq.match("default", vector_for(index), question)) is None
+    assert faq.skipped_constrained == 1
+    assert faq.hits == 0
+
+
+def test_disabled_never_matches(faq):
+    faq.enabled = False
+    assert asyncio.run(faq.match("default", vector_for(0), "What's spicy?")) is None
+
+
+class Leases:
+    """Stands in for faq_leases and the menu: records lease traffic and serves (version, stale) per check."""
+
+    def __init__(self, faq, monkeypatch, checks, available=True):
+        self.available = available
+        self.taken = 0
+        self.released = []
+        self.generated = []
+        checks = list(checks)
+
+        async def take_lease(restaurant_id, holder):
+            self.taken += 1
+            return self.available
+
+        async def release_lease(restaurant_id, holder):
+            self.released.append(restaurant_id)
+
+        async def stale_questions(restaurant_id):
+            return checks.pop(0)
+
+        async def generate(restaurant_id, questions, version):
+            self.generated.append((list(questions), version))
+
+        monkeypatch.setattr(faq, "_take_lease", take_lease)
+        monkeypatch.setattr(faq, "_release_lease", release_lease)
+        monkeypatch.setattr(faq, "_stale_questions", stale_questions)
+        monkeypatch.setattr(faq, "_generate", generate)
+
+
+def test_refresh_skips_when_another_worker_holds_the_lease(faq, monkeypatch):
+    leases = Leases(faq, monkeypatch, [], available=False)
+    asyncio.run(faq.refresh("default"))
+    assert faq.skipped == 1
+    assert leases.generated == []
+    assert leases.released == []
+
+
+def test_refresh_regenerates_until_the_menu_stops_changing(faq, monkeypatch):
+    leases = Leases(faq, monkeypatch, [
+        (3, QUESTIONS[:2]),
+        # A menu write landed during generation: the answers just made are stale again
+        (4, QUESTIONS),
+        (4, []),
+    ])
+    asyncio.run(faq.refresh("default"))
+    assert leases.generated == [(QUESTIONS[:2], 3), (QUESTIONS, 4)]
+    assert leases.released == ["default"]
+
+
+def test_failed_answers_do_not_loop_at_the_same_version(faq, monkeypatch):
+    leases = Leases(faq, monkeypatch, [(3, QUESTIONS[:1]), (3, QUESTIONS[:1])])
+    asyncio.run(faq.refresh("default"))
+    assert leases.generated == [(QUESTIONS[:1], 3)]
+    assert leases.released == ["default"]
+
+
+def test_refresh_releases_the_lease_when_cancelled(faq, monkeypatch):
+    leases = Leases(faq, monkeypatch, [(3, QUESTIONS)])
+
+    async def generate(restaurant_id, questions, version):
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(faq, "_generate", generate)
+
+    async def scenario():
+        task = asyncio.create_task(faq.refresh("default"))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+    assert leases.released == ["default"]
@@ -0,0 +1,163 @@
+import asyncio
+
+import pytest
+
+from services.generation_scheduler import GenerationScheduler, SchedulerBusy
+
+
+async def settle():
+    # Let every task waiting on the scheduler run up to its next await
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class Run:
+    """Drives questions through one scheduler and records the order they generate in."""
+
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+        self.order = []
+        self.positions = {}
+        self.done = {}
+
+    def ask(self, name, connection_id=None, reserved=None):
+        self.done[name] = asyncio.Event()
+
+        async def on_position(position):
+            self.positions.setdefault(name, []).append(position)
+
+        async def question():
+            async with self.scheduler.slot(connection_id or name, on_position, reserved):
+                self.order.append(name)
+                await self.done[name].wait()
+
+        return asyncio.create_task(question())
+
+    async def finish(self, name):
+        self.done[name].set()
+        await settle()
+
+
+def test_waiting_questions_run_in_arrival_order():
+    async def scenario():
+        run = Run(GenerationScheduler(max_concurrent=1, max_queue=8))
+        tasks = [run.ask(name) for name in ("first", "a", "b", "c")]
+        await settle()
+        assert run.order == ["first"]
+        assert run.positions == {"a": [1], "b": [2], "c": [3]}
+        for name in ("first", "a", "b"):
+            await run.finish(name)
+        await run.finish("c")
+        await asyncio.gather(*tasks)
+        assert run.order == ["first", "a", "b", "c"]
+        # Everyone behind the granted question heard that they moved up
+        assert run.positions["c"] == [3, 2, 1]
+        assert run.scheduler.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_rejects_immediately():
+    async def scenario():
+        scheduler = GenerationScheduler(max_concurrent=1, max_queue=1)
+        run = Run(scheduler)
+        tasks = [run.ask("first"), run.ask("a")]
+        await settle()
+        with pytest.raises(SchedulerBusy):
+            async with scheduler.slot("b"):
+                pass
+        assert scheduler.rejected == 1
+        await run.finish("first")
+        await run.finish("a")
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        run = Run(GenerationScheduler(max_concurrent=1, max_queue=8))
+        tasks = {name: run.ask(name) for name in ("first", "a", "b")}
+        await settle()
+        tasks["a"].cancel()
+        await settle()
+        assert run.positions["b"] == [2, 1]
+        await run.finish("first")
+        await run.finish("b")
+        assert run.order == ["first", "b"]
+
+    asyncio.run(scenario())
+
+
+def test_superseding_question_keeps_the_place_in_line():
+    async def scenario():
+        scheduler = GenerationScheduler(max_concurrent=1, max_queue=8)
+        run = Run(scheduler)
+        tasks = [run.ask("first"), run.ask("a", "socket"), run.ask("b")]
+        await settle()
+
+        # The socket asks again: the new question takes the old one's ticket, then the old one is cancelled
+        ticket = scheduler.supersede("socket")
+        assert ticket is not None
+        tasks[1].cancel("superseded")
+        tasks.append(run.ask("a2", "socket", ticket))
+        await settle()
+
+        for name in ("first", "a2", "b"):
+            await run.finish(name)
+        await asyncio.gather(*tasks[2:])
+        assert run.order == ["first", "a2", "b"]
+        assert scheduler.superseded == 1
+        assert scheduler.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_supersede_without_a_waiting_question_returns_none():
+    async def scenario():
+        scheduler = GenerationScheduler(max_concurrent=1, max_queue=8)
+        run = Run(scheduler)
+        task = run.ask("first", "socket")
+        await settle()
+        # Generating questions are cancelled by the caller; only waiting ones hand over their place
+        assert scheduler.supersede("socket") is None
+        await run.finish("first")
+        await task
+
+    asyncio.run(scenario())
+
+
+def test_abandoned_ticket_gives_up_its_place():
+    async def scenario():
+        scheduler = GenerationScheduler(max_concurrent=1, max_queue=8)
+        run = Run(scheduler)
+        tasks = [run.ask("first"), run.ask("a", "socket"), run.ask("b")]
+        await settle()
+        ticket = scheduler.supersede("socket")
+        tasks[1].cancel("superseded")
+        # The new question was answered from a cache and never reached slot()
+        scheduler.abandon(ticket)
+        await settle()
+        await run.finish("first")
+        await run.finish("b")
+        assert run.order == ["first", "b"]
+        assert scheduler.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_abandoning_a_granted_ticket_releases_the_slot():
+    async def scenario():
+        scheduler = GenerationScheduler(max_concurrent=1, max_queue=8)
+        run = Run(scheduler)
+        tasks = [run.ask("first"), run.ask("a", "socket")]
+        await settle()
+        ticket = scheduler.supersede("socket")
+        tasks[1].cancel("superseded")
+        # The slot frees up before the new question gets to claim the ticket
+        await run.finish("first")
+        assert ticket.granted
+        scheduler.abandon(ticket)
+        assert scheduler.active == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,60 @@
+import pytest
+
+from services.image_reconcile import AssetIndex, tokens
+
+FILES = [
+    "green_curry.png",
+    "massaman_curry.png",
+    "red_curry_roast_duck.png",
+    "spicy_beef_salad.png",
+    "pad_thai.png",
+    "Pad_Thai_1769850416425.png",
+    "tom_yum_goong.png",
+]
+
+
+@pytest.fixture
+def index():
+    return AssetIndex(FILES)
+
+
+def test_tokens_ignore_case_punctuation_and_upload_timestamps():
+    assert tokens("Pad Thai!") == ("pad", "thai")
+    assert tokens("Pad_Thai_1769850416425") == ("pad", "thai")
+
+
+def test_exact_name_wins(index):
+    # Both files tokenize to ("pad", "thai"); the first in sorted order is used
+    assert index.match("Pad Thai") == ("Pad_Thai_1769850416425.png", "exact")
+    assert index.match("Green Curry") == ("green_curry.png", "exact")
+
+
+def test_best_token_overlap_matches(index):
+    assert index.match("Tom Yum Goong with Prawns") == ("tom_yum_goong.png", "tokens")
+    assert index.match("Roast Duck Red Curry (half)") == ("red_curry_roast_duck.png", "tokens")
+    assert index.match("Spicy Beef Salad Bowl") == ("spicy_beef_salad.png", "tokens")
+
+
+def test_more_shared_tokens_beat_higher_coverage(index):
+    # 3 of red_curry_roast_duck's 4 tokens outrank 1 of green_curry's 2
+    assert index.match("Red Curry Duck") == ("red_curry_roast_duck.png", "tokens")
+
+
+def test_equal_candidates_are_ambiguous(index):
+    # green_curry and massaman_curry each share one of their two tokens
+    assert index.match("Jungle Curry") == (None, "ambiguous")
+
+
+def test_files_covered_too_little_do_not_match(index):
+    # One of red_curry_roast_duck's four tokens, one of spicy_beef_salad's three
+    assert index.match("Duck Salad") == (None, "none")
+
+
+def test_unrelated_name_does_not_match(index):
+    assert index.match("Lemongrass Juice") == (None, "none")
+
+
+def test_membership_and_size(index):
+    assert len(index) == len(FILES)
+    assert "pad_thai.png" in index
+    assert "pad_thai.jpg" not in index
@@ -0,0 +1,143 @@
+import base64
+import hashlib
+import io
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from routers import media
+from services import image_store
+from services.image_store import InvalidImage, save_image, to_stored_value
+
+
+def png_bytes(color="red", size=(400, 300)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_store, "IMAGE_STORE_DIR", tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(media.router)
+    return TestClient(app)
+
+
+@pytest.fixture
+def stored():
+    raw = png_bytes()
+    return save_image(raw), raw
+
+
+def test_images_are_stored_under_their_sha256(store):
+    raw = png_bytes()
+    digest = save_image(raw)
+    assert digest == hashlib.sha256(raw).hexdigest()
+    directory = store / digest[:2] / digest
+    assert (directory / "original.png").read_bytes() == raw
+    with Image.open(directory / "thumb.webp") as thumb:
+        assert max(thumb.size) == 320
+
+
+def test_storing_the_same_image_twice_is_a_no_op(store):
+    raw = png_bytes()
+    assert save_image(raw) == save_image(raw)
+    assert len(list(store.iterdir())) == 1
+
+
+def test_data_uri_becomes_a_media_path():
+    raw = png_bytes("blue")
+    value = to_stored_value("data:image/png;base64," + base64.b64encode(raw).decode())
+    assert value == f"/media/{hashlib.sha256(raw).hexdigest()}"
+
+
+def test_other_values_are_kept():
+    assert to_stored_value("/images/pad_thai.png") == "/images/pad_thai.png"
+    assert to_stored_value(f"{image_store.MEDIA_BASE_URL}/media/abc") == "/media/abc"
+
+
+def test_non_image_data_is_rejected():
+    with pytest.raises(InvalidImage):
+        to_stored_value("data:image/png;base64," + base64.b64encode(b"not an image").decode())
+
+
+def test_serves_the_original_with_immutable_caching(client, stored):
+    digest, raw = stored
+    response = client.get(f"/media/{digest}")
+    assert response.status_code == 200
+    assert response.content == raw
+    assert response.headers["content-type"] == "image/png"
+    assert response.headers["etag"] == f'"{digest}-original"'
+    assert "immutable" in response.headers["cache-control"]
+
+
+def test_unknown_digest_or_variant_is_404(client, stored):
+    digest, _ = stored
+    assert client.get(f"/media/{'0' * 64}").status_code == 404
+    assert client.get(f"/media/{digest}/huge").status_code == 404
+    assert client.get("/media/not-a-digest").status_code == 404
+
+
+def test_matching_etag_is_304(client, stored):
+    digest, _ = stored
+    response = client.get(f"/media/{digest}/thumb", headers={"If-None-Match": f'"{digest}-thumb"'})
+    assert response.status_code == 304
+    assert response.content == b""
+
+
+@pytest.mark.parametrize("range_header, start, end", [
+    ("bytes=0-9", 0, 9),
+    ("bytes=10-", 10, None),
+    ("bytes=-5", -5, None),
+])
+def test_range_requests_get_partial_content(client, stored, range_header, start, end):
+    digest, raw = stored
+    response = client.get(f"/media/{digest}", headers={"Range": range_header})
+    assert response.status_code == 206
+    expected = raw[start:] if end is None else raw[start:end + 1]
+    assert response.content == expected
+    first = start % len(raw)
+    assert response.headers["content-range"] == f"bytes {first}-{first + len(expected) - 1}/{len(raw)}"
+
+
+def test_range_end_past_the_file_is_clamped(client, stored):
+    digest, raw = stored
+    response = client.get(f"/media/{digest}", headers={"Range": f"bytes=5-{len(raw) * 2}"})
+    assert response.status_code == 206
+    assert response.content == raw[5:]
+
+
+@pytest.mark.parametrize("range_header", ["bytes=-", "items=0-5", "bytes=0-5,10-20", "bytes=9-3"])
+def test_malformed_or_unsatisfiable_ranges_are_416(client, stored, range_header):
+    digest, raw = stored
+    response = client.get(f"/media/{digest}", headers={"Range": range_header})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(raw)}"
+
+
+def test_range_starting_past_the_end_is_416(client, stored):
+    digest, raw = stored
+    response = client.get(f"/media/{digest}", headers={"Range": f"bytes={len(raw)}-"})
+    assert response.status_code == 416
+
+
+def test_if_range_with_another_etag_gets_the_whole_file(client, stored):
+    digest, raw = stored
+    response = client.get(f"/media/{digest}", headers={"Range": "bytes=0-9", "If-Range": '"something-else"'})
+    assert response.status_code == 200
+    assert response.content == raw
+
+
+def test_if_range_with_the_current_etag_gets_the_range(client, stored):
+    digest, raw = stored
+    response = client.get(f"/media/{digest}", headers={"Range": "bytes=0-9", "If-Range": f'"{digest}-original"'})
+    assert response.status_code == 206
+    assert response.content == raw[:10]
@@ -0,0 +1,130 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from services.memory_index import MemoryIndexes, MemoryVectorIndex
+
+SOUP, CURRY, CAKE = (str(uuid.uuid4()) for _ in range(3))
+
+
+class FakeSession:
+    """Answers MemoryVectorIndex.load's SELECTs: the rows, then (for no rows) the active model."""
+
+    def __init__(self, rows, active=None):
+        self.rows = rows
+        self.active = active
+
+    async def execute(self, statement):
+        return SimpleNamespace(all=lambda: self.rows, first=lambda: self.active)
+
+
+def row(item_id, embedding, chunk, model="mini"):
+    return SimpleNamespace(item_id=uuid.UUID(item_id), embedding=embedding, content_chunk=chunk, model=model)
+
+
+@pytest.fixture
+def index():
+    index = MemoryVectorIndex("bistro", dimension=3)
+    asyncio.run(index.load(FakeSession([
+        row(SOUP, [1, 0, 0], "Soup"),
+        row(CURRY, [0, 1, 0], "Curry"),
+        row(CAKE, [0, 0, 1], "Cake"),
+    ])))
+    return index
+
+
+def test_load_reads_rows_and_model(index):
+    assert len(index) == 3
+    assert index.model == "mini"
+
+
+def test_search_returns_closest_first(index):
+    results = index.search([0.9, 0.1, 0], limit=2)
+    assert [chunk for chunk, _ in results] == ["Soup", "Curry"]
+    assert results[0][1] == pytest.approx(1 - 0.9 / (0.9 ** 2 + 0.1 ** 2) ** 0.5)
+
+
+def test_search_is_scale_invariant(index):
+    assert index.search([0, 0, 5], limit=1) == [("Cake", pytest.approx(0.0, abs=1e-6))]
+
+
+def test_upsert_replaces_an_existing_row(index):
+    index.upsert(uuid.UUID(CURRY), [1, 0, 1], "Curry with cake")
+    assert len(index) == 3
+    assert index.search([1, 0, 1], limit=1) == [("Curry with cake", pytest.approx(0.0, abs=1e-6))]
+    assert "Curry" not in [chunk for chunk, _ in index.search([0, 1, 0])]
+
+
+def test_upsert_appends_a_new_row(index):
+    index.upsert(str(uuid.uuid4()), [1, 1, 0], "Noodles")
+    assert len(index) == 4
+    assert index.search([1, 1, 0], limit=1)[0][0] == "Noodles"
+
+
+def test_remove_keeps_the_other_rows_searchable(index):
+    index.remove(SOUP)
+    assert len(index) == 2
+    assert [chunk for chunk, _ in index.search([0, 1, 0.5], limit=5)] == ["Curry", "Cake"]
+    # The row moved into the hole can still be found, replaced and removed by id
+    index.upsert(CAKE, [0, 0, 2], "Cheesecake")
+    assert index.search([0, 0, 1], limit=1)[0][0] == "Cheesecake"
+    index.remove(CAKE)
+    assert [chunk for chunk, _ in index.search([0, 0, 1], limit=5)] == ["Curry"]
+
+
+def test_remove_unknown_item_is_a_no_op(index):
+    index.remove(uuid.uuid4())
+    assert len(index) == 3
+
+
+def test_writes_before_load_are_ignored():
+    index = MemoryVectorIndex("bistro", dimension=3)
+    index.upsert(SOUP, [1, 0, 0], "Soup")
+    assert len(index) == 0
+    assert index.search([1, 0, 0]) == []
+
+
+def test_empty_restaurant_is_sized_for_the_active_model():
+    index = MemoryVectorIndex("bistro", dimension=3)
+    asyncio.run(index.load(FakeSession([], SimpleNamespace(name="large", dimension=5))))
+    assert index.loaded
+    assert (index.model, index.dimension) == ("large", 5)
+    assert index.search([1, 0, 0, 0, 0]) == []
+    index.upsert(SOUP, [1, 0, 0, 0, 0], "Soup")
+    assert index.search([1, 0, 0, 0, 0], limit=1)[0][0] == "Soup"
+
+
+def test_empty_index_takes_the_first_vectors_size():
+    index = MemoryVectorIndex("bistro", dimension=3)
+    asyncio.run(index.load(FakeSession([])))
+    assert index.model is None
+    index.upsert(SOUP, [0, 1], "Soup")
+    assert index.dimension == 2
+    assert index.search([0, 1]) == [("Soup", pytest.approx(0.0, abs=1e-6))]
+
+
+def test_vector_of_another_size_drops_the_restaurants_index():
+    indexes = MemoryIndexes()
+    asyncio.run(indexes.load(FakeSession([row(SOUP, [1, 0, 0], "Soup")]), "bistro"))
+    # Written by a worker that already encodes with a new, larger model
+    indexes.upsert("bistro", CURRY, [0, 1, 0, 0], "Curry")
+    assert indexes.get("bistro") is None
+
+
+def test_clear_drops_every_index():
+    indexes = MemoryIndexes()
+    asyncio.run(indexes.load(FakeSession([row(SOUP, [1, 0, 0], "Soup")]), "bistro"))
+    indexes.clear()
+    assert indexes.restaurants() == []
+
+
+def test_indexes_evict_the_least_recently_asked_restaurant():
+    indexes = MemoryIndexes(maxsize=2)
+    for restaurant_id in ("a", "b"):
+        asyncio.run(indexes.load(FakeSession([row(SOUP, [1, 0, 0], "Soup")]), restaurant_id))
+    indexes.get("a")
+    asyncio.run(indexes.load(FakeSession([]), "c"))
+    assert indexes.restaurants() == ["a", "c"]
+    assert indexes.evictions == 1
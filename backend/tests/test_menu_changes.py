@@ -0,0 +1,53 @@
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+
+from models import MenuItem
+from services.menu_changes import ADD, DELETE, UPDATE, collapse_deltas
+
+
+def item(name):
+    return MenuItem(id=uuid.uuid4(), restaurant_id="bistro", name=name, description=f"{name}, made fresh",
+                    price=Decimal("9.50"), category="Mains", created_at=datetime(2026, 1, 1, tzinfo=timezone.utc))
+
+
+def row(item_id, last_op, added, version):
+    return SimpleNamespace(item_id=item_id, last_op=last_op, added=added, version=version)
+
+
+def test_edited_item_is_an_update_carrying_the_item():
+    curry = item("Curry")
+    [delta] = collapse_deltas([row(curry.id, UPDATE, False, 7)], {curry.id: curry})
+    assert delta["op"] == UPDATE
+    assert delta["id"] == str(curry.id)
+    assert delta["version"] == 7
+    assert delta["item"]["name"] == "Curry"
+
+
+def test_item_added_then_edited_is_an_add():
+    soup = item("Soup")
+    [delta] = collapse_deltas([row(soup.id, UPDATE, True, 9)], {soup.id: soup})
+    assert delta["op"] == ADD
+
+
+def test_deleted_item_is_a_delete_without_the_item():
+    gone = uuid.uuid4()
+    assert collapse_deltas([row(gone, DELETE, False, 4)], {}) == [{"op": DELETE, "id": str(gone), "version": 4}]
+
+
+def test_item_added_and_deleted_in_between_is_left_out():
+    assert collapse_deltas([row(uuid.uuid4(), DELETE, True, 5)], {}) == []
+
+
+def test_item_missing_from_the_menu_counts_as_deleted():
+    # Deleted by a write that committed after the change rows were read
+    edited = uuid.uuid4()
+    assert collapse_deltas([row(edited, UPDATE, False, 6)], {}) == [{"op": DELETE, "id": str(edited), "version": 6}]
+
+
+def test_deltas_keep_the_version_order():
+    first, second = item("First"), item("Second")
+    deltas = collapse_deltas([row(first.id, UPDATE, False, 2), row(second.id, UPDATE, True, 3)],
+                             {first.id: first, second.id: second})
+    assert [(delta["op"], delta["version"]) for delta in deltas] == [(UPDATE, 2), (ADD, 3)]
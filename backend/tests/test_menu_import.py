@@ -0,0 +1,105 @@
+import asyncio
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException
+
+from routers.menu import decode_csv
+from services import menu_import
+from services.menu_import import import_menu_items, parse_csv
+from services.rag_service import RAGService
+
+
+class FakeSession:
+    """Records what import_menu_items writes instead of talking to Postgres."""
+
+    def __init__(self):
+        self.inserted = []
+        self.committed = False
+
+    async def execute(self, statement, params=None):
+        self.inserted.extend(params or [])
+
+    async def commit(self):
+        self.committed = True
+
+
+@pytest.fixture
+def written(monkeypatch):
+    written = {}
+
+    async def embed_for_write(db, chunks):
+        return "mini", [[0.0, 1.0] for _ in chunks]
+
+    async def write_embeddings(db, restaurant_id, rows, model):
+        written["embeddings"] = rows
+        return [row["embedding"] for row in rows]
+
+    async def record_menu_changes(db, restaurant_id, changes):
+        written["changes"] = list(changes)
+        return 1
+
+    async def ensure_partition(db, restaurant_id):
+        pass
+
+    monkeypatch.setattr(RAGService, "embed_for_write", staticmethod(embed_for_write))
+    monkeypatch.setattr(RAGService, "write_embeddings", staticmethod(write_embeddings))
+    monkeypatch.setattr(menu_import, "record_menu_changes", record_menu_changes)
+    monkeypatch.setattr(menu_import, "ensure_partition", ensure_partition)
+    return written
+
+
+def test_parse_csv_keeps_known_columns_and_blanks_become_none():
+    rows = parse_csv("name, price ,description,category,secret\nPad Thai,12.50,Rice noodles,,x\n")
+    assert rows == [{"name": "Pad Thai", "price": "12.50", "description": "Rice noodles", "category": None}]
+
+
+def test_parse_csv_of_a_header_only_file_is_empty():
+    assert parse_csv("name,description,price\n") == []
+
+
+def test_decode_csv_strips_the_byte_order_mark():
+    assert decode_csv(b"\xef\xbb\xbfname\nSoup\n") == "name\nSoup\n"
+
+
+def test_decode_csv_rejects_other_encodings():
+    with pytest.raises(HTTPException) as raised:
+        decode_csv("name\nCrème brûlée\n".encode("latin-1"))
+    assert raised.value.status_code == 400
+    assert "UTF-8" in raised.value.detail
+
+
+def test_invalid_rows_are_reported_by_position_and_skipped(written):
+    db = FakeSession()
+    rows = [
+        {"name": "Soup", "description": "Tom yum", "price": "9"},
+        {"name": "Curry", "price": "11"},
+        {"name": "Cake", "description": "Coconut", "price": "cheap"},
+    ]
+    result = asyncio.run(import_menu_items(db, rows, "bistro"))
+
+    assert [error["row"] for error in result.errors] == [2, 3]
+    assert "description" in result.errors[0]["error"]
+    assert "price" in result.errors[1]["error"]
+    assert len(result.item_ids) == 1
+    [item] = db.inserted
+    assert (item["name"], item["price"], item["restaurant_id"]) == ("Soup", Decimal("9"), "bistro")
+    assert written["changes"] == [(item["id"], "add")]
+    assert db.committed
+
+
+def test_invalid_image_is_a_row_error(written):
+    rows = [{"name": "Soup", "description": "Tom yum", "price": "9", "image_data": "data:image/png;base64,aGVsbG8="}]
+    result = asyncio.run(import_menu_items(FakeSession(), rows, "bistro"))
+    assert result.item_ids == []
+    assert result.errors[0]["row"] == 1
+    assert result.errors[0]["error"].startswith("image_data: ")
+
+
+def test_nothing_is_written_when_every_row_is_invalid(written):
+    db = FakeSession()
+    result = asyncio.run(import_menu_items(db, [{"name": "Soup"}], "bistro"))
+    assert len(result.errors) == 1
+    assert db.inserted == []
+    assert not db.committed
+    assert written == {}
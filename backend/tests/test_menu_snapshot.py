@@ -0,0 +1,128 @@
+import gzip
+import json
+import uuid
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routers import menu
+from services import menu_snapshot as menu_snapshot_module
+from services.menu_snapshot import MenuSnapshot, _accepted_encodings, menu_snapshots
+from services.menu_state import MenuState
+
+RESTAURANT = "snapshot_test"
+
+
+def item(name, category, price="9.50"):
+    return {"id": str(uuid.uuid4()), "name": name, "description": f"{name}, made fresh", "price": price,
+            "image_data": None, "category": category, "created_at": "2026-01-01T00:00:00Z", "thumbnail_url": None}
+
+
+ITEMS = [item("Green Curry", "Mains"), item("Som Tum", "Salads"), item("Massaman Curry", "mains")]
+
+
+def built(items, restaurant_id=RESTAURANT) -> MenuSnapshot:
+    # What refresh() leaves behind, without the database round-trip
+    snapshot = menu_snapshots.get(restaurant_id)
+    snapshot._items = list(items)
+    snapshot._variants.clear()
+    snapshot.menu_version = 12
+    snapshot.version = MenuState.version_of(restaurant_id)
+    return snapshot
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(menu.router)
+    built(ITEMS)
+    return TestClient(app, headers={"X-Restaurant-Id": RESTAURANT})
+
+
+def test_etag_depends_only_on_the_content():
+    first, second, fewer = MenuSnapshot("a"), MenuSnapshot("b"), MenuSnapshot("a")
+    first._items = second._items = ITEMS
+    fewer._items = ITEMS[:2]
+    assert first.body().etag == second.body().etag
+    assert first.body().etag != fewer.body().etag
+
+
+def test_variants_are_built_once_per_filter():
+    snapshot = MenuSnapshot("a")
+    snapshot._items = ITEMS
+    assert snapshot.body("MAINS") is snapshot.body("mains")
+    assert snapshot.body("mains") is not snapshot.body()
+
+
+def test_category_filter_ignores_case(client):
+    response = client.get("/menu/", params={"category": "MAINS"})
+    assert [entry["name"] for entry in response.json()] == ["Green Curry", "Massaman Curry"]
+
+
+def test_fields_project_each_item(client):
+    response = client.get("/menu/", params={"fields": "name, price"})
+    assert response.json()[0] == {"name": "Green Curry", "price": "9.50"}
+
+
+def test_unknown_field_is_rejected(client):
+    response = client.get("/menu/", params={"fields": "name,secret"})
+    assert response.status_code == 400
+    assert "secret" in response.json()["detail"]
+
+
+def test_matching_etag_is_304(client):
+    etag = client.get("/menu/").headers["etag"]
+    response = client.get("/menu/", headers={"If-None-Match": f'"other", {etag}'})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert response.headers["x-menu-version"] == "12"
+    assert response.content == b""
+
+
+def test_menu_write_changes_the_etag(client):
+    etag = client.get("/menu/").headers["etag"]
+    MenuState.bump(RESTAURANT)
+    built(ITEMS[:1])
+    response = client.get("/menu/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_brotli_is_preferred_when_accepted(client):
+    response = client.get("/menu/", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "br"
+    # The test client decodes it transparently
+    assert len(response.json()) == 3
+
+
+def test_gzip_without_brotli(client):
+    raw = client.get("/menu/", headers={"Accept-Encoding": "gzip"})
+    assert raw.headers["content-encoding"] == "gzip"
+    body = menu_snapshots.get(RESTAURANT).body()
+    assert json.loads(gzip.decompress(body.gzip)) == ITEMS
+
+
+def test_identity_when_nothing_is_accepted(client):
+    response = client.get("/menu/", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding, X-Restaurant-Id"
+
+
+def test_brotli_falls_back_to_gzip_when_not_installed(monkeypatch):
+    monkeypatch.setattr(menu_snapshot_module, "brotli", None)
+    snapshot = MenuSnapshot("a")
+    snapshot._items = ITEMS
+    body, encoding = snapshot.body().for_encoding("br, gzip")
+    assert encoding == "gzip"
+    assert gzip.decompress(body) == snapshot.body().identity
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, br", {"gzip", "br"}),
+    ("br;q=0, gzip;q=0.5", {"gzip"}),
+    ("GZIP ; q=1.0", {"gzip"}),
+    ("", set()),
+])
+def test_accepted_encodings(header, expected):
+    assert _accepted_encodings(header) == expected
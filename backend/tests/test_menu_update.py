@@ -0,0 +1,120 @@
+import asyncio
+import uuid
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+
+from models import MenuEmbedding, MenuItem
+from services import menu_update
+from services.menu_update import MenuItemsNotFound, apply_item_updates
+from services.rag_service import RAGService
+
+RESTAURANT = "update_test"
+
+
+class FakeSession:
+    """Serves apply_item_updates' two SELECTs from in-memory rows."""
+
+    def __init__(self, items, embeddings):
+        self.rows = {MenuItem: items, MenuEmbedding: embeddings}
+        self.committed = False
+
+    async def execute(self, statement):
+        rows = self.rows[statement.column_descriptions[0]["entity"]]
+        return SimpleNamespace(scalars=lambda: list(rows))
+
+    async def commit(self):
+        self.committed = True
+
+
+def menu_item(name, description="Fresh", category="Mains"):
+    return MenuItem(id=uuid.uuid4(), restaurant_id=RESTAURANT, name=name, description=description,
+                    price=Decimal("9.50"), category=category)
+
+
+def embedding_for(item, content_hash="current"):
+    chunk = RAGService.build_content_chunk(item.name, item.description, item.category)
+    return MenuEmbedding(restaurant_id=RESTAURANT, item_id=item.id, embedding=[0.0, 1.0], content_chunk=chunk,
+                         content_hash=RAGService.content_hash(chunk) if content_hash == "current" else content_hash)
+
+
+@pytest.fixture
+def encoded(monkeypatch):
+    encoded = {"chunks": [], "written": [], "partitions": 0}
+
+    async def embed_for_write(db, chunks):
+        encoded["chunks"].extend(chunks)
+        return "mini", [[1.0, 0.0] for _ in chunks]
+
+    async def write_embeddings(db, restaurant_id, rows, model):
+        encoded["written"].extend(rows)
+        return [row["embedding"] for row in rows]
+
+    async def record_menu_changes(db, restaurant_id, changes):
+        return 1
+
+    async def ensure_partition(db, restaurant_id):
+        encoded["partitions"] += 1
+
+    monkeypatch.setattr(RAGService, "embed_for_write", staticmethod(embed_for_write))
+    monkeypatch.setattr(RAGService, "write_embeddings", staticmethod(write_embeddings))
+    monkeypatch.setattr(menu_update, "record_menu_changes", record_menu_changes)
+    monkeypatch.setattr(menu_update, "ensure_partition", ensure_partition)
+    return encoded
+
+
+def update(db, updates):
+    return asyncio.run(apply_item_updates(db, updates, RESTAURANT))
+
+
+def test_price_change_does_not_re_embed(encoded):
+    curry = menu_item("Green Curry")
+    db = FakeSession([curry], [embedding_for(curry)])
+    result = update(db, [(curry.id, {"price": Decimal("12.00")})])
+    assert result.reembedded == 0
+    assert curry.price == Decimal("12.00")
+    assert encoded["chunks"] == []
+    assert db.committed
+
+
+def test_text_change_re_embeds_only_that_item(encoded):
+    curry, soup = menu_item("Green Curry"), menu_item("Tom Yum")
+    db = FakeSession([curry, soup], [embedding_for(curry), embedding_for(soup)])
+    result = update(db, [(curry.id, {"description": "Hotter now"}), (soup.id, {"price": Decimal("8")})])
+    assert result.reembedded == 1
+    assert encoded["chunks"] == [RAGService.build_content_chunk("Green Curry", "Hotter now", "Mains")]
+    [row] = encoded["written"]
+    assert row["item_id"] == curry.id
+    assert row["content_hash"] == RAGService.content_hash(encoded["chunks"][0])
+
+
+def test_setting_the_same_text_does_not_re_embed(encoded):
+    curry = menu_item("Green Curry")
+    db = FakeSession([curry], [embedding_for(curry)])
+    assert update(db, [(curry.id, {"name": "Green Curry", "category": "Mains"})]).reembedded == 0
+
+
+def test_row_without_a_hash_is_backfilled_when_the_text_matches(encoded):
+    curry = menu_item("Green Curry")
+    legacy = embedding_for(curry, content_hash=None)
+    db = FakeSession([curry], [legacy])
+    assert update(db, [(curry.id, {"price": Decimal("11")})]).reembedded == 0
+    assert legacy.content_hash == RAGService.content_hash(legacy.content_chunk)
+
+
+def test_item_without_an_embedding_is_embedded(encoded):
+    curry = menu_item("Green Curry")
+    db = FakeSession([curry], [])
+    assert update(db, [(curry.id, {"price": Decimal("11")})]).reembedded == 1
+    assert encoded["partitions"] == 1
+
+
+def test_missing_items_fail_the_whole_batch(encoded):
+    curry = menu_item("Green Curry")
+    db = FakeSession([curry], [embedding_for(curry)])
+    missing = uuid.uuid4()
+    with pytest.raises(MenuItemsNotFound) as raised:
+        update(db, [(curry.id, {"price": Decimal("11")}), (missing, {"price": Decimal("1")})])
+    assert raised.value.item_ids == [missing]
+    assert not db.committed
@@ -0,0 +1,43 @@
+from services.prompt_builder import CHARS_PER_TOKEN, select_context
+
+
+def test_keeps_closest_first():
+    selection = select_context([("Bravo", 0.3), ("Alpha", 0.5), ("Charlie", 0.1)], budget=100)
+    assert selection.chunks == ["Charlie", "Bravo", "Alpha"]
+
+
+def test_ties_are_ordered_by_text():
+    selection = select_context([("Bravo", 0.2), ("Alpha", 0.2)], budget=100)
+    assert selection.chunks == ["Alpha", "Bravo"]
+
+
+def test_drops_duplicates_keeping_the_best_distance():
+    selection = select_context([("Alpha", 0.6), ("Bravo", 0.4), (" Alpha ", 0.1)], budget=100)
+    assert selection.chunks == ["Alpha", "Bravo"]
+    assert selection.duplicates == 1
+
+
+def test_drops_distant_chunks():
+    selection = select_context([("Alpha", 0.2), ("Bravo", 0.9), ("Charlie", None)], budget=100, max_distance=0.8)
+    assert selection.chunks == ["Charlie", "Alpha"]
+    assert selection.too_far == 1
+
+
+def test_keyword_only_hits_skip_the_distance_cutoff():
+    selection = select_context([("Alpha", 0.2, False), ("Pad Thai", 0.95, True), ("Bravo", 0.9, False)],
+                               budget=100, max_distance=0.8)
+    assert selection.chunks == ["Alpha", "Pad Thai"]
+    assert selection.too_far == 1
+
+
+def test_stops_at_the_budget():
+    selection = select_context([("a" * 40, 0.1), ("b" * 40, 0.2), ("c" * 4, 0.3)], budget=12)
+    # 11 tokens each for the long chunks, 2 for the short one
+    assert selection.chunks == ["a" * 40]
+    assert selection.over_budget == 2
+
+
+def test_truncates_the_closest_chunk_when_nothing_fits():
+    selection = select_context([("a" * 100, 0.1), ("b" * 100, 0.2)], budget=5)
+    assert selection.chunks == ["a" * (5 * CHARS_PER_TOKEN)]
+    assert selection.over_budget == 1
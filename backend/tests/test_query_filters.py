@@ -0,0 +1,63 @@
+from decimal import Decimal
+
+import pytest
+
+from services.query_filters import extract_filters
+
+
+@pytest.mark.parametrize("question, max_price, min_price", [
+    ("anything with prawns under $15?", Decimal("15"), None),
+    ("mains below 12.50", Decimal("12.50"), None),
+    ("desserts no more than 8 dollars", Decimal("8"), None),
+    ("wine over $40", None, Decimal("40")),
+    ("steaks at least 30 bucks", None, Decimal("30")),
+    ("something >= 10 but < 20", Decimal("20"), Decimal("10")),
+    ("what's spicy?", None, None),
+])
+def test_price_bounds(question, max_price, min_price):
+    filters = extract_filters(question)
+    assert filters.max_price == max_price
+    assert filters.min_price == min_price
+
+
+def test_price_phrase_is_not_a_keyword():
+    filters = extract_filters("anything with prawns under $15?")
+    assert filters.keywords == ["anything", "with", "prawns"]
+    assert filters.tsquery == "anything | with | prawns"
+
+
+def test_keywords_are_lowercased_and_deduplicated():
+    filters = extract_filters("Curry, CURRY and more curry!")
+    assert filters.keywords == ["curry", "and", "more"]
+
+
+def test_apostrophes_are_dropped_from_keywords():
+    assert extract_filters("what's the chef's special").keywords == ["whats", "the", "chefs", "special"]
+
+
+def test_category_terms_include_singular_forms():
+    terms = extract_filters("any pastries or dishes or drinks").category_terms
+    assert {"pastries", "pastry", "dishes", "dish", "drinks", "drink"} <= set(terms)
+
+
+@pytest.mark.parametrize("question", [
+    "anything without nuts?",
+    "dairy-free desserts",
+    "I'm allergic to shellfish",
+    "mains that aren't spicy",
+    "no pork please",
+])
+def test_negations_constrain(question):
+    filters = extract_filters(question)
+    assert filters.negated
+    assert filters.constrained
+
+
+def test_plain_questions_are_unconstrained():
+    filters = extract_filters("What are the vegetarian options?")
+    assert not filters.negated
+    assert not filters.constrained
+
+
+def test_price_bound_constrains():
+    assert extract_filters("drinks under 5").constrained
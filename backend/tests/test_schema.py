@@ -0,0 +1,100 @@
+import asyncio
+import os
+import uuid
+from contextlib import asynccontextmanager
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from models import DEFAULT_RESTAURANT
+from services.ann_index import ensure_vector_index
+from services.schema import LEGACY_EMBEDDINGS_TABLE, ensure_schema, legacy_copy_sql
+
+# A Postgres with pgvector to run migrations against; each test works in a scratch schema it drops afterwards
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+needs_database = pytest.mark.skipif(not TEST_DATABASE_URL, reason="set TEST_DATABASE_URL to run migrations")
+
+# What the first release's create_all produced
+BASELINE_SCHEMA = [
+    "CREATE EXTENSION IF NOT EXISTS vector",
+    """CREATE TABLE menu_items (
+        id UUID PRIMARY KEY, name VARCHAR(255) NOT NULL, description TEXT NOT NULL, price NUMERIC(10, 2) NOT NULL,
+        image_data TEXT, category VARCHAR(50), created_at TIMESTAMPTZ DEFAULT now())""",
+    """CREATE TABLE menu_embeddings (
+        item_id UUID PRIMARY KEY REFERENCES menu_items(id) ON DELETE CASCADE,
+        embedding vector(384) NOT NULL, content_chunk TEXT NOT NULL)""",
+]
+ITEM_ID = uuid.uuid4()
+
+
+def test_legacy_copy_keeps_an_existing_content_hash():
+    assert "e.content_hash" in legacy_copy_sql(["item_id", "embedding", "content_chunk", "content_hash"])
+
+
+def test_legacy_copy_without_content_hash_inserts_null():
+    sql = legacy_copy_sql(["item_id", "embedding", "content_chunk"])
+    assert "e.content_hash" not in sql
+    assert "NULL::varchar" in sql
+
+
+@asynccontextmanager
+async def baseline_database():
+    """An engine whose search_path starts at a new schema holding the baseline tables and one embedded item."""
+    schema = f"migration_{uuid.uuid4().hex[:12]}"
+    admin = create_async_engine(TEST_DATABASE_URL)
+    async with admin.begin() as conn:
+        await conn.execute(text(f"CREATE SCHEMA {schema}"))
+    engine = create_async_engine(TEST_DATABASE_URL, connect_args={"server_settings": {"search_path": f"{schema},public"}})
+    try:
+        async with engine.begin() as conn:
+            for statement in BASELINE_SCHEMA:
+                await conn.execute(text(statement))
+            await conn.execute(text("INSERT INTO menu_items (id, name, description, price) VALUES (:id, 'Soup', 'Tom yum', 9)"),
+                               {"id": ITEM_ID})
+            await conn.execute(text("INSERT INTO menu_embeddings VALUES (:id, :embedding, 'Soup: Tom yum')"),
+                               {"id": ITEM_ID, "embedding": str([0.1] * 384)})
+        yield engine
+    finally:
+        await engine.dispose()
+        async with admin.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        await admin.dispose()
+
+
+async def start_worker(engine) -> bool:
+    # What main.py's startup hook does
+    async with engine.begin() as conn:
+        migrated = await ensure_schema(conn)
+        await ensure_vector_index(conn)
+    return migrated
+
+
+async def embedded_rows(engine):
+    async with engine.begin() as conn:
+        return [tuple(row) for row in await conn.execute(text("SELECT restaurant_id, item_id, content_hash FROM menu_embeddings"))]
+
+
+@needs_database
+def test_baseline_database_upgrades_in_place():
+    async def scenario():
+        async with baseline_database() as engine:
+            assert await start_worker(engine)
+            assert await embedded_rows(engine) == [(DEFAULT_RESTAURANT, ITEM_ID, None)]
+            async with engine.begin() as conn:
+                assert (await conn.execute(text("SELECT to_regclass(:table)"), {"table": LEGACY_EMBEDDINGS_TABLE})).scalar() is None
+            # The fingerprint is stored, so the next start skips the DDL
+            assert not await start_worker(engine)
+
+    asyncio.run(scenario())
+
+
+@needs_database
+def test_concurrent_workers_migrate_once():
+    async def scenario():
+        async with baseline_database() as engine:
+            migrated = await asyncio.gather(*(start_worker(engine) for _ in range(4)))
+            assert sorted(migrated) == [False, False, False, True]
+            assert await embedded_rows(engine) == [(DEFAULT_RESTAURANT, ITEM_ID, None)]
+
+    asyncio.run(scenario())
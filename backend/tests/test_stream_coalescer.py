@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from services.stream_coalescer import coalesce
+
+
+async def deltas(items, pause=0.0):
+    for item in items:
+        if pause:
+            await asyncio.sleep(pause)
+        yield item
+
+
+async def collect(stream):
+    return [chunk async for chunk in stream]
+
+
+def test_merges_a_burst_into_one_chunk():
+    chunks = asyncio.run(collect(coalesce(deltas(["Hel", "lo", " there"]), window_ms=50)))
+    assert chunks == ["Hello there"]
+
+
+def test_flushes_at_the_byte_threshold():
+    chunks = asyncio.run(collect(coalesce(deltas(["ab", "cd", "ef", "g"]), window_ms=1000, max_bytes=4)))
+    assert chunks == ["abcd", "efg"]
+
+
+def test_flushes_when_the_window_expires():
+    # Upstream stalls longer than the window between deltas, so nothing is held back for it
+    chunks = asyncio.run(collect(coalesce(deltas(["a", "b", "c"], pause=0.05), window_ms=10)))
+    assert chunks == ["a", "b", "c"]
+
+
+def test_zero_window_passes_deltas_through():
+    chunks = asyncio.run(collect(coalesce(deltas(["a", "b"]), window_ms=0)))
+    assert chunks == ["a", "b"]
+
+
+def test_upstream_error_flushes_then_raises():
+    async def failing():
+        yield "partial"
+        raise RuntimeError("LM Studio went away")
+
+    async def run():
+        received = []
+        with pytest.raises(RuntimeError, match="went away"):
+            async for chunk in coalesce(failing(), window_ms=1000):
+                received.append(chunk)
+        return received
+
+    assert asyncio.run(run()) == ["partial"]
+
+
+def test_cancellation_reason_reaches_the_upstream():
+    reasons = []
+
+    async def upstream():
+        try:
+            yield "a"
+            await asyncio.sleep(10)
+        except asyncio.CancelledError as e:
+            reasons.append(e.args)
+            raise
+
+    async def run():
+        first_chunk = asyncio.Event()
+
+        async def consume():
+            async for _ in coalesce(upstream(), window_ms=1):
+                first_chunk.set()
+
+        task = asyncio.create_task(consume())
+        await first_chunk.wait()
+        task.cancel("superseded")
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert reasons == [("superseded",)]
@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+
+from services import warmup
+from services.warmup import StartupReport
+
+
+@pytest.fixture(autouse=True)
+def report(monkeypatch):
+    monkeypatch.setattr(StartupReport, "ready", False)
+    monkeypatch.setattr(StartupReport, "failed", False)
+    monkeypatch.setattr(StartupReport, "attempts", 0)
+    monkeypatch.setattr(StartupReport, "error", None)
+    monkeypatch.setattr(warmup, "WARMUP_RETRY_DELAY", 0)
+
+
+def failing(times):
+    calls = []
+
+    async def warm_up_once():
+        calls.append(1)
+        if len(calls) <= times:
+            raise ConnectionError("database is starting up")
+
+    return warm_up_once
+
+
+def test_retries_until_warm_up_succeeds(monkeypatch):
+    monkeypatch.setattr(warmup, "_warm_up_once", failing(2))
+    asyncio.run(warmup.warm_up())
+    assert StartupReport.ready
+    assert not StartupReport.failed
+    assert StartupReport.attempts == 3
+    assert StartupReport.error is None
+
+
+def test_gives_up_after_the_last_attempt(monkeypatch):
+    monkeypatch.setattr(warmup, "WARMUP_ATTEMPTS", 3)
+    monkeypatch.setattr(warmup, "_warm_up_once", failing(10))
+    asyncio.run(warmup.warm_up())
+    assert not StartupReport.ready
+    assert StartupReport.failed
+    assert StartupReport.attempts == 3
+    assert StartupReport.error == "ConnectionError: database is starting up"
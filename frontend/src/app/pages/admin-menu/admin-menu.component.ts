@@ -1,7 +1,8 @@
 import { Component, inject, signal } from '@angular/core';
 import { CommonModule } from '@angular/common';
+import { takeUntilDestroyed } from '@angular/core/rxjs-interop';
 import { ReactiveFormsModule, FormBuilder, FormGroup, Validators } from '@angular/forms';
-import { MenuService, MenuItem } from '../../services/menu.service';
+import { MenuService, MenuItem, applyMenuChanges } from '../../services/menu.service';
 
 @Component({
     selector: 'app-admin-menu',
@@ -29,6 +30,15 @@ export class AdminMenuComponent {
         });
 
         this.loadMenu();
+
+        // Keeps the list in sync with edits made from other admin screens
+        this.menuService.watchMenuChanges().pipe(takeUntilDestroyed()).subscribe(message => {
+            if (message.reset) {
+                this.loadMenu();
+            } else if (message.changes?.length) {
+                this.menuItems.update(items => applyMenuChanges(items, message.changes!));
+            }
+        });
     }
 
     loadMenu() {
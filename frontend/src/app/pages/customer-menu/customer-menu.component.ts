@@ -1,6 +1,7 @@
 import { Component, inject, signal, computed } from '@angular/core';
 import { CommonModule } from '@angular/common';
-import { MenuService, MenuItem } from '../../services/menu.service';
+import { takeUntilDestroyed } from '@angular/core/rxjs-interop';
+import { MenuService, MenuItem, applyMenuChanges } from '../../services/menu.service';
 
 
 @Component({
@@ -18,6 +19,20 @@ export class CustomerMenuComponent {
     isLoading = signal(true);
 
     constructor() {
+        this.loadMenu();
+
+        // Edits arrive as small deltas over /ws/menu instead of re-fetching the whole listing
+        this.menuService.watchMenuChanges().pipe(takeUntilDestroyed()).subscribe(message => {
+            if (message.reset) {
+                this.loadMenu();
+            } else if (message.changes?.length) {
+                this.menuItems.update(items => applyMenuChanges(items, message.changes!));
+                this.extractCategories(this.menuItems());
+            }
+        });
+    }
+
+    loadMenu() {
         this.menuService.getMenuItems().subscribe({
             next: (items) => {
                 this.menuItems.set(items);
@@ -1,11 +1,14 @@
 import { Injectable, signal } from '@angular/core';
 import { webSocket, WebSocketSubject } from 'rxjs/webSocket';
 import { Observable, Subject, retry } from 'rxjs';
+import { withRestaurant } from './restaurant';
 
 export interface ChatMessage {
+    id?: string; // Answers: the id the server echoes in every frame of this answer
     text: string;
     isUser: boolean;
     isTyping?: boolean; // For streaming indicator
+    queuePosition?: number; // Set while the server queues the answer behind other diners
 }
 
 @Injectable({
@@ -22,6 +25,7 @@ export class ChatService {
     public isTyping = signal(false);
 
     private socket$: WebSocketSubject<any> | undefined;
+    private nextId = 0;
 
     constructor() {
         // We don't subscribe to the socket here for message handling yet to avoid double subscription if not careful,
@@ -31,9 +35,10 @@ export class ChatService {
 
     connect(): void {
         if (!this.socket$ || this.socket$.closed) {
+            // JSON frames carry the question's id, so a superseded answer's last frames can't leak into the next one
             this.socket$ = webSocket({
-                url: 'ws://localhost:8000/ws/chat',
-                deserializer: msg => msg.data
+                url: withRestaurant('ws://localhost:8000/ws/chat?protocol=json'),
+                deserializer: msg => JSON.parse(msg.data)
             });
 
             this.socket$.pipe(
@@ -61,44 +66,52 @@ export class ChatService {
     }
 
     sendMessage(text: string): void {
+        const id = String(++this.nextId);
+        const question = { question: text, id };
+
         // Add user message immediately
         this.messages.update(msgs => [...msgs, { text, isUser: true }]);
         this.isTyping.set(true);
 
         // Prepare placeholder for AI response
-        this.messages.update(msgs => [...msgs, { text: '', isUser: false, isTyping: true }]);
+        this.messages.update(msgs => [...msgs, { id, text: '', isUser: false, isTyping: true }]);
 
         if (this.socket$) {
-            this.socket$.next({ question: text });
+            this.socket$.next(question);
         } else {
             console.warn('WebSocket not connected');
             this.connect();
             setTimeout(() => {
-                if (this.socket$) this.socket$.next({ question: text });
+                if (this.socket$) this.socket$.next(question);
             }, 1000);
         }
     }
 
-    private handleIncomingChunk(chunk: string) {
-        if (chunk === '[DONE]') {
-            this.isTyping.set(false);
-            this.messages.update(msgs => {
-                const last = msgs[msgs.length - 1];
-                if (last && !last.isUser) {
-                    return [...msgs.slice(0, -1), { ...last, isTyping: false }];
-                }
-                return msgs;
-            });
+    // Frames: {id, chunk, done}, {id, queue, done: false} and {id, chunk, done: true, error}
+    private handleIncomingChunk(frame: { id?: string; chunk?: string; queue?: number; done: boolean; error?: string }) {
+        if (frame.queue !== undefined) {
+            this.updateAnswer(frame.id, answer => ({ ...answer, queuePosition: frame.queue }));
             return;
         }
 
+        this.updateAnswer(frame.id, answer => ({
+            ...answer,
+            text: answer.text + (frame.chunk ?? ''),
+            queuePosition: undefined,
+            isTyping: !frame.done,
+        }));
+        if (frame.done) {
+            this.isTyping.set(this.messages().some(msg => msg.isTyping));
+        }
+    }
+
+    private updateAnswer(id: string | undefined, update: (answer: ChatMessage) => ChatMessage) {
         this.messages.update(msgs => {
-            const newMsgs = [...msgs];
-            const last = newMsgs[newMsgs.length - 1];
-            if (last && !last.isUser) {
-                last.text += chunk;
+            const index = msgs.findIndex(msg => !msg.isUser && msg.id === id);
+            if (index === -1) {
+                return msgs;
             }
-            return newMsgs;
+            return [...msgs.slice(0, index), update(msgs[index]), ...msgs.slice(index + 1)];
         });
     }
 
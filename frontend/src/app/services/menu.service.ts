@@ -1,6 +1,8 @@
 import { Injectable, inject } from '@angular/core';
 import { HttpClient } from '@angular/common/http';
-import { Observable } from 'rxjs';
+import { Observable, defer, map, retry, tap } from 'rxjs';
+import { webSocket } from 'rxjs/webSocket';
+import { withRestaurant } from './restaurant';
 
 export interface MenuItem {
     id?: string;
@@ -8,30 +10,80 @@ export interface MenuItem {
     description: string;
     price: number;
     image_data?: string;
+    thumbnail_url?: string;
     category?: string;
     created_at?: string;
 }
 
+export interface MenuChange {
+    op: 'add' | 'update' | 'delete';
+    id: string;
+    version: number;
+    item?: MenuItem;
+}
+
+// Pushed by /ws/menu: 'hello' on connect, 'changes' on every edit; reset means reload the whole menu
+export interface MenuChangeMessage {
+    type: 'hello' | 'changes';
+    version: number;
+    reset?: boolean;
+    changes?: MenuChange[];
+}
+
+// Applies pushed deltas to a loaded listing; safe to apply a delta twice
+export function applyMenuChanges(items: MenuItem[], changes: MenuChange[]): MenuItem[] {
+    const result = [...items];
+    for (const change of changes) {
+        const index = result.findIndex(i => i.id === change.id);
+        if (change.op === 'delete' || !change.item) {
+            if (index !== -1) result.splice(index, 1);
+        } else if (index === -1) {
+            result.push(change.item);
+        } else {
+            result[index] = change.item;
+        }
+    }
+    return result;
+}
+
 @Injectable({
     providedIn: 'root'
 })
 export class MenuService {
     private http = inject(HttpClient);
     private apiUrl = 'http://localhost:8000/menu'; // Assumes local dev for now, can be environment config
+    private feedUrl = 'ws://localhost:8000/ws/menu';
+    private menuVersion: number | null = null;
 
     getMenuItems(): Observable<MenuItem[]> {
-        return this.http.get<MenuItem[]>(this.apiUrl);
+        return this.http.get<MenuItem[]>(withRestaurant(this.apiUrl), { observe: 'response' }).pipe(
+            tap(response => {
+                const version = response.headers.get('X-Menu-Version');
+                if (version !== null) this.menuVersion = Number(version);
+            }),
+            map(response => response.body ?? [])
+        );
+    }
+
+    // Live menu edits instead of re-fetching the listing; reconnects pick up from the last version seen
+    watchMenuChanges(): Observable<MenuChangeMessage> {
+        return defer(() => webSocket<MenuChangeMessage>(
+            withRestaurant(this.menuVersion === null ? this.feedUrl : `${this.feedUrl}?since=${this.menuVersion}`)
+        )).pipe(
+            tap(message => this.menuVersion = message.version),
+            retry({ delay: 3000 })
+        );
     }
 
     createMenuItem(item: MenuItem): Observable<MenuItem> {
-        return this.http.post<MenuItem>(this.apiUrl, item);
+        return this.http.post<MenuItem>(withRestaurant(this.apiUrl), item);
     }
 
     deleteMenuItem(id: string): Observable<any> {
-        return this.http.delete(`${this.apiUrl}/${id}`);
+        return this.http.delete(withRestaurant(`${this.apiUrl}/${id}`));
     }
 
     updateMenuItem(id: string, item: any): Observable<MenuItem> {
-        return this.http.put<MenuItem>(`${this.apiUrl}/${id}`, item);
+        return this.http.put<MenuItem>(withRestaurant(`${this.apiUrl}/${id}`), item);
     }
 }
@@ -0,0 +1,7 @@
+// The restaurant this tablet belongs to comes from the page URL (e.g. /menu?restaurant=downtown).
+// Without it the backend serves its default restaurant, as single-restaurant installs always did.
+export function withRestaurant(url: string): string {
+    const restaurant = new URLSearchParams(window.location.search).get('restaurant');
+    if (!restaurant) return url;
+    return `${url}${url.includes('?') ? '&' : '?'}restaurant=${encodeURIComponent(restaurant)}`;
+}